@@ -223,6 +223,9 @@ class Canvas(object):
         # self._backend = set by BaseCanvasBackend
         self._backend_kwargs = None  # Clean up
 
+        # The GL state may have been changed outside GLIR (e.g. by the
+        # backend on resize), so start each frame without a state record
+        self.events.draw.connect(self.context.reset_state, position='first')
         # Connect to draw event (append to the end)
         # Process GLIR commands at each paint event
         self.events.draw.connect(self.context.flush_commands, position='last')
@@ -400,6 +400,11 @@ class DataBufferView(DataBuffer):
         """Buffer base if this buffer is a view on another buffer. """
         return self._base
 
+    @property
+    def divisor(self):
+        """ Attribute divisor of the base buffer """
+        return getattr(self._base, 'divisor', 0)
+
     def resize_bytes(self, size):
         raise RuntimeError("Cannot resize buffer view.")
 
@@ -422,10 +427,36 @@ class VertexBuffer(DataBuffer):
     ----------
     data : ndarray
         Buffer data (optional)
+    divisor : int
+        If nonzero, the attributes in this buffer advance once per
+        ``divisor`` instances instead of once per vertex, see the
+        ``instances`` argument of ``Program.draw``. Default 0.
     """
 
     _GLIR_TYPE = 'VertexBuffer'
 
+    def __init__(self, data=None, divisor=0):
+        self._divisor = 0
+        DataBuffer.__init__(self, data)
+        self.divisor = divisor
+
+    @property
+    def divisor(self):
+        """ Number of instances per element of per-instance data
+
+        Zero (the default) means that the data is per vertex. Set the
+        divisor before assigning the buffer (or a view on it) to a
+        program.
+        """
+        return self._divisor
+
+    @divisor.setter
+    def divisor(self, divisor):
+        divisor = int(divisor)
+        if divisor < 0:
+            raise ValueError('Divisor must be non-negative')
+        self._divisor = divisor
+
     def _prepare_data(self, data, convert=False):
         # Build a structured view of the data if:
         #  -> it is not already a structured array
@@ -456,6 +487,46 @@ class VertexBuffer(DataBuffer):
         return data
 
 
+class StreamingVertexBuffer(VertexBuffer):
+    """ Buffer for vertex attribute data that changes every frame
+
+    This behaves like a VertexBuffer, but replacing its data does not
+    make the driver wait for the GPU to finish drawing with the previous
+    data. The GL implementation keeps a few copies of the data on the
+    GPU and writes new data to one that is not in use (see
+    ``GlirStreamingVertexBuffer``). This takes more GPU memory, so only
+    use it for data that is updated (nearly) every frame.
+
+    Parameters
+    ----------
+    data : ndarray
+        Buffer data (optional)
+    """
+
+    _GLIR_TYPE = 'StreamingVertexBuffer'
+
+
+class UniformBuffer(Buffer):
+    """ Buffer for the values of a GLSL uniform block
+
+    A uniform buffer can be linked to a uniform block in any number of
+    programs, e.g. ``program['Camera'] = ubo``, so that uniforms that
+    these programs share are uploaded once. The data must match the
+    memory layout of the block; declare it with ``layout(std140)`` to
+    get a layout that does not depend on the driver. Uniform buffers
+    require OpenGL 3.1 and the gl+ backend.
+
+    Parameters
+    ----------
+    data : ndarray | None
+        Buffer data.
+    nbytes : int | None
+        Buffer byte size.
+    """
+
+    _GLIR_TYPE = 'UniformBuffer'
+
+
 def _last_stack_str():
     """Print stack trace from call that didn't originate from here"""
     stack = extract_stack()
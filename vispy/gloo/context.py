@@ -20,6 +20,7 @@ from copy import deepcopy
 import weakref
 
 from .glir import GlirQueue, BaseGlirParser, GlirParser, glir_logger
+from .glir_replay import glir_recorder
 from .wrappers import BaseGlooFunctions
 from .. import config
 
@@ -103,6 +104,7 @@ class GLContext(BaseGlooFunctions):
         self._glir = GlirQueue()
         self._do_CURRENT_command = False  # flag that CURRENT cmd must be given
         self._last_viewport = None
+        self._batch_depth = 0
 
     def __repr__(self):
         return "<GLContext at 0x%x>" % id(self)
@@ -173,8 +175,57 @@ class GLContext(BaseGlooFunctions):
             else:
                 fbo = 0
             self.shared.parser.parse([('CURRENT', 0, fbo)])
+            # The parser forgets the state on CURRENT; so do we, in case
+            # the backend changed it in the meantime
+            self.glir.reset_state()
         self.glir.flush(self.shared.parser)
         
+    def reset_state(self, event=None):
+        """ Forget the GL state recorded by the GLIR queue and parser
+
+        Redundant state-setting commands (e.g. from ``set_state``) are
+        dropped based on the state that was set through GLIR. This record
+        is cleared at the start of each draw event of a canvas. Code that
+        changes the GL state in other ways during a draw (direct ``gl.*``
+        calls or another library that shares the context) must call this
+        method afterwards.
+
+        Parameters
+        ----------
+        event : instance of Event
+            The event.
+        """
+        self.glir.reset_state()
+        if self.shared.parser is not None:
+            self.shared.parser.reset_state()
+
+    def begin_batch(self):
+        """ Start collecting the GLIR commands of draws
+
+        Until the matching ``end_batch()``, ``Program.draw()`` does not
+        flush the GLIR queue, so that the commands of many draws are
+        parsed in one go. This lets consecutive draws of ranges of the
+        same program be merged into one multi-draw, and removes the
+        per-flush overhead. Batches can be nested.
+        """
+        self._batch_depth += 1
+
+    def end_batch(self):
+        """ Stop collecting draw commands and flush them, see
+        ``begin_batch()``.
+        """
+        if self._batch_depth <= 0:
+            raise RuntimeError('end_batch() called without begin_batch()')
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self.flush_commands()
+
+    @property
+    def batching(self):
+        """ Whether the commands of draws are currently being collected.
+        """
+        return self._batch_depth > 0
+
     def set_viewport(self, *args):
         BaseGlooFunctions.set_viewport(self, *args)
         self._last_viewport = args
@@ -204,6 +255,8 @@ class GLShared(object):
         parser_cls = GlirParser
         if glir_file:
             parser_cls = glir_logger(parser_cls, glir_file)
+        if config['glir_record']:
+            parser_cls = glir_recorder(parser_cls, config['glir_record'])
 
         self._parser = parser_cls()
         self._name = None
@@ -234,6 +287,9 @@ class GLShared(object):
             raise RuntimeError('Contexts can only share between backends of '
                                'the same type')
         self._refs.append(weakref.ref(ref))
+        # Vertex array objects cannot be shared between contexts
+        if len(self._refs) > 1 and self._parser is not None:
+            self._parser.capabilities['vertex_array_objects'] = False
     
     @property
     def name(self):
@@ -53,8 +53,8 @@ command has the following shape:
 
    (<command>, <ID>, [arg1, [arg2, [arg3]]])
 
--  ``<command>`` is one of 15 commands: CURRENT, CREATE, DELETE,
-   UNIFORM, ATTRIBUTE, DRAW, SIZE, DATA, WRAPPING,
+-  ``<command>`` is one of 16 commands: CURRENT, CREATE, DELETE,
+   UNIFORM, UNIFORM_BLOCK, ATTRIBUTE, DRAW, SIZE, DATA, WRAPPING,
    INTERPOLATION, ATTACH, FRAMEBUFFER, FUNC, SWAP, LINK.
 -  In all commands except SET, ``<ID>`` is an integer unique within the
    current GL context that is used as a reference to a GL object. It is
@@ -88,9 +88,14 @@ CREATE
 Applies to: All objects
 
 The create command is used to create a new GL object. It has one string
-argument that can be any of 10 classes: 'Program', 'VertexBuffer',
-'IndexBuffer', 'Texture2D', 'Texture3D', 'RenderBuffer', 'FrameBuffer',
-'VertexShader', 'FragmentShader', 'GeometryShader'
+argument that can be any of 12 classes: 'Program', 'VertexBuffer',
+'StreamingVertexBuffer', 'IndexBuffer', 'UniformBuffer', 'Texture2D',
+'Texture3D', 'RenderBuffer', 'FrameBuffer', 'VertexShader',
+'FragmentShader', 'GeometryShader'
+
+A 'StreamingVertexBuffer' accepts the same commands as a 'VertexBuffer',
+but is meant for data that changes every frame. Implementations may use
+this to avoid waiting for the GPU when data is replaced.
 
 DELETE
 ~~~~~~
@@ -147,14 +152,32 @@ Applies to: Program
 
 This command is used to link a texture to a GLSL uniform sampler.
 
+UNIFORM_BLOCK
+~~~~~~~~~~~~~
+
+::
+
+   ('UNIFORM_BLOCK', <program_id>, <name:str>, <buffer_id>)
+   # Examples:
+   ('UNIFORM_BLOCK', 4, 'Camera', 7)
+
+Applies to: Program
+
+This command is used to link a uniform buffer to a GLSL uniform block.
+The same buffer can be linked to blocks in many programs, so that their
+uniforms are uploaded only once. Uniform blocks require OpenGL 3.1 (see
+the 'uniform_buffers' capability of the parser).
+
 ATTRIBUTE
 ~~~~~~~~~
 
 ::
 
-   ('ATTRIBUTE', <program_id>, <name:str>, <type:str>, <vbo_id>, <stride:int>, <offset:int>)
+   ('ATTRIBUTE', <program_id>, <name:str>, <type:str>, <vbo_id>, <stride:int>, <offset:int>[, <divisor:int>])
    # Example: Buffer id 5, stride 4, offset 0
    ('ATTRIBUTE', 4, 'a_position', 'vec3', 5, 4, 0)
+   # Example: per-instance data, advancing once per instance
+   ('ATTRIBUTE', 4, 'a_offset', 'vec2', 6, 8, 0, 1)
 
 Applies to: Program
 
@@ -163,7 +186,8 @@ attribute has a string name, a type, and a value.
 
 The type can be 'float', 'vec2', 'vec3', 'vec4'. If the first value
 element is zero, the remaining elements represent the data to pass to
-``glVertexAttribNf``.
+``glVertexAttribNf``. The optional divisor is passed to
+``glVertexAttribDivisor``; it defaults to zero (per-vertex data).
 
 It is an error to provide this command before the shaders are set. After
 resetting shaders, all uniforms and attributes have to be re-submitted.
@@ -173,11 +197,15 @@ DRAW
 
 ::
 
-   ('DRAW', <program_id>, <mode:str>, <selection:tuple>)
+   ('DRAW', <program_id>, <mode:str>, <selection:tuple>[, <instances:int>])
    # Example: Draw 100 lines
    ('DRAW', 4, 'lines', (0, 100))
    # Example: Draw 100 lines using index buffer with id 5
    ('DRAW', 4, 'points', (5, 'unsigned_int', 100))
+   # Example: Draw 1000 instances of a quad
+   ('DRAW', 4, 'triangle_strip', (0, 4), 1000)
+   # Example: Draw three line strips from one buffer
+   ('DRAW', 4, 'line_strip', (<array [0, 10, 30]>, <array [10, 20, 5]>))
 
 Applies to: Program
 
@@ -190,6 +218,16 @@ If the ``selection`` argument has two elements, it contains two integers
 ``(<index-buffer-id>, gtype, count)``, where ``gtype`` is
 'unsigned_byte','unsigned_short', or 'unsigned_int'.
 
+If the two elements of the selection are integer arrays, they hold the
+start and count of several ranges of vertices, which are drawn at once
+(e.g. with ``glMultiDrawArrays``). Consecutive DRAW commands for ranges
+of the same program and mode, with no other commands in between, are
+merged into one such command before they are parsed.
+
+If ``instances`` is given, the selection is drawn that many times with
+``glDrawArraysInstanced`` or ``glDrawElementsInstanced``. This requires
+OpenGL 3.3 (see the 'instanced_drawing' capability of the parser).
+
 SIZE
 ~~~~
 
@@ -354,12 +392,22 @@ cause shaders to be detached and deleted. See the
 `OpenGL documentation <https://www.khronos.org/registry/OpenGL-Refpages/gl4/html/glLinkProgram.xhtml>`_
 for details on program linking.
 
+A parser may let programs with identical shader code share one linked
+program object, as long as each program behaves as if it had its own
+uniform values. The gloo parser does this, and it can also cache the
+linked program binaries on disk (see the ``shader_cache_dir`` config
+option; this needs OpenGL 4.1).
+
 """
 
 import os
+import os.path as op
 import sys
 import re
 import json
+import ctypes
+import struct
+import hashlib
 import weakref
 from distutils.version import LooseVersion
 
@@ -367,7 +415,7 @@ import numpy as np
 
 from . import gl
 from ..ext.six import string_types
-from ..util import logger
+from ..util import config, logger
 
 # TODO: expose these via an extension space in .gl?
 _internalformats = [
@@ -395,6 +443,41 @@ _internalformats = [
 ]
 _internalformats = dict([(enum.name, enum) for enum in _internalformats])
 
+# Desktop GL enums that are not in the ES 2.0 namespace of gloo.gl
+_desktop_enums = [
+    gl.Enum('GL_LINE_SMOOTH', 2848),
+]
+_desktop_enums = dict([(enum.name, enum) for enum in _desktop_enums])
+
+# GL functions that only set a piece of GL state. Calling them again with
+# the same arguments has no effect, so the queue of each context and the
+# parser keep a shadow copy of the last value and skip redundant calls
+# (see _state_key). The number is how
+# many leading args select *which* state is set (e.g. the capability for
+# glEnable). glDepthMask is left out because some visuals call it directly.
+_STATE_FUNCS = {
+    'glEnable': 1, 'glDisable': 1, 'glHint': 1,
+    'glViewport': 0, 'glScissor': 0, 'glDepthRange': 0,
+    'glFrontFace': 0, 'glCullFace': 0, 'glLineWidth': 0,
+    'glPolygonOffset': 0, 'glClearColor': 0, 'glClearDepth': 0,
+    'glClearStencil': 0, 'glBlendFuncSeparate': 0,
+    'glBlendEquationSeparate': 0, 'glBlendColor': 0,
+    'glStencilFuncSeparate': 0, 'glStencilMaskSeparate': 0,
+    'glStencilOpSeparate': 0, 'glDepthFunc': 0, 'glColorMask': 0,
+    'glSampleCoverage': 0,
+}
+
+
+def _state_key(funcname, args):
+    """ Get the (key, value) of the piece of GL state that a call to one of
+    the _STATE_FUNCS sets.
+    """
+    if funcname in ('glEnable', 'glDisable'):
+        return ('glEnable', args[0]), funcname == 'glEnable'
+    n = _STATE_FUNCS[funcname]
+    return (funcname,) + tuple(args[:n]), tuple(args[n:])
+
+
 # Value to mark a glir object that was just deleted. So we can safely
 # ignore it (and not raise an error that the object could not be found).
 # This can happen e.g. if A is created, A is bound to B and then A gets
@@ -410,13 +493,26 @@ def as_enum(enum):
         try:
             enum = getattr(gl, 'GL_' + enum.upper())
         except AttributeError:
-            try:
-                enum = _internalformats['GL_' + enum.upper()]
-            except KeyError:
+            name = 'GL_' + enum.upper()
+            if name in _internalformats:
+                enum = _internalformats[name]
+            elif name in _desktop_enums:
+                enum = _desktop_enums[name]
+            else:
                 raise ValueError('Could not find int value for enum %r' % enum)
     return enum
 
 
+def _try_as_enum(enum):
+    """ Like as_enum, but return strings that are not known enums as they
+    are. Invalid commands are reported by the parser.
+    """
+    try:
+        return as_enum(enum)
+    except ValueError:
+        return enum
+
+
 class _GlirQueueShare(object):
     """This class contains the actual queues of GLIR commands that are
     collected until a context becomes available to execute the commands.
@@ -439,15 +535,34 @@ class _GlirQueueShare(object):
     def __init__(self, queue):
         self._commands = []  # local commands
         self._verbose = False
+        # GL state set by the FUNC commands in this queue: key -> value
+        self._state = {}
         # queues that have been merged with this one
         self._associations = weakref.WeakKeyDictionary({queue: None})
 
     def command(self, *args):
         """ Send a command. See the command spec at:
         https://github.com/vispy/vispy/wiki/Spec.-Gloo-IR
+
+        State-setting FUNC commands that would not change the state set
+        by earlier commands are dropped.
         """
+        if args[0] == 'FUNC' and args[1] in _STATE_FUNCS:
+            # Normalize enums as the parser does, so 'blend' and GL_BLEND
+            # refer to the same piece of state
+            key, value = _state_key(args[1], [_try_as_enum(a)
+                                              for a in args[2:]])
+            if key in self._state and self._state[key] == value:
+                return
+            self._state[key] = value
         self._commands.append(args)
 
+    def reset_state(self):
+        """ Forget the recorded GL state, so that the next state-setting
+        commands are all sent.
+        """
+        self._state = {}
+
     def set_verbose(self, verbose):
         """ Set verbose or not. If True, the GLIR commands are printed
         right before they get parsed. If a string is given, use it as
@@ -464,23 +579,17 @@ class _GlirQueueShare(object):
                 continue  # Skip nill commands
             if filter and command[0] != filter:
                 continue
-            t = []
-            for e in command:
-                if isinstance(e, np.ndarray):
-                    t.append('array %s' % str(e.shape))
-                elif isinstance(e, str):
-                    s = e.strip()
-                    if len(s) > 20:
-                        s = s[:18] + '... %i lines' % (e.count('\n')+1)
-                    t.append(s)
-                else:
-                    t.append(e)
-            print(tuple(t))
+            print(_command_repr(command))
 
     def clear(self):
         """ Pop the whole queue (and associated queues) and return a
         list of commands.
         """
+        # The commands may never be executed, so the state is unknown
+        self._state = {}
+        return self._pop()
+
+    def _pop(self):
         commands = self._commands
         self._commands = []
         return commands
@@ -491,11 +600,11 @@ class _GlirQueueShare(object):
         if self._verbose:
             show = self._verbose if isinstance(self._verbose, str) else None
             self.show(show)
-        parser.parse(self._filter(self.clear(), parser))
+        parser.parse(self._filter(self._pop(), parser))
 
     def _filter(self, commands, parser):
         """ Filter DATA/SIZE commands that are overridden by a
-        SIZE command.
+        SIZE command, and merge DATA commands on the same object.
         """
         resized = set()
         commands2 = []
@@ -506,7 +615,168 @@ class _GlirQueueShare(object):
             elif command[0] == 'SIZE':
                 resized.add(command[1])
             commands2.append(command)
-        return list(reversed(commands2))
+        commands2 = self._merge_data(list(reversed(commands2)))
+        return self._merge_draws(commands2, parser)
+
+    def _merge_data(self, commands):
+        """ Merge DATA commands for the same buffer or texture into
+        one upload when their regions overlap or touch, and drop DATA
+        commands whose region is fully overwritten by a later one.
+
+        Merged data is uploaded at the position of the last command. To
+        keep the result the same, DATA commands are never moved past a
+        command that may read or render into an object (DRAW, FUNC,
+        FRAMEBUFFER), nor past a partly overlapping write that cannot be
+        merged. Pending writes per object therefore never overlap.
+        """
+        commands = list(commands)
+        pending = {}  # id -> list of (index, box)
+        for i, command in enumerate(commands):
+            cmd = command[0]
+            if cmd in ('DRAW', 'FUNC', 'FRAMEBUFFER'):
+                pending.clear()
+                continue
+            elif cmd != 'DATA':
+                if cmd in ('SIZE', 'CREATE', 'DELETE'):
+                    pending.pop(command[1], None)
+                continue
+            box = _DataBox.from_command(command)
+            if box is None:
+                continue  # shader code or empty data
+            writes = pending.setdefault(command[1], [])
+            to_merge = []
+            for j, other in list(writes):
+                if box.contains(other):
+                    commands[j] = None  # fully overwritten
+                    writes.remove((j, other))
+                elif box.can_merge(other):
+                    to_merge.append((j, other))
+                elif box.overlaps(other):
+                    writes[:] = []  # order matters; stop merging
+                    to_merge = []
+                    break
+            if to_merge:
+                for j, other in to_merge:
+                    commands[j] = None
+                    writes.remove((j, other))
+                box = _DataBox.merge([b for j, b in to_merge] + [box])
+                commands[i] = box.to_command(command[1])
+            writes.append((i, box))
+        return [command for command in commands if command is not None]
+
+    def _merge_draws(self, commands, parser):
+        """ Merge runs of DRAW commands that draw ranges of vertices with
+        the same program and mode into one command with arrays of ranges.
+        Remote parsers get such commands split into single draws instead.
+        """
+        if not any(_is_range_draw(command) for command in commands):
+            return commands
+        result = []
+        try:
+            remote = parser.is_remote()
+        except NotImplementedError:
+            remote = True  # unknown parser; only send plain draws
+        if remote:
+            for command in commands:
+                if _is_range_draw(command) and \
+                        isinstance(command[3][0], np.ndarray):
+                    result.extend(command[:3] + ((int(first), int(count)),)
+                                  for first, count in zip(*command[3]))
+                else:
+                    result.append(command)
+            return result
+        run = []  # selections of the DRAW commands in the current run
+        for command in commands + [None]:
+            if run and not (command is not None and
+                            _is_range_draw(command) and
+                            command[1:3] == result[-1][1:3]):
+                # End of a run; the first command of the run draws it all
+                if len(run) > 1:
+                    firsts = np.concatenate([np.ravel(r[0]) for r in run])
+                    counts = np.concatenate([np.ravel(r[1]) for r in run])
+                    result[-1] = result[-1][:3] + ((firsts.astype(np.int32),
+                                                    counts.astype(np.int32)),)
+                run = []
+            if command is None:
+                break
+            if _is_range_draw(command):
+                if not run:
+                    result.append(command)
+                run.append(command[3])
+            else:
+                result.append(command)
+        return result
+
+
+def _is_range_draw(command):
+    """ Whether the command draws (a list of) ranges of vertices.
+    """
+    return command[0] == 'DRAW' and len(command) == 4 and len(command[3]) == 2
+
+
+class _DataBox(object):
+    """ The region written by a DATA command. For buffers this is a
+    range of bytes, for textures a box of texels along the texture axes.
+    """
+
+    def __init__(self, start, data, is_buffer):
+        self.start = tuple(start)
+        self.stop = tuple(s + n for s, n in zip(start, data.shape))
+        self.data = data
+        self.is_buffer = is_buffer
+
+    @classmethod
+    def from_command(cls, command):
+        if len(command) != 4 or not isinstance(command[3], np.ndarray):
+            return None
+        offset, data = command[2], command[3]
+        if data.size == 0:
+            return None
+        if isinstance(offset, (tuple, list)):  # texture
+            if data.ndim < len(offset):
+                return None
+            return cls(offset, data, False)
+        else:  # buffer
+            data = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+            return cls((offset,), data, True)
+
+    def overlaps(self, other):
+        return all(s1 < e2 and s2 < e1 for s1, e1, s2, e2 in
+                   zip(self.start, self.stop, other.start, other.stop))
+
+    def contains(self, other):
+        return all(s1 <= s2 and e2 <= e1 for s1, e1, s2, e2 in
+                   zip(self.start, self.stop, other.start, other.stop))
+
+    def can_merge(self, other):
+        """ Whether both boxes together form one box along the first
+        axis, with data of the same kind.
+        """
+        n = len(self.start)
+        return (self.is_buffer == other.is_buffer and
+                self.data.dtype == other.data.dtype and
+                self.data.shape[n:] == other.data.shape[n:] and
+                self.start[1:] == other.start[1:] and
+                self.stop[1:] == other.stop[1:] and
+                self.start[0] <= other.stop[0] and
+                other.start[0] <= self.stop[0])
+
+    @classmethod
+    def merge(cls, boxes):
+        """ Merge boxes into one; later boxes overwrite earlier ones.
+        """
+        first = boxes[0]
+        start = min(b.start[0] for b in boxes)
+        stop = max(b.stop[0] for b in boxes)
+        shape = (stop - start,) + first.data.shape[1:]
+        data = np.empty(shape, first.data.dtype)
+        for b in boxes:
+            data[b.start[0] - start:b.stop[0] - start] = b.data
+        return cls((start,) + first.start[1:], data, first.is_buffer)
+
+    def to_command(self, id_):
+        offset = self.start[0] if self.is_buffer else self.start
+        return ('DATA', id_, offset, self.data)
 
 
 class GlirQueue(object):
@@ -546,6 +816,14 @@ class GlirQueue(object):
         """
         return self._shared.clear()
 
+    def reset_state(self):
+        """ Forget the GL state recorded for this queue. Until it is set
+        again, state-setting FUNC commands are sent even if they seem to be
+        redundant. Use this when the GL state may have been changed by other
+        means than this queue.
+        """
+        self._shared.reset_state()
+
     def associate(self, queue):
         """Merge this queue with another.
 
@@ -557,7 +835,10 @@ class GlirQueue(object):
             return
 
         # merge commands
-        self._shared._commands.extend(queue.clear())
+        commands = queue.clear()
+        if any(command[0] == 'FUNC' for command in commands):
+            self._shared.reset_state()
+        self._shared._commands.extend(commands)
         self._shared._verbose |= queue._shared._verbose
         self._shared._associations[queue] = None
         # update queue and all related queues to use the same _shared object
@@ -572,6 +853,24 @@ class GlirQueue(object):
         self._shared.flush(parser)
 
 
+def _command_repr(command):
+    """ Get a short representation of a command, with arrays and
+    shader code abbreviated.
+    """
+    t = []
+    for e in command:
+        if isinstance(e, np.ndarray):
+            t.append('array %s' % str(e.shape))
+        elif isinstance(e, str):
+            s = e.strip()
+            if len(s) > 20:
+                s = s[:18] + '... %i lines' % (e.count('\n')+1)
+            t.append(s)
+        else:
+            t.append(e)
+    return tuple(t)
+
+
 def _convert_es2_shader(shader):
     has_version = False
     has_prec_float = False
@@ -666,6 +965,11 @@ class BaseGlirParser(object):
         self.capabilities = dict(
             gl_version='Unknown',
             max_texture_size=None,
+            vertex_array_objects=None,
+            uniform_buffers=None,
+            instanced_drawing=None,
+            program_binary=None,
+            vertex_float_textures=None,
         )
 
     def is_remote(self):
@@ -686,6 +990,12 @@ class BaseGlirParser(object):
         """
         raise NotImplementedError()
 
+    def reset_state(self):
+        """ Forget any record of the GL state that is kept to skip
+        redundant calls.
+        """
+        pass
+
 
 class GlirParser(BaseGlirParser):
     """ A class for interpreting GLIR commands using gloo.gl
@@ -706,7 +1016,9 @@ class GlirParser(BaseGlirParser):
                           'GeometryShader': GlirGeometryShader,
                           'Program': GlirProgram,
                           'VertexBuffer': GlirVertexBuffer,
+                          'StreamingVertexBuffer': GlirStreamingVertexBuffer,
                           'IndexBuffer': GlirIndexBuffer,
+                          'UniformBuffer': GlirUniformBuffer,
                           'Texture1D': GlirTexture1D,
                           'Texture2D': GlirTexture2D,
                           'Texture3D': GlirTexture3D,
@@ -714,12 +1026,29 @@ class GlirParser(BaseGlirParser):
                           'FrameBuffer': GlirFrameBuffer,
                           }
 
+        # Linked programs by shader code, so that identical programs
+        # share one GL program object
+        self._program_cache = {}
+        self._gl_renderer = ''
+
         # We keep a dict that the GLIR objects use for storing
         # per-context information. This dict is cleared each time
         # that the context is made current. This seems necessary for
         # when two Canvases share a context.
         self.env = {}
 
+        # Number of state-setting GL calls that were issued or skipped
+        # because the shadow state showed they were redundant.
+        self._state_stats = dict(issued=0, skipped=0)
+
+        # In production mode GL errors are checked once per flush (or
+        # every few flushes) instead of around each draw. We keep the
+        # commands since the last check to be able to report them.
+        self.check_draw_errors = True
+        self._unchecked_commands = []
+        self._unchecked_flushes = 0
+        self._check_each_command = False
+
     @property
     def shader_compatibility(self):
         """Type of shader compatibility """
@@ -745,6 +1074,8 @@ class GlirParser(BaseGlirParser):
         elif cmd == 'FUNC':
             # GL function call
             args = [as_enum(a) for a in args]
+            if id_ in _STATE_FUNCS and self._state_is_set(id_, args):
+                return
             try:
                 getattr(gl, id_)(*args)
             except AttributeError:
@@ -782,6 +1113,8 @@ class GlirParser(BaseGlirParser):
                 ob.set_uniform(*args)
             elif cmd == 'ATTRIBUTE':  # Program
                 ob.set_attribute(*args)
+            elif cmd == 'UNIFORM_BLOCK':  # Program
+                ob.set_uniform_block(*args)
             elif cmd == 'DATA':  # VertexBuffer, IndexBuffer, Texture, Shader
                 ob.set_data(*args)
             elif cmd == 'SIZE':  # VertexBuffer, IndexBuffer,
@@ -814,14 +1147,179 @@ class GlirParser(BaseGlirParser):
         for id_ in to_delete:
             self._objects.pop(id_)
 
+        production = config['production']
+        self.check_draw_errors = not production
         for command in commands:
             self._parse(command)
+            if self._check_each_command:
+                gl.check_error('after GLIR command %r'
+                               % (_command_repr(command),))
+        if production and not self._check_each_command:
+            self._check_flush_errors(commands)
+
+    def _check_flush_errors(self, commands):
+        """ Check for GL errors once every few flushes (production mode).
+
+        When an error is found, the commands since the last check are
+        reported, and the parser switches to checking after each command
+        so that a recurring error is attributed to the command at fault.
+        """
+        self._unchecked_commands.extend(commands)
+        self._unchecked_flushes += 1
+        if self._unchecked_flushes < config['error_check_interval']:
+            return
+        unchecked = self._unchecked_commands
+        self._unchecked_commands = []
+        self._unchecked_flushes = 0
+        try:
+            gl.check_error('production check')
+        except RuntimeError as err:
+            self._check_each_command = True
+            draws = [_command_repr(c) for c in unchecked if c[0] == 'DRAW']
+            new_err = RuntimeError(
+                '%s\nThe error was caused by one of the %i GLIR commands '
+                'since the last check, which include these draws:\n  %s\n'
+                'From now on errors are checked after each command.'
+                % (err, len(unchecked), '\n  '.join(map(repr, draws))))
+            new_err.errors, new_err.err = err.errors, err.err
+            raise new_err
 
     def get_object(self, id_):
         """ Get the object with the given id or None if it does not exist.
         """
         return self._objects.get(id_, None)
 
+    def _state_is_set(self, funcname, args):
+        """ Check the shadow state of the current context and record the
+        new value. Returns True if the GL call would be redundant.
+        """
+        key, value = _state_key(funcname, args)
+        state = self.env.setdefault('state', {})
+        if key in state and state[key] == value:
+            return self.count_state_call(True)
+        state[key] = value
+        return self.count_state_call(False)
+
+    def count_state_call(self, skipped):
+        """ Record that a state-setting GL call was skipped or issued.
+        Returns ``skipped`` so it can be used inline.
+        """
+        self._state_stats['skipped' if skipped else 'issued'] += 1
+        return skipped
+
+    def reset_state(self):
+        """ Forget the shadow copy of the GL state, so that the next
+        state-setting calls are all issued. Use this when the GL state may
+        have been changed by other means than GLIR.
+        """
+        self.env.pop('state', None)
+
+    def get_state_stats(self, reset=False):
+        """ Get the number of redundant GL calls that were skipped
+
+        Covers state-setting FUNC commands, uniforms, textures and
+        attributes.
+
+        Parameters
+        ----------
+        reset : bool
+            Whether to reset the counters after reading them.
+
+        Returns
+        -------
+        stats : dict
+            Dictionary with the number of 'issued' and 'skipped' calls.
+        """
+        stats = dict(self._state_stats)
+        if reset:
+            self._state_stats = dict(issued=0, skipped=0)
+        return stats
+
+    def program_binary_file(self, key):
+        """ Get the file in the program binary cache for a program
+
+        Parameters
+        ----------
+        key : tuple
+            Tuple of (shader type, code) pairs that identifies the program.
+
+        Returns
+        -------
+        filename : str | None
+            The path of the file, or None if the cache is disabled (the
+            ``shader_cache_dir`` config option is empty) or not supported
+            (it needs OpenGL 4.1 and the gl+ backend).
+        """
+        directory = config['shader_cache_dir']
+        if not directory or not self.capabilities['program_binary']:
+            return None
+        # Binaries are only valid for the driver that produced them
+        sha = hashlib.sha1()
+        for part in (self.capabilities['gl_version'], self._gl_renderer):
+            sha.update(part.encode('utf-8'))
+        for type_, code in key:
+            sha.update(('%i\n%s' % (type_, code)).encode('utf-8'))
+        return op.join(directory, sha.hexdigest() + '.bin')
+
+    def load_program_binary(self, handle, key):
+        """ Load a program from the program binary cache
+
+        Parameters
+        ----------
+        handle : int
+            The GL program object to load the binary into.
+        key : tuple
+            Tuple of (shader type, code) pairs that identifies the program.
+
+        Returns
+        -------
+        loaded : bool
+            Whether the program was loaded and is linked.
+        """
+        filename = self.program_binary_file(key)
+        if filename is None or not op.isfile(filename):
+            return False
+        try:
+            with open(filename, 'rb') as fid:
+                data = fid.read()
+        except (IOError, OSError):
+            return False
+        binary = np.frombuffer(data, np.uint8, offset=4)
+        format_ = struct.unpack('<I', data[:4])[0]
+        gl.glProgramBinary(handle, format_, binary, binary.size)
+        # The driver rejects binaries of e.g. an older driver version
+        if not gl.glGetProgramParameter(handle, gl.GL_LINK_STATUS):
+            logger.debug('Ignoring outdated program binary %s' % filename)
+            return False
+        return True
+
+    def save_program_binary(self, handle, key):
+        """ Store a linked program in the program binary cache (if enabled)
+
+        Parameters
+        ----------
+        handle : int
+            The linked GL program object.
+        key : tuple
+            Tuple of (shader type, code) pairs that identifies the program.
+        """
+        filename = self.program_binary_file(key)
+        if filename is None:
+            return
+        length = gl.glGetProgramParameter(handle, GL_PROGRAM_BINARY_LENGTH)
+        binary = np.zeros(length, np.uint8)
+        size = np.zeros(1, np.int32)
+        format_ = np.zeros(1, np.uint32)
+        gl.glGetProgramBinary(handle, length, size, format_, binary)
+        try:
+            if not op.isdir(op.dirname(filename)):
+                os.makedirs(op.dirname(filename))
+            with open(filename, 'wb') as fid:
+                fid.write(struct.pack('<I', int(format_[0])))
+                fid.write(binary[:size[0]].tobytes())
+        except (IOError, OSError) as err:
+            logger.warning('Could not write program binary cache: %s' % err)
+
     def _gl_initialize(self):
         """ Deal with compatibility; desktop does not have sprites
         enabled by default. ES has.
@@ -840,12 +1338,49 @@ class GlirParser(BaseGlirParser):
                 gl.glGetParameter(gl.GL_MAX_TEXTURE_SIZE)
             this_version = self.capabilities['gl_version'].split(' ')[0]
             this_version = LooseVersion(this_version)
+            # VAOs need GL 3.0 and a gl backend that exposes them (gl+).
+            # They are not shared between contexts, so GLShared disables
+            # them when more than one context uses this parser.
+            if self.capabilities['vertex_array_objects'] is None:
+                self.capabilities['vertex_array_objects'] = bool(
+                    hasattr(gl, 'glGenVertexArrays') and
+                    this_version >= '3.0')
+            self.capabilities['uniform_buffers'] = bool(
+                hasattr(gl, 'glUniformBlockBinding') and
+                this_version >= '3.1')
+            self.capabilities['instanced_drawing'] = bool(
+                hasattr(gl, 'glVertexAttribDivisor') and
+                this_version >= '3.3')
+            self.capabilities['program_binary'] = bool(
+                hasattr(gl, 'glProgramBinary') and
+                this_version >= '4.1')
+            self.capabilities['vertex_float_textures'] = \
+                self._get_vertex_float_textures(this_version)
+            if self.capabilities['program_binary']:
+                self._gl_renderer = gl.glGetParameter(gl.GL_RENDERER)
             if this_version < '2.1':
                 if os.getenv('VISPY_IGNORE_OLD_VERSION', '').lower() != 'true':
                     logger.warning('OpenGL version 2.1 or higher recommended, '
                                    'got %s. Some functionality may fail.'
                                    % self.capabilities['gl_version'])
 
+    def _get_vertex_float_textures(self, version):
+        """ Whether float textures (with sized internal formats such as
+        rgba32f) can be sampled in vertex shaders. ES 2.0 and WebGL
+        guarantee neither.
+        """
+        if '.es' in gl.current_backend.__name__:
+            return False
+        try:
+            if not gl.glGetParameter(gl.GL_MAX_VERTEX_TEXTURE_IMAGE_UNITS):
+                return False
+            if version >= '3.0':
+                return True
+            extensions = gl.glGetParameter(gl.GL_EXTENSIONS) or ''
+        except Exception:
+            return False
+        return 'GL_ARB_texture_float' in extensions
+
 
 def glir_logger(parser_cls, file_or_filename):
     from ..util.logs import NumPyJSONEncoder
@@ -903,6 +1438,14 @@ class GlirShader(GlirObject):
 
     def create(self):
         self._handle = gl.glCreateShader(self._target)
+        self._code = None
+        self._compiled = False
+
+    @property
+    def code(self):
+        """ The (converted) source code of the shader.
+        """
+        return self._code
 
     def set_data(self, offset, code):
         # NOTE: offset will always be 0 to match other DATA commands
@@ -912,14 +1455,25 @@ class GlirShader(GlirObject):
         if convert:
             code = convert_shader(convert, code)
 
-        gl.glShaderSource(self._handle, code)
+        # Compiling is deferred until a program is linked, so that it can
+        # be skipped if an identical program was linked before
+        self._code = code
+        self._compiled = False
+
+    def compile(self):
+        """ Compile the shader, unless it was compiled already.
+        """
+        if self._compiled:
+            return
+        gl.glShaderSource(self._handle, self._code)
         gl.glCompileShader(self._handle)
         status = gl.glGetShaderParameter(self._handle, gl.GL_COMPILE_STATUS)
         if not status:
             errors = gl.glGetShaderInfoLog(self._handle)
-            errormsg = self._get_error(code, errors, 4)
+            errormsg = self._get_error(self._code, errors, 4)
             raise RuntimeError("Shader compilation error in %s:\n%s" %
                                (self._target, errormsg))
+        self._compiled = True
 
     def delete(self):
         gl.glDeleteShader(self._handle)
@@ -997,6 +1551,29 @@ class GlirGeometryShader(GlirShader):
         GlirShader.__init__(self, *args, **kwargs)
 
 
+GL_PROGRAM_BINARY_RETRIEVABLE_HINT = \
+    gl.Enum('GL_PROGRAM_BINARY_RETRIEVABLE_HINT', 33367)
+GL_PROGRAM_BINARY_LENGTH = gl.Enum('GL_PROGRAM_BINARY_LENGTH', 34625)
+
+
+class _LinkedProgram(object):
+    """ A linked GL program object, shared by all GlirProgram objects
+    (of one parser) that have identical shader code.
+
+    Uniform values are part of the GL program object, so the programs
+    that share it take turns: the owner is the program whose uniforms are
+    currently in GL, and ``values`` holds what GL has for each uniform.
+    """
+
+    def __init__(self, handle, key, variables):
+        self.handle = handle
+        self.key = key
+        self.variables = variables  # active attributes and uniforms
+        self.refs = 1
+        self.owner = None
+        self.values = {}  # name -> value key of what is set in GL
+
+
 class GlirProgram(GlirObject):
 
     UTYPEMAP = {
@@ -1041,16 +1618,61 @@ class GlirProgram(GlirObject):
         self._attached_shaders = []
         self._validated = False
         self._linked = False
+        self._linked_program = None  # the (possibly shared) _LinkedProgram
         # Keeping track of uniforms/attributes
         self._handles = {}  # cache with handles to attributes/uniforms
         self._unset_variables = set()
         # Store samplers in buffers that are bount to uniforms/attributes
         self._samplers = {}  # name -> (tex-target, tex-handle, unit)
-        self._attributes = {}  # name -> (vbo-handle, attr-handle, func, args)
+        # name -> (vbo, attr-handle, func, args, divisor)
+        self._attributes = {}
+        self._streaming = {}  # name -> streaming vbo of the attribute
+        self._divisors_set = False  # whether we left divisors in GL state
         self._known_invalid = set()  # variables that we know are invalid
+        self._values = {}  # name -> last value, to skip redundant calls
+        self._uniforms = {}  # name -> (value key, func, args) of GL calls
+        self._blocks = {}  # name -> (ubo, binding point)
+        # Vertex array object that caches the attribute bindings
+        self._vao = None
+        self._vao_valid = False
 
     def delete(self):
-        gl.glDeleteProgram(self._handle)
+        self._delete_vao()
+        if self._linked_program is not None:
+            self._release_program()
+        else:
+            self._delete_program(self._handle)
+
+    def _delete_program(self, handle):
+        gl.glDeleteProgram(handle)
+        # The handle may be reused for a new program
+        if self._parser.env.get('current_program', False) == handle:
+            del self._parser.env['current_program']
+
+    def _release_program(self):
+        """ Stop using the linked program; delete it if it is not used by
+        another program.
+        """
+        entry = self._linked_program
+        self._linked_program = None
+        self._handle = None
+        entry.refs -= 1
+        if entry.owner is self:
+            entry.owner = None
+        if entry.refs == 0:
+            del self._parser._program_cache[entry.key]
+            self._delete_program(entry.handle)
+
+    def _delete_vao(self):
+        if self._vao is not None:
+            gl.glDeleteVertexArrays(1, [self._vao])
+        self._vao = None
+        self._vao_valid = False
+
+    def invalidate_vao(self):
+        """ Mark the attribute bindings stored in the VAO as outdated.
+        """
+        self._vao_valid = False
 
     def activate(self):
         """ Avoid overhead in calling glUseProgram with same arg.
@@ -1085,18 +1707,64 @@ class GlirProgram(GlirObject):
         self.link_program()
 
     def attach(self, id_):
-        """ Attach a shader to this program.
+        """ Attach a shader to this program. The shader is compiled and
+        attached to the GL program object when the program is linked.
         """
         shader = self._parser.get_object(id_)
-        gl.glAttachShader(self._handle, shader.handle)
         self._attached_shaders.append(shader)
 
     def link_program(self):
         """ Link the complete program and check.
 
-        All shaders are detached and deleted if the program was successfully
-        linked.
+        Linked programs are cached per parser (i.e. per share group) by
+        their shader code: if an identical program was linked before, its
+        GL program object is used and the shaders are not compiled. All
+        shaders are detached and can be deleted after linking.
+        """
+        shaders = self._attached_shaders
+        self._attached_shaders = []
+        key = tuple((int(shader._target), shader.code) for shader in shaders)
+        entry = self._parser._program_cache.get(key)
+        if entry is not None:
+            entry.refs += 1  # before releasing, in case it is our own
+        if self._linked_program is not None:
+            self._release_program()
+        if entry is None:
+            if self._handle is None:
+                self._handle = gl.glCreateProgram()
+            self._link(shaders, key)
+            # Now we know what variables will be used by the program
+            entry = _LinkedProgram(self._handle, key,
+                                   self._get_active_attributes_and_uniforms())
+            self._parser._program_cache[key] = entry
+        else:
+            if self._handle is not None:
+                self._delete_program(self._handle)
+            self._handle = entry.handle
+        self._linked_program = entry
+
+        self._unset_variables = set(entry.variables)
+        self._handles = {}
+        self._known_invalid = set()
+        self._values = {}
+        self._uniforms = {}
+        self._blocks = {}
+        self._delete_vao()  # attribute locations may have changed
+        self._linked = True
+
+    def _link(self, shaders, key):
+        """ Compile the shaders and link them into our GL program object,
+        or load the program from the on-disk program binary cache.
         """
+        if self._parser.load_program_binary(self._handle, key):
+            return
+        for shader in shaders:
+            shader.compile()
+            gl.glAttachShader(self._handle, shader.handle)
+        if self._parser.program_binary_file(key) is not None:
+            gl.glProgramParameteri(self._handle,
+                                   GL_PROGRAM_BINARY_RETRIEVABLE_HINT,
+                                   gl.GL_TRUE)
         gl.glLinkProgram(self._handle)
         if not gl.glGetProgramParameter(self._handle, gl.GL_LINK_STATUS):
             raise RuntimeError('Program linking error:\n%s'
@@ -1104,15 +1772,9 @@ class GlirProgram(GlirObject):
 
         # Detach all shaders to prepare them for deletion (they are no longer
         # needed after linking is complete)
-        for shader in self._attached_shaders:
+        for shader in shaders:
             gl.glDetachShader(self._handle, shader.handle)
-        self._attached_shaders = []
-
-        # Now we know what variables will be used by the program
-        self._unset_variables = self._get_active_attributes_and_uniforms()
-        self._handles = {}
-        self._known_invalid = set()
-        self._linked = True
+        self._parser.save_program_binary(self._handle, key)
 
     def _get_active_attributes_and_uniforms(self):
         """ Retrieve active attributes and uniforms to be able to check that
@@ -1146,6 +1808,8 @@ class GlirProgram(GlirObject):
         """
         if not self._linked:
             raise RuntimeError('Cannot set uniform when program has no code')
+        if self._parser.count_state_call(self._values.get(name) == value):
+            return
         # Get handle for the uniform, first try cache
         handle = self._handles.get(name, -1)
         if handle < 0:
@@ -1159,26 +1823,67 @@ class GlirProgram(GlirObject):
                 logger.info('Not setting texture data for variable %s; '
                             'uniform is not active.' % name)
                 return
-        # Program needs to be active in order to set uniforms
-        self.activate()
-        if True:
-            # Sampler: the value is the id of the texture
-            tex = self._parser.get_object(value)
-            if tex == JUST_DELETED:
+        # Sampler: the value is the id of the texture
+        tex = self._parser.get_object(value)
+        if tex == JUST_DELETED:
+            return
+        if tex is None:
+            raise RuntimeError('Could not find texture with id %i' % value)
+        unit = len(self._samplers)
+        if name in self._samplers:
+            unit = self._samplers[name][-1]  # Use existing unit
+        self._samplers[name] = tex._target, tex.handle, unit
+        self._values[name] = value
+        self._set_program_value(name, ('unit', unit), gl.glUniform1i,
+                                handle, unit)
+
+    def set_uniform_block(self, name, value):
+        """ Link a uniform block. Value is the id of the uniform buffer.
+        """
+        if not self._linked:
+            raise RuntimeError('Cannot set uniform block when program has '
+                               'no code')
+        if self._parser.count_state_call(self._values.get(name) == value):
+            return
+        # Get index of the block, first try cache
+        index = self._handles.get(name, -1)
+        if index < 0:
+            if name in self._known_invalid:
+                return
+            index = gl.glGetUniformBlockIndex(self._handle,
+                                              name.encode('utf-8'))
+            if index == GL_INVALID_INDEX:
+                index = -1
+            self._handles[name] = index  # Store in cache
+            if index < 0:
+                self._known_invalid.add(name)
+                logger.info('Not setting uniform buffer for block %s; '
+                            'block is not active.' % name)
                 return
-            if tex is None:
-                raise RuntimeError('Could not find texture with id %i' % value)
-            unit = len(self._samplers)
-            if name in self._samplers:
-                unit = self._samplers[name][-1]  # Use existing unit
-            self._samplers[name] = tex._target, tex.handle, unit
-            gl.glUniform1i(handle, unit)
+        ubo = self._parser.get_object(value)
+        if ubo == JUST_DELETED:
+            return
+        if ubo is None:
+            raise RuntimeError('Could not find uniform buffer with id %i'
+                               % value)
+        binding = len(self._blocks)
+        if name in self._blocks:
+            binding = self._blocks[name][-1]  # Use existing binding point
+        self._blocks[name] = ubo, binding
+        self._values[name] = value
+        self._set_program_value(name, ('binding', binding),
+                                gl.glUniformBlockBinding, self._handle,
+                                index, binding)
 
     def set_uniform(self, name, type_, value):
         """ Set a uniform value. Value is assumed to have been checked.
         """
         if not self._linked:
             raise RuntimeError('Cannot set uniform when program has no code')
+        # Skip if the value is the same as last time
+        key = type_, np.asarray(value).tobytes()
+        if self._parser.count_state_call(self._values.get(name) == key):
+            return
         # Get handle for the uniform, first try cache
         handle = self._handles.get(name, -1)
         count = 1
@@ -1204,22 +1909,50 @@ class GlirProgram(GlirObject):
         # Look up function to call
         funcname = self.UTYPEMAP[type_]
         func = getattr(gl, funcname)
-        # Program needs to be active in order to set uniforms
-        self.activate()
+        self._values[name] = key
         # Triage depending on type
         if type_.startswith('mat'):
             # Value is matrix, these gl funcs have alternative signature
             transpose = False  # OpenGL ES 2.0 does not support transpose
-            func(handle, 1, transpose, value)
+            self._set_program_value(name, key, func,
+                                    handle, 1, transpose, value)
         else:
             # Regular uniform
-            func(handle, count, value)
+            self._set_program_value(name, key, func, handle, count, value)
+
+    def _set_program_value(self, name, key, func, *args):
+        """ Set a uniform (or sampler unit or block binding) of the GL
+        program object. If another program that shares the GL program
+        object owns it, the call is made when we draw.
+        """
+        self._uniforms[name] = key, func, args
+        entry = self._linked_program
+        if entry.owner is self and entry.values.get(name) != key:
+            # Program needs to be active in order to set uniforms
+            self.activate()
+            func(*args)
+            entry.values[name] = key
+
+    def _claim_program(self):
+        """ Become the owner of the shared GL program object by setting
+        our uniforms that differ from those of the previous owner.
+        """
+        entry = self._linked_program
+        entry.owner = self
+        values = entry.values
+        for name, (key, func, args) in self._uniforms.items():
+            if values.get(name) != key:
+                func(*args)
+                values[name] = key
 
     def set_attribute(self, name, type_, value):
         """ Set an attribute value. Value is assumed to have been checked.
         """
         if not self._linked:
             raise RuntimeError('Cannot set attribute when program has no code')
+        if self._parser.count_state_call(
+                self._values.get(name) == (type_, tuple(value))):
+            return
         # Get handle for the attribute, first try cache
         handle = self._handles.get(name, -1)
         if handle < 0:
@@ -1243,10 +1976,16 @@ class GlirProgram(GlirObject):
             funcname = self.ATYPEMAP[type_]
             func = getattr(gl, funcname)
             # Set data
-            self._attributes[name] = 0, handle, func, value[1:]
+            self._attributes[name] = 0, handle, func, value[1:], 0
+            self._values[name] = type_, tuple(value)
+            self._streaming.pop(name, None)
         else:
             # Get meta data
-            vbo_id, stride, offset = value
+            vbo_id, stride, offset = value[:3]
+            divisor = value[3] if len(value) > 3 else 0
+            if divisor and not self._parser.capabilities['instanced_drawing']:
+                raise RuntimeError('Per-instance attribute %r needs '
+                                   'OpenGL 3.3 and the gl+ backend' % name)
             size, gtype, dtype = self.ATYPEINFO[type_]
             # Get associated VBO
             vbo = self._parser.get_object(vbo_id)
@@ -1257,28 +1996,69 @@ class GlirProgram(GlirObject):
             # Set data
             func = gl.glVertexAttribPointer
             args = size, gtype, gl.GL_FALSE, stride, offset
-            self._attributes[name] = vbo.handle, handle, func, args
+            self._attributes[name] = vbo, handle, func, args, divisor
+            self._values[name] = type_, tuple(value)
+            vbo.add_program(self)
+            if isinstance(vbo, GlirStreamingVertexBuffer):
+                self._streaming[name] = vbo
+            else:
+                self._streaming.pop(name, None)
+        self._vao_valid = False
 
     def _pre_draw(self):
         self.activate()
+        if self._linked_program.owner is not self:
+            self._claim_program()
         # Activate textures
         for tex_target, tex_handle, unit in self._samplers.values():
             gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
             gl.glBindTexture(tex_target, tex_handle)
+        # Bind uniform buffers
+        for ubo, binding in self._blocks.values():
+            ubo.bind_base(binding)
         # Activate attributes
-        for vbo_handle, attr_handle, func, args in self._attributes.values():
-            if vbo_handle:
-                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vbo_handle)
+        if self._parser.capabilities['vertex_array_objects']:
+            if self._vao is None:
+                self._vao = gl.glGenVertexArrays(1)
+            gl.glBindVertexArray(self._vao)
+            if self._vao_valid:
+                # Only the constant attributes are not stored in the VAO
+                for vbo, attr_handle, func, args, _ in \
+                        self._attributes.values():
+                    if not vbo:
+                        func(attr_handle, *args)
+            else:
+                self._vao_valid = True
+                self._bind_attributes()
+        else:
+            self._bind_attributes()
+        # The GPU reads the current segment of streaming buffers
+        for vbo in self._streaming.values():
+            vbo.mark_used()
+        # Validate. We need to validate after textures units get assigned
+        if not self._validated:
+            self._validated = True
+            self._validate()
+
+    def _bind_attributes(self):
+        for vbo, attr_handle, func, args, divisor in \
+                self._attributes.values():
+            if vbo:
+                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vbo.handle)
                 gl.glEnableVertexAttribArray(attr_handle)
+                if vbo.base_offset:
+                    args = args[:-1] + (args[-1] + vbo.base_offset,)
                 func(attr_handle, *args)
+                # A VAO may hold the divisor of a previous binding
+                if divisor or (self._vao is not None and
+                               self._parser.capabilities['instanced_drawing']):
+                    gl.glVertexAttribDivisor(attr_handle, divisor)
+                if divisor and self._vao is None:
+                    self._divisors_set = True
             else:
                 gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
                 gl.glDisableVertexAttribArray(attr_handle)
                 func(attr_handle, *args)
-        # Validate. We need to validate after textures units get assigned
-        if not self._validated:
-            self._validated = True
-            self._validate()
 
     def _validate(self):
         # Validate ourselves
@@ -1293,6 +2073,17 @@ class GlirProgram(GlirObject):
                                % gl.glGetProgramInfoLog(self._handle))
 
     def _post_draw(self):
+        # Unbind the VAO so that later buffer binds do not end up in it
+        if self._vao is not None:
+            gl.glBindVertexArray(0)
+        # Without a VAO the divisors are global state; reset them so that
+        # other programs get per-vertex attributes
+        if self._divisors_set:
+            self._divisors_set = False
+            for vbo, attr_handle, func, args, divisor in \
+                    self._attributes.values():
+                if divisor:
+                    gl.glVertexAttribDivisor(attr_handle, 0)
         # No need to deactivate each texture/buffer, just set to 0
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
         gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
@@ -1304,35 +2095,69 @@ class GlirProgram(GlirObject):
         #apps it would not even make sense.
         #self.deactivate()
 
-    def draw(self, mode, selection):
+    def draw(self, mode, selection, instances=None):
         """ Draw program in given mode, with given selection (IndexBuffer or
-        first, count).
+        first, count), optionally as a number of instances.
         """
         if not self._linked:
             raise RuntimeError('Cannot draw program if code has not been set')
+        if instances is not None and \
+                not self._parser.capabilities['instanced_drawing']:
+            raise RuntimeError('Instanced drawing needs OpenGL 3.3 and the '
+                               'gl+ backend')
         # Init
-        gl.check_error('Check before draw')
+        if self._parser.check_draw_errors:
+            gl.check_error('Check before draw')
         mode = as_enum(mode)
         # Draw
         if len(selection) == 3:
             # Selection based on indices
             id_, gtype, count = selection
-            if count:
+            if count and instances != 0:
                 self._pre_draw()
                 ibuf = self._parser.get_object(id_)
                 ibuf.activate()
-                gl.glDrawElements(mode, count, as_enum(gtype), None)
+                if instances is None:
+                    gl.glDrawElements(mode, count, as_enum(gtype), None)
+                else:
+                    gl.glDrawElementsInstanced(mode, count, as_enum(gtype),
+                                               None, instances)
                 ibuf.deactivate()
         else:
-            # Selection based on start and count
+            # Selection based on start and count, or on arrays of these
             first, count = selection
-            if count:
+            if isinstance(first, np.ndarray):
+                self._draw_ranges(mode, first, count, instances)
+            elif count and instances != 0:
                 self._pre_draw()
-                gl.glDrawArrays(mode, first, count)
+                if instances is None:
+                    gl.glDrawArrays(mode, first, count)
+                else:
+                    gl.glDrawArraysInstanced(mode, first, count, instances)
         # Wrap up
-        gl.check_error('Check after draw')
+        if self._parser.check_draw_errors:
+            gl.check_error('Check after draw')
         self._post_draw()
 
+    def _draw_ranges(self, mode, firsts, counts, instances):
+        """ Draw several ranges of vertices, in one call if possible.
+        """
+        if instances == 0 or not counts.any():
+            return
+        self._pre_draw()
+        if instances is None and hasattr(gl, 'glMultiDrawArrays'):
+            gl.glMultiDrawArrays(mode, firsts.astype(np.int32),
+                                 counts.astype(np.int32), len(firsts))
+            return
+        # The program and its attributes are set up only once
+        for first, count in zip(firsts.tolist(), counts.tolist()):
+            if not count:
+                continue
+            if instances is None:
+                gl.glDrawArrays(mode, first, count)
+            else:
+                gl.glDrawArraysInstanced(mode, first, count, instances)
+
 
 class GlirBuffer(GlirObject):
     _target = None
@@ -1342,10 +2167,28 @@ class GlirBuffer(GlirObject):
         self._handle = gl.glCreateBuffer()
         self._buffer_size = 0
         self._bufferSubDataOk = False
+        # Programs that refer to this buffer from their VAO
+        self._programs = weakref.WeakSet()
 
     def delete(self):
+        # The GL name may be reused for a new buffer, so VAOs that refer
+        # to it must be rebuilt. Resizing with glBufferData keeps the
+        # name, which is why set_size() does not need to do this.
+        for program in self._programs:
+            program.invalidate_vao()
         gl.glDeleteBuffer(self._handle)
 
+    def add_program(self, program):
+        """ Register a program that binds this buffer as an attribute.
+        """
+        self._programs.add(program)
+
+    @property
+    def base_offset(self):
+        """ Offset in bytes of the current data in the GL buffer.
+        """
+        return 0
+
     def activate(self):
         gl.glBindBuffer(self._target, self._handle)
 
@@ -1395,6 +2238,115 @@ class GlirIndexBuffer(GlirBuffer):
     _target = gl.GL_ELEMENT_ARRAY_BUFFER
 
 
+GL_UNIFORM_BUFFER = gl.Enum('GL_UNIFORM_BUFFER', 35345)
+GL_INVALID_INDEX = 0xFFFFFFFF
+
+
+class GlirUniformBuffer(GlirBuffer):
+    """ Buffer that holds the values of a uniform block.
+
+    Programs bind it to a binding point before drawing; per context we
+    keep track of which buffer is bound to each point.
+    """
+    _target = GL_UNIFORM_BUFFER
+
+    def delete(self):
+        # The GL name may be reused, so forget where it was bound
+        bound = self._parser.env.get('uniform_buffers', {})
+        for binding, handle in list(bound.items()):
+            if handle == self._handle:
+                del bound[binding]
+        GlirBuffer.delete(self)
+
+    def bind_base(self, binding):
+        """ Bind this buffer to the given uniform buffer binding point.
+        """
+        bound = self._parser.env.setdefault('uniform_buffers', {})
+        if self._parser.count_state_call(bound.get(binding) == self._handle):
+            return
+        bound[binding] = self._handle
+        gl.glBindBufferBase(self._target, binding, self._handle)
+
+
+GL_MAP_WRITE_BIT = gl.Enum('GL_MAP_WRITE_BIT', 2)
+GL_MAP_INVALIDATE_RANGE_BIT = gl.Enum('GL_MAP_INVALIDATE_RANGE_BIT', 4)
+GL_MAP_UNSYNCHRONIZED_BIT = gl.Enum('GL_MAP_UNSYNCHRONIZED_BIT', 32)
+
+
+class GlirStreamingVertexBuffer(GlirVertexBuffer):
+    """ Vertex buffer for data that is replaced every frame.
+
+    The GL buffer holds a ring of segments that each fit the data. When
+    the data is written after a draw that used this buffer, it goes into
+    the next segment, so the driver does not have to wait until the GPU
+    is done reading the previous one. When the ring is full, the buffer is orphaned with
+    glBufferData and writing starts at the first segment again. A CPU
+    copy of the data is kept to fill a new segment on partial writes.
+
+    If the gl backend provides glMapBufferRange, segments are written
+    through an unsynchronized mapping.
+    """
+    _usage = gl.GL_STREAM_DRAW
+    _segments = 3
+
+    def create(self):
+        GlirVertexBuffer.create(self)
+        self._data = np.zeros(0, np.uint8)
+        self._base = 0  # offset of the current segment
+        self._in_use = False  # whether a draw read the current segment
+
+    @property
+    def base_offset(self):
+        return self._base
+
+    def mark_used(self):
+        """ Record that a draw reads the current segment, so that new
+        data goes into the next one.
+        """
+        self._in_use = True
+
+    def set_size(self, nbytes):
+        if nbytes != self._data.size:
+            self._data = np.zeros(nbytes, np.uint8)
+            GlirVertexBuffer.set_size(self, nbytes * self._segments)
+            self._set_base(0)
+
+    def set_data(self, offset, data):
+        data = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+        self._data[offset:offset + data.size] = data
+        if self._in_use:
+            # The current segment may still be read by the GPU
+            base = self._base + self._data.size
+            if base + self._data.size > self._buffer_size:
+                self.activate()
+                gl.glBufferData(self._target, self._buffer_size, self._usage)
+                base = 0
+            self._set_base(base)
+            self._upload(0, self._data)
+        else:
+            self._upload(offset, data)
+
+    def _set_base(self, base):
+        self._base = base
+        self._in_use = False
+        for program in self._programs:
+            program.invalidate_vao()
+
+    def _upload(self, offset, data):
+        self.activate()
+        offset += self._base
+        if hasattr(gl, 'glMapBufferRange'):
+            flags = (GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT |
+                     GL_MAP_UNSYNCHRONIZED_BIT)
+            ptr = gl.glMapBufferRange(self._target, offset, data.nbytes,
+                                      flags)
+            if ptr:
+                ctypes.memmove(ptr, data.ctypes.data, data.nbytes)
+                gl.glUnmapBuffer(self._target)
+                return
+        gl.glBufferSubData(self._target, offset, data)
+
+
 class GlirTexture(GlirObject):
     _target = None
 
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+
+"""Binary serialization of GLIR commands
+=====================================
+
+A compact wire format for sending GLIR commands to another process or
+storing them in a file. Unlike the JSON representation used by the
+notebook backends, arrays are not converted to lists or base64 strings;
+their raw bytes are stored as-is and decoded as views, so a stream can
+be written and replayed at memory bandwidth.
+
+A message consists of three parts:
+
+* A 16 byte header: the magic ``b'GLIR'``, the format version (uint16),
+  a reserved field (uint16), the size of the command table in bytes
+  (uint32) and the size of the payload in bytes (uint32). All integers
+  are little endian.
+* The command table: UTF-8 encoded JSON with a ``commands`` list and a
+  ``buffers`` list. Each array in a command is replaced by
+  ``{"buffer": <index>}``. Each buffer is described by
+  ``[<offset>, <nbytes>, <dtype>, <shape>]``, with the offset relative
+  to the start of the payload.
+* The payload: the raw (C-contiguous) bytes of all arrays. The payload
+  and each array in it start at a multiple of 16 bytes.
+
+Tuples in commands are restored as tuples; GLIR commands do not contain
+lists.
+
+The notebook backends do not use this format. They already send arrays
+as separate binary buffers next to a JSON message (see
+``vispy.app.backends._ipynb_util``), and that message is what the
+JavaScript client, which is not part of this package, decodes.
+
+Example::
+
+    data = glir_binary.encode(commands)
+    ...
+    glir_binary.parse(parser, data)
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from ..ext.six import string_types
+
+MAGIC = b'GLIR'
+VERSION = 1
+ALIGNMENT = 16
+
+_header = struct.Struct('<4sHHII')
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _dtype_to_json(dtype):
+    return dtype.str if dtype.fields is None else dtype.descr
+
+
+def _dtype_from_json(descr):
+    if isinstance(descr, string_types):
+        return np.dtype(descr)
+
+    def field(f):
+        f = [_dtype_from_json(x) if isinstance(x, list) and i == 1 else x
+             for i, x in enumerate(f)]
+        if len(f) == 3:
+            f[2] = tuple(f[2])
+        return tuple(f)
+    return np.dtype([field(f) for f in descr])
+
+
+def encode_chunks(commands):
+    """ Encode GLIR commands without copying array data.
+
+    Parameters
+    ----------
+    commands : list
+        List of GLIR commands.
+
+    Returns
+    -------
+    chunks : list
+        List of bytes-like objects (bytes and memoryviews on the arrays
+        in the commands) that together form the message. These can be
+        written to a file or socket one after another.
+    """
+    arrays = []
+    buffers = []
+    nbytes = [0]  # payload size
+
+    def convert(item):
+        if isinstance(item, (tuple, list)):
+            return [convert(x) for x in item]
+        elif isinstance(item, np.ndarray):
+            arr = np.ascontiguousarray(item)
+            offset = _align(nbytes[0])
+            buffers.append([offset, arr.nbytes, _dtype_to_json(arr.dtype),
+                            list(arr.shape)])
+            arrays.append((offset, arr))
+            nbytes[0] = offset + arr.nbytes
+            return {'buffer': len(buffers) - 1}
+        elif isinstance(item, np.generic):
+            return item.item()
+        return item
+
+    table = dict(commands=[convert(c) for c in commands], buffers=buffers)
+    table = json.dumps(table, separators=(',', ':')).encode('utf-8')
+    table += b'\x00' * (_align(_header.size + len(table)) -
+                        _header.size - len(table))
+    payload_size = _align(nbytes[0])
+
+    chunks = [_header.pack(MAGIC, VERSION, 0, len(table), payload_size),
+              table]
+    pos = 0
+    for offset, arr in arrays:
+        if offset > pos:
+            chunks.append(b'\x00' * (offset - pos))
+        chunks.append(memoryview(arr.reshape(-1).view(np.uint8)))
+        pos = offset + arr.nbytes
+    if payload_size > pos:
+        chunks.append(b'\x00' * (payload_size - pos))
+    return chunks
+
+
+def encode(commands):
+    """ Encode GLIR commands into a single bytes object.
+
+    Parameters
+    ----------
+    commands : list
+        List of GLIR commands.
+
+    Returns
+    -------
+    data : bytes
+        The encoded message.
+    """
+    return b''.join(encode_chunks(commands))
+
+
+def message_size(data, offset=0):
+    """ Get the size in bytes of the message that starts at offset.
+
+    Parameters
+    ----------
+    data : bytes-like
+        Buffer containing (at least the header of) the message.
+    offset : int
+        The position of the message in the buffer.
+
+    Returns
+    -------
+    size : int
+        The total size of the message.
+    """
+    table_size, payload_size = _read_header(data, offset)
+    return _header.size + table_size + payload_size
+
+
+def _read_header(data, offset):
+    magic, version, _, table_size, payload_size = \
+        _header.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ValueError('Not a binary GLIR message')
+    if version > VERSION:
+        raise ValueError('Unsupported binary GLIR version %i' % version)
+    return table_size, payload_size
+
+
+def decode(data, offset=0):
+    """ Decode a message into a list of GLIR commands.
+
+    Arrays in the commands are views on ``data`` (read-only if ``data``
+    is immutable), so ``data`` must not be modified while the commands
+    are in use.
+
+    Parameters
+    ----------
+    data : bytes-like
+        Buffer containing the message.
+    offset : int
+        The position of the message in the buffer.
+
+    Returns
+    -------
+    commands : list
+        List of GLIR commands.
+    """
+    table_size = _read_header(data, offset)[0]
+    start = offset + _header.size
+    table = bytes(memoryview(data)[start:start + table_size])
+    table = json.loads(table.rstrip(b'\x00').decode('utf-8'))
+    payload = start + table_size
+
+    arrays = []
+    for buf_offset, nbytes, dtype, shape in table['buffers']:
+        dtype = _dtype_from_json(dtype)
+        if nbytes:
+            arr = np.frombuffer(data, dtype, nbytes // dtype.itemsize,
+                                payload + buf_offset)
+        else:
+            arr = np.empty(0, dtype)
+        arrays.append(arr.reshape(shape))
+
+    def convert(item):
+        if isinstance(item, list):
+            return tuple(convert(x) for x in item)
+        elif isinstance(item, dict):
+            return arrays[item['buffer']]
+        return item
+
+    return [convert(c) for c in table['commands']]
+
+
+def parse(parser, data):
+    """ Decode a message and let a GLIR parser execute the commands.
+
+    Parameters
+    ----------
+    parser : instance of BaseGlirParser
+        The parser to feed the commands to.
+    data : bytes-like
+        Buffer containing one or more messages.
+    """
+    offset = 0
+    while offset < len(data):
+        parser.parse(decode(data, offset))
+        offset += message_size(data, offset)
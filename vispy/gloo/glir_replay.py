@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+
+"""Recording and replaying of GLIR command streams
+===============================================
+
+A recording contains every batch of GLIR commands that reached the
+parser, including all array data, in the binary format of
+:mod:`vispy.gloo.glir_binary`. Record a session by setting the
+``glir_record`` config option (or passing ``--vispy-glir-record=<file>``)
+before creating a canvas.
+
+A recording can be replayed against any canvas, e.g. a headless one
+(``vispy.use('osmesa')`` or the egl backend), to measure the throughput
+of the parser and the driver without running the original application::
+
+    python -m vispy.gloo.glir_replay session.glir -n 10
+"""
+
+from __future__ import division
+
+import sys
+
+from . import gl, glir_binary
+from .glir import GlirParser, JUST_DELETED
+from ..ext.six import string_types
+from ..util.ptime import time
+
+
+def glir_recorder(parser_cls, file_or_filename):
+    """ Create a parser class that records all commands to a file
+
+    Parameters
+    ----------
+    parser_cls : class
+        The parser class to extend.
+    file_or_filename : str | file
+        The file to write to. A file object must be opened in binary mode.
+
+    Returns
+    -------
+    cls : class
+        Subclass of ``parser_cls`` that writes each batch of commands to
+        the file before parsing it.
+    """
+
+    class cls(parser_cls):
+        def __init__(self, *args, **kwargs):
+            parser_cls.__init__(self, *args, **kwargs)
+
+            if isinstance(file_or_filename, string_types):
+                self._record_file = open(file_or_filename, 'wb')
+            else:
+                self._record_file = file_or_filename
+
+        def parse(self, commands):
+            for chunk in glir_binary.encode_chunks(commands):
+                self._record_file.write(chunk)
+            self._record_file.flush()
+            parser_cls.parse(self, commands)
+
+    return cls
+
+
+def load_recording(file_or_filename):
+    """ Load a recorded GLIR session
+
+    Parameters
+    ----------
+    file_or_filename : str | file
+        The recording. A file object must be opened in binary mode.
+
+    Returns
+    -------
+    batches : list
+        List of lists of GLIR commands, one list per flush.
+    """
+    if isinstance(file_or_filename, string_types):
+        with open(file_or_filename, 'rb') as f:
+            data = f.read()
+    else:
+        data = file_or_filename.read()
+    batches = []
+    offset = 0
+    while offset < len(data):
+        batches.append(glir_binary.decode(data, offset))
+        offset += glir_binary.message_size(data, offset)
+    return batches
+
+
+class _TimingGlirParser(GlirParser):
+    """ GlirParser that measures the time spent per command type.
+    """
+
+    def __init__(self, stats):
+        GlirParser.__init__(self)
+        self._stats = stats
+
+    def _parse(self, command):
+        t0 = time()
+        GlirParser._parse(self, command)
+        t1 = time()
+        count, total = self._stats.get(command[0], (0, 0.))
+        self._stats[command[0]] = count + 1, total + t1 - t0
+
+
+def replay(batches, n=1, canvas=None):
+    """ Replay a recorded GLIR session and measure the timings
+
+    Each pass uses a fresh parser, so the objects in the recording are
+    created anew, and they are deleted again at the end of the pass. The
+    time of a pass includes a final glFinish so that work queued in the
+    driver is included.
+
+    Parameters
+    ----------
+    batches : list | str | file
+        The recording, as returned by ``load_recording``, or a file
+        (name) to load it from.
+    n : int
+        The number of passes.
+    canvas : instance of Canvas | None
+        The canvas to replay in. If None, a hidden canvas is created
+        (and closed afterwards) using the current app backend.
+
+    Returns
+    -------
+    stats : dict
+        Maps each command type to a tuple (count, total time in seconds),
+        summed over all passes. The key 'passes' holds a list of the
+        wall time of each pass.
+    """
+    if not isinstance(batches, list):
+        batches = load_recording(batches)
+    own_canvas = canvas is None
+    if own_canvas:
+        from ..app import Canvas
+        canvas = Canvas(show=False)
+    stats = dict(passes=[])
+    try:
+        canvas.set_current()
+        fbo = canvas._backend._vispy_get_fb_bind_location()
+        # The recorded CURRENT commands refer to the original framebuffer
+        batches = [[('CURRENT', 0, fbo) if c[0] == 'CURRENT' else c
+                    for c in commands] for commands in batches]
+        for i in range(n):
+            parser = _TimingGlirParser(stats)
+            t0 = time()
+            for commands in batches:
+                parser.parse(commands)
+            gl.glFinish()
+            stats['passes'].append(time() - t0)
+            parser.parse([('DELETE', id_) for id_, ob in
+                          parser._objects.items() if ob != JUST_DELETED])
+    finally:
+        if own_canvas:
+            canvas.close()
+    return stats
+
+
+def format_stats(stats):
+    """ Format the result of ``replay`` as a table
+
+    Parameters
+    ----------
+    stats : dict
+        The timings returned by ``replay``.
+
+    Returns
+    -------
+    table : str
+        The timings per command type, slowest first.
+    """
+    passes = stats['passes']
+    n = max(len(passes), 1)
+    lines = ['%-14s %10s %14s %12s'
+             % ('command', 'count/pass', 'ms/pass', 'us/command')]
+    items = [(key, val) for key, val in stats.items() if key != 'passes']
+    for key, (count, total) in sorted(items, key=lambda x: -x[1][1]):
+        lines.append('%-14s %10i %14.3f %12.2f'
+                     % (key, count // n, 1e3 * total / n,
+                        1e6 * total / max(count, 1)))
+    if passes:
+        lines.append('%i passes, %.3f ms/pass (min %.3f ms)'
+                     % (len(passes), 1e3 * sum(passes) / n,
+                        1e3 * min(passes)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """ Replay a recording from the command line.
+    """
+    import argparse
+    p = argparse.ArgumentParser(description='Replay a recorded GLIR '
+                                'session and report timings per command.')
+    p.add_argument('filename', help='the recorded session')
+    p.add_argument('-n', type=int, default=1, help='number of passes')
+    p.add_argument('--app', default=None,
+                   help='app backend to use, e.g. osmesa or egl')
+    args = p.parse_args(argv)
+    if args.app:
+        from .. import use
+        use(app=args.app)
+    print(format_stats(replay(args.filename, args.n)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
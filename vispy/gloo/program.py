@@ -31,7 +31,7 @@ import re
 import numpy as np
 
 from .globject import GLObject
-from .buffer import VertexBuffer, IndexBuffer, DataBuffer
+from .buffer import VertexBuffer, IndexBuffer, DataBuffer, UniformBuffer
 from .texture import BaseTexture, Texture2D, Texture3D, Texture1D
 from ..util import logger
 from .util import check_enum
@@ -79,6 +79,8 @@ class Program(GLObject):
 
     Uniforms and attributes can be set using indexing: e.g.
     ``program['a_pos'] = pos_data`` and ``program['u_color'] = (1, 0, 0)``.
+    Uniform blocks are set to a UniformBuffer in the same way, using
+    the name of the block.
 
     Parameters
     ----------
@@ -224,7 +226,7 @@ class Program(GLObject):
         variables : list
             Each variable is represented as a tuple (kind, type, name),
             where `kind` is 'attribute', 'uniform', 'uniform_array',
-            'varying' or 'const'.
+            'uniform_block', 'varying' or 'const'.
         """
         # Note that internally the variables are stored as a dict
         # that maps names -> tuples, for easy looking up by name.
@@ -273,6 +275,12 @@ class Program(GLObject):
                 name = m.group('name')
                 self._code_variables[name] = this_kind, gtype, name, size
 
+        # Parse uniform blocks; their members are set via a buffer
+        regex = re.compile(r"\buniform\s+(?P<name>\w+)\s*\{")
+        for m in re.finditer(regex, code):
+            name = m.group('name')
+            self._code_variables[name] = 'uniform_block', 'block', name, -1
+
         # Now that our code variables are up-to date, we can process
         # the variables that were set but yet unknown.
         if update_variables:
@@ -391,6 +399,16 @@ class Program(GLObject):
                 self._user_variables[name] = data
                 self._glir.command('UNIFORM', self._id, name, type_, data)
 
+            elif kind == 'uniform_block':
+                # Uniform buffer; must be a buffer object
+                if not isinstance(data, UniformBuffer):
+                    raise TypeError('Uniform block %r needs a UniformBuffer, '
+                                    'not %r.' % (name, type(data)))
+                # Store and send GLIR command
+                self._user_variables[name] = data
+                self.glir.associate(data.glir)
+                self._glir.command('UNIFORM_BLOCK', self._id, name, data.id)
+
             elif kind == 'attribute':
                 # Is this a constant value per vertex
                 is_constant = False
@@ -422,6 +440,9 @@ class Program(GLObject):
                                              % (numel, data._last_dim, name))
                     self._user_variables[name] = data
                     value = (data.id, data.stride, data.offset)
+                    divisor = getattr(data, 'divisor', 0)
+                    if divisor:
+                        value += (divisor,)
                     self.glir.associate(data.glir)
                     self._glir.command('ATTRIBUTE', self._id,
                                        name, type_, value)
@@ -460,7 +481,8 @@ class Program(GLObject):
         else:
             raise KeyError("Unknown uniform or attribute %s" % name)
 
-    def draw(self, mode='triangles', indices=None, check_error=True):
+    def draw(self, mode='triangles', indices=None, check_error=True,
+             instances=None):
         """ Draw the attribute arrays in the specified mode.
 
         Parameters
@@ -468,10 +490,18 @@ class Program(GLObject):
         mode : str | GL_ENUM
             'points', 'lines', 'line_strip', 'line_loop', 'triangles',
             'triangle_strip', or 'triangle_fan'.
-        indices : array
-            Array of indices to draw.
+        indices : IndexBuffer | tuple | array | None
+            An IndexBuffer with the indices to draw, a tuple
+            (first, count) to draw a range of vertices, or an array of
+            shape (N, 2) with such ranges, which are drawn at once. If
+            None, all vertices are drawn.
         check_error:
             Check error after draw.
+        instances : int | None
+            If given, draw this many instances of the geometry. Attributes
+            from a VertexBuffer with a nonzero ``divisor`` then advance
+            per instance rather than per vertex. Requires OpenGL 3.3 and
+            the gl+ backend (see the 'instanced_drawing' capability).
 
         """
 
@@ -491,12 +521,18 @@ class Program(GLObject):
                         'found in the shader program.' % name)
         self._pending_variables = {}
 
-        # Check attribute sizes
+        if instances is not None:
+            instances = int(instances)
+            if instances < 0:
+                raise ValueError('Number of instances must be non-negative')
+
+        # Check attribute sizes (of per-vertex attributes)
         attributes = [vbo for vbo in self._user_variables.values()
-                      if isinstance(vbo, DataBuffer)]
+                      if isinstance(vbo, DataBuffer) and
+                      not getattr(vbo, 'divisor', 0)]
         sizes = [a.size for a in attributes]
         if len(attributes) < 1:
-            raise RuntimeError('Must have at least one attribute')
+            raise RuntimeError('Must have at least one per-vertex attribute')
         if not all(s == sizes[0] for s in sizes[1:]):
             msg = '\n'.join(['%s: %s' % (str(a), a.size) for a in attributes])
             raise RuntimeError('All attributes must have the same size, got:\n'
@@ -517,14 +553,26 @@ class Program(GLObject):
                        np.dtype(np.uint16): 'UNSIGNED_SHORT',
                        np.dtype(np.uint32): 'UNSIGNED_INT'}
             selection = indices.id, gltypes[indices.dtype], indices.size
-            canvas.context.glir.command('DRAW', self._id, mode, selection)
         elif indices is None:
             selection = 0, attributes[0].size
             logger.debug("Program drawing %r with %r" % (mode, selection))
-            canvas.context.glir.command('DRAW', self._id, mode, selection)
+        elif isinstance(indices, tuple) and len(indices) == 2:
+            selection = int(indices[0]), int(indices[1])
+        elif isinstance(indices, np.ndarray) and indices.ndim == 2 and \
+                indices.shape[1] == 2:
+            ranges = indices.astype(np.int32)
+            selection = (np.ascontiguousarray(ranges[:, 0]),
+                         np.ascontiguousarray(ranges[:, 1]))
         else:
-            raise TypeError("Invalid index: %r (must be IndexBuffer)" %
+            raise TypeError("Invalid index: %r (must be IndexBuffer, "
+                            "(first, count) tuple or array of ranges)" %
                             indices)
+        if instances is None:
+            canvas.context.glir.command('DRAW', self._id, mode, selection)
+        else:
+            canvas.context.glir.command('DRAW', self._id, mode, selection,
+                                        instances)
 
-        # Process GLIR commands
-        canvas.context.flush_commands()
+        # Process GLIR commands, unless they are collected for a batch
+        if not canvas.context.batching:
+            canvas.context.flush_commands()
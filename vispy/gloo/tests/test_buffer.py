@@ -8,7 +8,8 @@ import numpy as np
 
 from vispy.testing import run_tests_if_main
 from vispy.gloo.buffer import (Buffer, DataBuffer, DataBufferView, 
-                               VertexBuffer, IndexBuffer)
+                               VertexBuffer, StreamingVertexBuffer,
+                               IndexBuffer)
 
 
 # -----------------------------------------------------------------------------
@@ -512,6 +513,27 @@ class VertexBufferTest(unittest.TestCase):
         assert B.glsl_type == ('attribute', 'vec4')
         assert C.glsl_type == ('attribute', 'vec4')
 
+    def test_divisor(self):
+        B = VertexBuffer(np.zeros((10, 2), np.float32))
+        assert B.divisor == 0
+        B = VertexBuffer(np.zeros(10, [('a', np.float32, 2)]), divisor=2)
+        assert B.divisor == 2
+        assert B['a'].divisor == 2  # views share the divisor
+        self.assertRaises(ValueError, VertexBuffer, divisor=-1)
+
+
+# -----------------------------------------------------------------------------
+class StreamingVertexBufferTest(unittest.TestCase):
+
+    def test_init(self):
+        data = np.zeros((10, 2), np.float32)
+        B = StreamingVertexBuffer(data)
+        assert isinstance(B, VertexBuffer)
+        glir_cmds = B._glir.clear()
+        assert glir_cmds[0] == ('CREATE', B.id, 'StreamingVertexBuffer')
+        assert B.glsl_type == ('attribute', 'vec2')
+        assert B.size == 10
+
 
 # -----------------------------------------------------------------------------
 class IndexBufferTest(unittest.TestCase):
@@ -2,6 +2,8 @@
 
 import gc
 
+import numpy as np
+
 from vispy.testing import (assert_in, run_tests_if_main, assert_raises,
                            assert_equal, assert_not_equal)
 
@@ -78,10 +80,13 @@ def test_context_taking():
     c.shared.add_ref('test-foo', cb)
     assert c.shared.ref is cb
     assert_in('test-foo backend', repr(c.shared))
+    assert c.capabilities['vertex_array_objects'] is None
     
     # Now we can take it again
     c.shared.add_ref('test-foo', cb)
     assert len(c.shared._refs) == 2
+    # VAOs cannot be shared between contexts
+    assert c.capabilities['vertex_array_objects'] is False
     #assert_raises(RuntimeError, c.take, 'test', cb)
     
     # Canvas backend can delete (we use a weak ref)
@@ -118,5 +123,56 @@ def test_gloo_without_app():
     assert len(p.commands) in (2, 3)  # there may be a CURRENT command
     assert p.commands[-1][1] == 'glClear'
 
+    # Draws in a batch are flushed at the end of the batch
+    program = gloo.Program('attribute float a;', 'void main() {}')
+    program['a'] = np.zeros(4, np.float32)
+    p.commands = []
+    c.context.begin_batch()
+    c.context.begin_batch()
+    program.draw('points')
+    program.draw('points')
+    c.context.end_batch()
+    assert c.context.batching
+    assert p.commands == []
+    c.context.end_batch()
+    assert not c.context.batching
+    assert_equal([cmd[0] for cmd in p.commands if cmd[0] == 'DRAW'],
+                 ['DRAW', 'DRAW'])
+    assert_raises(RuntimeError, c.context.end_batch)
+
+
+def test_reset_state():
+    """ Test that the recorded GL state can be forgotten """
+
+    class DummyParser(gloo.glir.BaseGlirParser):
+        def __init__(self):
+            self.commands = []
+            self.n_reset = 0
+
+        def parse(self, commands):
+            self.commands.extend(commands)
+
+        def reset_state(self):
+            self.n_reset += 1
+
+    p = DummyParser()
+    c = gloo.context.FakeCanvas()
+    c.context.shared.parser = p
+    c.flush()  # make current, which also forgets the state
+
+    # Redundant state is dropped until the record is reset, e.g. after
+    # direct GL calls or at the start of a frame
+    gloo.set_state(depth_test=True)
+    c.flush()
+    p.commands = []
+    gloo.set_state(depth_test=True)
+    c.flush()
+    assert [cmd for cmd in p.commands if cmd[0] == 'FUNC'] == []
+    c.context.reset_state()
+    assert p.n_reset == 1
+    gloo.set_state(depth_test=True)
+    c.flush()
+    assert [cmd[1] for cmd in p.commands if cmd[0] == 'FUNC'] == ['glEnable']
+
 
 run_tests_if_main()
@@ -3,10 +3,14 @@
 import json
 import tempfile
 
+import numpy as np
+from numpy.testing import assert_array_equal
+
 from vispy import config
 from vispy.app import Canvas
-from vispy.gloo import glir
-from vispy.testing import requires_application, run_tests_if_main
+from vispy.gloo import gl, glir
+from vispy.testing import (requires_application, run_tests_if_main,
+                           assert_raises)
 
 
 def test_queue():
@@ -34,6 +38,63 @@ def test_queue():
     assert cmds2 == [('FOO', 1), ('SIZE', 2), ('DATA', 2), ('SIZE', 1), 
                      ('FOO', 1), ('DATA', 1), ('DATA', 1)]
 
+    # Test merging of DATA commands for buffers
+    a = np.arange(4, dtype=np.float32)
+    cmds1 = [('DATA', 1, 0, a), ('DATA', 1, 16, a + 10),
+             ('UNIFORM', 2, 'u_foo', 'float', a),
+             ('DATA', 1, 8, np.array([20, 21], np.float32))]
+    cmds2 = q._shared._filter(cmds1, parser)
+    assert [c[0] for c in cmds2] == ['UNIFORM', 'DATA']
+    assert cmds2[1][2] == 0
+    assert_array_equal(cmds2[1][3].view(np.float32),
+                       [0, 1, 20, 21, 10, 11, 12, 13])
+
+    # Writes that are overwritten later are dropped
+    cmds2 = q._shared._filter([('DATA', 1, 4, a[:2]), ('DATA', 1, 0, a)],
+                              parser)
+    assert len(cmds2) == 1 and cmds2[0][3] is a
+
+    # No merging across a draw
+    cmds1 = [('DATA', 1, 0, a), ('DRAW', 2, 'points', (0, 4)),
+             ('DATA', 1, 16, a)]
+    assert q._shared._filter(cmds1, parser) == cmds1
+
+    # Test merging of DATA commands for textures (along the first axis)
+    t1 = np.ones((2, 4, 3), np.uint8)
+    t2 = np.zeros((3, 4, 3), np.uint8)
+    cmds2 = q._shared._filter([('DATA', 3, (0, 0), t1),
+                               ('DATA', 3, (2, 0), t2)], parser)
+    assert len(cmds2) == 1
+    assert cmds2[0][2] == (0, 0)
+    assert_array_equal(cmds2[0][3][:, 0, 0], [1, 1, 0, 0, 0])
+    # Partly overlapping writes are kept in order
+    cmds1 = [('DATA', 3, (0, 0), t1), ('DATA', 3, (1, 2), t1)]
+    assert q._shared._filter(cmds1, parser) == cmds1
+
+    # Consecutive draws of ranges of one program are merged
+    cmds1 = [('DRAW', 2, 'lines', (0, 4)), ('DRAW', 2, 'lines', (4, 2)),
+             ('DRAW', 2, 'lines', (np.array([8, 20]), np.array([3, 3]))),
+             ('DRAW', 2, 'points', (0, 4)), ('UNIFORM', 2, 'u_foo', 'float', a),
+             ('DRAW', 2, 'points', (4, 4)), ('DRAW', 5, 'points', (0, 4))]
+    cmds2 = q._shared._filter(cmds1, parser)
+    assert [c[:3] for c in cmds2] == [('DRAW', 2, 'lines'),
+                                      ('DRAW', 2, 'points'),
+                                      ('UNIFORM', 2, 'u_foo'),
+                                      ('DRAW', 2, 'points'),
+                                      ('DRAW', 5, 'points')]
+    assert_array_equal(cmds2[0][3][0], [0, 4, 8, 20])
+    assert_array_equal(cmds2[0][3][1], [4, 2, 3, 3])
+    assert cmds2[1:] == cmds1[3:]
+
+    # Remote parsers get multi-draws as single draws
+    class RemoteParser(glir.BaseGlirParser):
+        def is_remote(self):
+            return True
+    cmds2 = q._shared._filter(cmds1[1:3], RemoteParser())
+    assert cmds2 == [('DRAW', 2, 'lines', (4, 2)),
+                     ('DRAW', 2, 'lines', (8, 3)),
+                     ('DRAW', 2, 'lines', (20, 3))]
+
     # Define shader
     shader1 = """
         precision highp float;uniform mediump vec4 u_foo;uniform vec4 u_bar;
@@ -49,6 +110,262 @@ def test_queue():
     assert 'precision highp float;' in shader3
 
 
+def test_state_cache():
+    """Test skipping of redundant GL state calls
+    """
+    parser = glir.GlirParser()
+    assert not parser._state_is_set('glEnable', [3042])
+    assert parser._state_is_set('glEnable', [3042])
+    assert not parser._state_is_set('glEnable', [2929])
+    assert not parser._state_is_set('glDisable', [3042])
+    assert parser._state_is_set('glDisable', [3042])
+    assert not parser._state_is_set('glDepthFunc', [513])
+    assert parser._state_is_set('glDepthFunc', [513])
+    assert not parser._state_is_set('glDepthFunc', [515])
+    assert parser.get_state_stats(reset=True) == dict(issued=5, skipped=3)
+    assert parser.get_state_stats() == dict(issued=0, skipped=0)
+
+    # Making the context current forgets the shadow state
+    parser.env.clear()
+    assert not parser._state_is_set('glDepthFunc', [515])
+    assert parser._state_is_set('glDepthFunc', [515])
+    parser.reset_state()
+    assert not parser._state_is_set('glDepthFunc', [515])
+
+
+def test_state_queue():
+    """Test that the queue drops commands that do not change the state
+    """
+    q = glir.GlirQueue()
+    q.command('FUNC', 'glEnable', 'blend')
+    q.command('FUNC', 'glBlendFuncSeparate', 'one', 'zero', 'one', 'zero')
+    q.command('FUNC', 'glEnable', 'blend')
+    q.command('FUNC', 'glClear', 16384)
+    q.command('FUNC', 'glClear', 16384)
+    q.command('FUNC', 'glBlendFuncSeparate', 'one', 'zero', 'one', 'zero')
+    q.command('FUNC', 'glDisable', 'blend')
+    q.command('FUNC', 'glBlendFuncSeparate', 'one', 'one', 'one', 'one')
+    cmds = q._shared._commands
+    assert [c[1] for c in cmds] == ['glEnable', 'glBlendFuncSeparate',
+                                    'glClear', 'glClear', 'glDisable',
+                                    'glBlendFuncSeparate']
+
+    # Flushed commands are executed; the state is kept
+    class ListParser(glir.BaseGlirParser):
+        def is_remote(self):
+            return False
+
+        def parse(self, commands):
+            self.commands = commands
+    parser = ListParser()
+    q.flush(parser)
+    assert parser.commands == cmds
+    q.command('FUNC', 'glDisable', 'blend')
+    assert q.clear() == []
+
+    # Cleared commands are not executed; the state is forgotten
+    q.command('FUNC', 'glDisable', 'blend')
+    assert q.clear() == [('FUNC', 'glDisable', 'blend')]
+
+    # As when the state may have been changed by others
+    q.command('FUNC', 'glDepthFunc', 'less')
+    q.reset_state()
+    q.command('FUNC', 'glDepthFunc', 'less')
+    assert len(q.clear()) == 2
+
+    # Merging in FUNC commands from another queue
+    q.command('FUNC', 'glDepthFunc', 'less')
+    q2 = glir.GlirQueue()
+    q2.command('FUNC', 'glDepthFunc', 'equal')
+    q.associate(q2)
+    q.command('FUNC', 'glDepthFunc', 'less')
+    assert [c[2] for c in q.clear()] == ['less', 'equal', 'less']
+
+    # String and int enums refer to the same state
+    q.command('FUNC', 'glEnable', 'blend')
+    q.command('FUNC', 'glDisable', gl.GL_BLEND)
+    q.command('FUNC', 'glEnable', 'blend')
+    q.command('FUNC', 'glEnable', gl.GL_BLEND)
+    assert q.clear() == [('FUNC', 'glEnable', 'blend'),
+                         ('FUNC', 'glDisable', gl.GL_BLEND),
+                         ('FUNC', 'glEnable', 'blend')]
+
+
+class _FakeGL(object):
+    """ Stands in for the gl module in GlirParser and records the GL
+    calls. Functions return 0 for locations and counts, and 1 (or a new
+    handle) otherwise.
+    """
+    def __init__(self, map_buffer=False):
+        self.calls = []
+        self.mapped = []  # (offset, memory) of each mapped buffer range
+        self._handles = 0
+        if map_buffer:
+            self.glMapBufferRange = self._map_buffer_range
+
+    def __getattr__(self, name):
+        if not name.startswith('gl') or name == 'glMapBufferRange':
+            return getattr(gl, name)
+
+        def func(*args):
+            self.calls.append((name,) + args)
+            if name.startswith('glCreate'):
+                self._handles += 1
+                return self._handles
+            if name in ('glGetAttribLocation', 'glGetUniformLocation'):
+                return 0
+            if name == 'glGetProgramParameter' and \
+                    args[1] in (gl.GL_ACTIVE_UNIFORMS,
+                                gl.GL_ACTIVE_ATTRIBUTES):
+                return 0
+            return 1
+        return func
+
+    def _map_buffer_range(self, target, offset, nbytes, flags):
+        self.calls.append(('glMapBufferRange', target, offset, nbytes,
+                           flags))
+        memory = np.zeros(nbytes, np.uint8)
+        self.mapped.append((offset, memory))
+        return memory.ctypes.data
+
+    def pop(self, name):
+        """ Get the calls of the given function and forget all calls.
+        """
+        calls = [c[1:] for c in self.calls if c[0] == name]
+        self.calls = []
+        return calls
+
+
+def _program_commands(id_, vbo_id=None):
+    """ Commands that create a program, with an attribute in a vbo.
+    """
+    commands = [('CREATE', id_ + 1, 'VertexShader'),
+                ('DATA', id_ + 1, 0, 'void main() {}'),
+                ('CREATE', id_ + 2, 'FragmentShader'),
+                ('DATA', id_ + 2, 0, 'void main() {}'),
+                ('CREATE', id_, 'Program'),
+                ('ATTACH', id_, id_ + 1), ('ATTACH', id_, id_ + 2),
+                ('LINK', id_)]
+    if vbo_id is not None:
+        commands.append(('ATTRIBUTE', id_, 'a_position', 'vec3',
+                         (vbo_id, 12, 0)))
+    return commands
+
+
+def _streaming_parser(fake_gl):
+    """ A parser with a streaming vbo (id 1) of 48 bytes, a program that
+    draws from it (id 10) and one that does not (id 20).
+    """
+    parser = glir.GlirParser()
+    parser.parse([('CREATE', 1, 'StreamingVertexBuffer'), ('SIZE', 1, 48),
+                  ('CREATE', 2, 'VertexBuffer'), ('SIZE', 2, 48)] +
+                 _program_commands(10, 1) + _program_commands(20, 2))
+    fake_gl.calls = []
+    return parser
+
+
+def test_streaming_vertex_buffer():
+    """Test the segments of a streaming vertex buffer"""
+    fake_gl = _FakeGL()
+    orig_gl, glir.gl = glir.gl, fake_gl
+    try:
+        parser = _streaming_parser(fake_gl)
+        vbo = parser.get_object(1)
+        data = np.arange(12, dtype=np.float32)
+        nbytes = data.nbytes
+        assert fake_gl.pop('glBufferData') == []
+        # The ring of segments holds three copies of the data
+        assert vbo._buffer_size == 3 * nbytes
+
+        # Writes before a draw go into the current segment
+        parser.parse([('DATA', 1, 0, data), ('DATA', 1, 12, data[3:6])])
+        assert [c[1] for c in fake_gl.pop('glBufferSubData')] == [0, 12]
+        assert vbo.base_offset == 0
+
+        # Draws of programs that do not use the buffer do not matter
+        parser.parse([('DRAW', 20, 'points', (0, 4)), ('DATA', 1, 0, data)])
+        assert [c[1] for c in fake_gl.pop('glBufferSubData')] == [0]
+
+        # After a draw from the buffer, the whole data goes into the next
+        # segment, and the attribute points there
+        parser.parse([('DRAW', 10, 'points', (0, 4)),
+                      ('DATA', 1, 12, data[:3] + 100)])
+        uploads = fake_gl.pop('glBufferSubData')
+        assert [c[1] for c in uploads] == [nbytes]
+        expected = data.copy()
+        expected[3:6] += 100 - 3
+        assert_array_equal(uploads[0][2].view(np.float32), expected)
+        assert vbo.base_offset == nbytes
+        parser.parse([('DRAW', 10, 'points', (0, 4))])
+        assert fake_gl.pop('glVertexAttribPointer')[0][-1] == nbytes
+
+        # When the ring is full, the buffer is orphaned and the first
+        # segment is used again
+        parser.parse([('DATA', 1, 0, data), ('DRAW', 10, 'points', (0, 4))])
+        assert vbo.base_offset == 2 * nbytes
+        assert fake_gl.pop('glBufferData') == []
+        parser.parse([('DATA', 1, 0, data)])
+        assert fake_gl.pop('glBufferData') == [
+            (gl.GL_ARRAY_BUFFER, 3 * nbytes, gl.GL_STREAM_DRAW)]
+        assert vbo.base_offset == 0
+    finally:
+        glir.gl = orig_gl
+
+
+def test_streaming_vertex_buffer_map():
+    """Test writing segments of a streaming vertex buffer by mapping"""
+    fake_gl = _FakeGL(map_buffer=True)
+    orig_gl, glir.gl = glir.gl, fake_gl
+    try:
+        parser = _streaming_parser(fake_gl)
+        data = np.arange(12, dtype=np.float32)
+        parser.parse([('DATA', 1, 0, data), ('DRAW', 10, 'points', (0, 4)),
+                      ('DATA', 1, 0, data + 1)])
+        assert fake_gl.pop('glBufferSubData') == []
+        flags = (glir.GL_MAP_WRITE_BIT | glir.GL_MAP_INVALIDATE_RANGE_BIT |
+                 glir.GL_MAP_UNSYNCHRONIZED_BIT)
+        assert [m[0] for m in fake_gl.mapped] == [0, data.nbytes]
+        assert_array_equal(fake_gl.mapped[1][1].view(np.float32), data + 1)
+        parser.parse([('DATA', 1, 0, data)])
+        calls = fake_gl.calls
+        assert calls[1] == ('glMapBufferRange', gl.GL_ARRAY_BUFFER,
+                            data.nbytes, data.nbytes, flags)
+        assert calls[2] == ('glUnmapBuffer', gl.GL_ARRAY_BUFFER)
+    finally:
+        glir.gl = orig_gl
+
+
+@requires_application()
+def test_state_cache_draw():
+    """Test that identical state in a canvas is only set once
+    """
+    with Canvas() as c:
+        parser = c.context.shared.parser
+        c.context.flush_commands()
+        parser.get_state_stats(reset=True)
+        for i in range(3):
+            c.context.set_state(blend=True, depth_test=False)
+        c.context.flush_commands()
+        assert parser.get_state_stats() == dict(issued=2, skipped=0)
+
+
+@requires_application()
+def test_production_error_check():
+    """Test deferred GL error checking in production mode
+    """
+    config.update(production=True)
+    try:
+        with Canvas() as c:
+            c.context.flush_commands()
+            parser = c.context.shared.parser
+            c.context.glir.command('FUNC', 'glEnable', 1)  # invalid enum
+            assert_raises(RuntimeError, c.context.flush_commands)
+            assert not parser.check_draw_errors
+            assert parser._check_each_command
+    finally:
+        config.update(production=False)
+
+
 @requires_application()
 def test_log_parser():
     """Test GLIR log parsing
@@ -102,6 +419,9 @@ def test_capabilities():
         capabilities = c.context.shared.parser.capabilities
         assert capabilities['max_texture_size'] is not None
         assert capabilities['gl_version'] != 'unknown'
+        assert capabilities['uniform_buffers'] in (True, False)
+        assert capabilities['instanced_drawing'] in (True, False)
+        assert capabilities['vertex_float_textures'] in (True, False)
 
 # The rest is basically tested via our examples
 
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy.gloo import glir_binary
+from vispy.testing import run_tests_if_main, assert_equal, assert_raises
+
+
+class _ListParser(object):
+    def __init__(self):
+        self.commands = []
+
+    def parse(self, commands):
+        self.commands.extend(commands)
+
+
+def test_encode_decode():
+    arr = np.random.rand(10, 2).astype(np.float32)
+    structured = np.zeros(5, [('a_position', np.float32, 3),
+                              ('a_color', np.uint8, 4)])
+    structured['a_position'] = np.random.rand(5, 3)
+    tex = np.arange(3 * 4 * 3, dtype=np.uint8).reshape(3, 4, 3)
+
+    commands = [('CREATE', 1, 'VertexBuffer'),
+                ('SIZE', 1, arr.nbytes),
+                ('DATA', 1, 0, arr),
+                ('DATA', 2, 0, structured),
+                ('DATA', 3, (0, 1), tex[:, 1:]),  # not contiguous
+                ('DATA', 4, 0, 'void main() {}'),
+                ('UNIFORM', 5, 'u_scale', 'vec3', np.ones(3, np.float32)),
+                ('ATTRIBUTE', 5, 'a_color', 'vec4',
+                 (0, np.float32(1), 0.5, 0, 1)),
+                ('DATA', 6, 0, np.zeros(0, np.float32)),
+                ('DRAW', 5, 'triangles', (0, 10)),
+                ('FUNC', 'glClearColor', 0.0, 0.0, 0.0, 1.0)]
+    data = glir_binary.encode(commands)
+    assert data[:4] == b'GLIR'
+    assert len(data) % glir_binary.ALIGNMENT == 0
+    assert_equal(glir_binary.message_size(data), len(data))
+
+    commands2 = glir_binary.decode(data)
+    assert_equal(len(commands2), len(commands))
+    for c1, c2 in zip(commands, commands2):
+        assert_equal(len(c1), len(c2))
+        for x1, x2 in zip(c1, c2):
+            if isinstance(x1, np.ndarray):
+                assert_equal(x1.dtype, x2.dtype)
+                assert_array_equal(x1, x2)
+            else:
+                assert_equal(x1, x2)
+    assert isinstance(commands2[4][2], tuple)
+    # Arrays are views on the message
+    assert commands2[2][3].base is not None
+    assert not commands2[2][3].flags.writeable
+
+    # Chunks are zero-copy, and concatenate to the full message
+    chunks = glir_binary.encode_chunks(commands)
+    assert any(isinstance(c, memoryview) for c in chunks)
+    assert_equal(b''.join(chunks), data)
+
+    # Feed several messages to a parser
+    parser = _ListParser()
+    glir_binary.parse(parser, data + glir_binary.encode(commands[:2]))
+    assert_equal(len(parser.commands), len(commands) + 2)
+
+    assert_raises(ValueError, glir_binary.decode, b'FOOO' + data[4:])
+
+
+run_tests_if_main()
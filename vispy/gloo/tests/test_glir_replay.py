@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import io
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy.gloo import glir_replay
+from vispy.gloo.glir import BaseGlirParser
+from vispy.testing import (run_tests_if_main, requires_application,
+                           assert_equal, assert_true)
+
+
+class _ListParser(BaseGlirParser):
+    def __init__(self):
+        self.batches = []
+
+    def parse(self, commands):
+        self.batches.append(commands)
+
+
+def test_record_roundtrip():
+    f = io.BytesIO()
+    parser = glir_replay.glir_recorder(_ListParser, f)()
+    data = np.arange(12, dtype=np.float32).reshape(6, 2)
+    batch1 = [('CURRENT', 0, 0),
+              ('CREATE', 1, 'VertexBuffer'),
+              ('SIZE', 1, data.nbytes),
+              ('DATA', 1, 0, data)]
+    batch2 = [('FUNC', 'glClearColor', 0.0, 0.0, 0.0, 1.0),
+              ('DELETE', 1)]
+    parser.parse(batch1)
+    parser.parse(batch2)
+    # The commands still reach the parser
+    assert_equal(parser.batches, [batch1, batch2])
+
+    f.seek(0)
+    batches = glir_replay.load_recording(f)
+    assert_equal(len(batches), 2)
+    assert_equal(batches[0][:3], batch1[:3])
+    assert_array_equal(batches[0][3][3], data)
+    assert_equal(batches[1], batch2)
+
+
+def test_format_stats():
+    stats = {'passes': [0.002, 0.004],
+             'DATA': (4, 0.004),
+             'DRAW': (2, 0.001)}
+    lines = glir_replay.format_stats(stats).splitlines()
+    assert_equal(len(lines), 4)
+    # Slowest command first, with per-pass figures
+    assert_true(lines[1].split() == ['DATA', '2', '2.000', '1000.00'])
+    assert_true(lines[2].startswith('DRAW'))
+    assert_true(lines[3].startswith('2 passes, 3.000 ms/pass'))
+
+
+@requires_application()
+def test_replay():
+    from vispy import gloo
+    from vispy.app import Canvas
+
+    f = io.BytesIO()
+    with Canvas(size=(50, 50), show=False) as c:
+        parser = c.context.shared.parser
+        c.context.shared._parser = glir_replay.glir_recorder(
+            parser.__class__, f)()
+        try:
+            c.context.set_clear_color((1.0, 0.0, 0.0, 1.0))
+            c.context.clear()
+            vbo = gloo.VertexBuffer(np.zeros((3, 2), np.float32))
+            vbo.set_data(np.ones((3, 2), np.float32))
+            c.context.flush_commands()
+        finally:
+            c.context.shared._parser = parser
+
+        f.seek(0)
+        stats = glir_replay.replay(f, n=2, canvas=c)
+    assert_equal(len(stats['passes']), 2)
+    assert_equal(stats['CREATE'][0], 2)
+    assert_true('DATA' in stats)
+
+
+run_tests_if_main()
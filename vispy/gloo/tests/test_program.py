@@ -166,6 +166,24 @@ class ProgramTest(unittest.TestCase):
         self.assertRaises(ValueError, program.set_shaders,
                           '', 'uniform vec3 D;')
 
+    def test_uniform_block(self):
+        program = Program("layout(std140) uniform Camera {\n"
+                          "    mat4 u_view;\n"
+                          "};\n"
+                          "uniform float A;", "foo")
+        assert ('uniform_block', 'block', 'Camera') in program.variables
+        assert ('uniform', 'float', 'A') in program.variables
+        assert len(program.variables) == 2
+
+        # Needs a uniform buffer
+        self.assertRaises(TypeError, program.__setitem__, 'Camera',
+                          np.zeros(16, np.float32))
+        ubo = gloo.UniformBuffer(nbytes=64)
+        program['Camera'] = ubo
+        assert program['Camera'] is ubo
+        glir_cmd = program._glir.clear()[-1]
+        assert glir_cmd == ('UNIFORM_BLOCK', program.id, 'Camera', ubo.id)
+
     def test_attributes(self):
         program = Program("attribute float A; attribute vec4 B;", "foo")
         assert ('attribute', 'float', 'A') in program.variables
@@ -276,6 +294,30 @@ class ProgramTest(unittest.TestCase):
             assert glir_cmd[0] == 'DRAW'
             assert len(glir_cmd[-1]) == 3
 
+            # Draw ranges of vertices
+            program.draw('triangles', (2, 6))
+            glir_cmd = glir.clear()[-1]
+            assert glir_cmd[-1] == (2, 6)
+            program.draw('triangles', np.array([[0, 3], [6, 3]]))
+            glir_cmd = glir.clear()[-1]
+            assert list(glir_cmd[-1][0]) == [0, 6]
+            assert list(glir_cmd[-1][1]) == [3, 3]
+
+            # Draw instances; per-instance attributes can differ in size
+            program = Program("attribute float A; attribute vec2 B;", "foo")
+            program['A'] = np.zeros((4,), np.float32)
+            program['B'] = gloo.VertexBuffer(np.zeros((100, 2), np.float32),
+                                             divisor=1)
+            glir_cmd = [c for c in program._glir.clear()
+                        if c[0] == 'ATTRIBUTE'][-1]
+            assert glir_cmd[-1][-1] == 1  # divisor
+            program.draw('triangle_strip', instances=100)
+            glir_cmd = glir.clear()[-1]
+            assert glir_cmd[0] == 'DRAW'
+            assert glir_cmd[-2:] == ((0, 4), 100)
+            self.assertRaises(ValueError, program.draw, 'triangle_strip',
+                              instances=-1)
+
             # Invalid mode
             self.assertRaises(ValueError, program.draw, 'nogeometricshape')
             # Invalid index
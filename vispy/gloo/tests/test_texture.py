@@ -577,6 +577,34 @@ class TextureAtlasTest(unittest.TestCase):
         
         reg = T.get_free_region(129, 129)
         assert reg is None
+
+    def test_grow_atlas(self):
+        T = TextureAtlas((64, 64), dtype=np.uint8, channels=1)
+        assert T.shape == (64, 64, 1)
+        reg = T.get_free_region(64, 40)
+        T.set_region(reg, 7)
+        assert T.get_free_region(32, 32) is None
+
+        # Grows along the shorter side, keeping the data and the regions
+        assert T.grow() == (128, 64, 1)
+        assert T._atlas_data[:40].min() == 7 and T._atlas_data[40:].max() == 0
+        assert T.get_free_region(32, 32) == (0, 40, 32, 32)
+        assert T.grow() == (128, 128, 1)
+        assert T.get_free_region(64, 128) == (64, 0, 64, 128)
+        assert T._atlas_data[:40, :64].min() == 7
+
+    def test_set_regions(self):
+        T = TextureAtlas((64, 64), dtype=np.uint8, channels=1)
+        regions = [T.get_free_region(8, 4), T.get_free_region(4, 16)]
+        T.glir.clear()
+        T.set_regions([(regions[0], 1), (regions[1], np.full((16, 4), 2))])
+        # One upload of the bounding box of the regions
+        glir_cmds = [c for c in T.glir.clear() if c[0] == 'DATA']
+        assert len(glir_cmds) == 1
+        assert glir_cmds[0][3].shape == (16, 12, 1)
+        assert (T._atlas_data[:4, :8] == 1).all()
+        assert (T._atlas_data[:16, 8:12] == 2).all()
+        assert T._atlas_data[4:16, :8].max() == 0
     
     
 # --------------------------------------------------------- Texture formats ---
@@ -185,4 +185,51 @@ def test_use_uniforms():
         assert_allclose(out[:, :, 0] / 255., 127.5 / 255. * np.ones(shape),
                         atol=1. / 255.)
 
+
+@requires_application()
+def test_use_shared_programs():
+    """Test programs with identical code sharing a GL program"""
+    VERT_SHADER = """
+    attribute vec2 a_pos;
+    void main (void)
+    {
+        gl_Position = vec4(a_pos, 0., 1.);
+    }
+    """
+
+    FRAG_SHADER = """
+    uniform float u_red;
+    uniform float u_green;
+    void main()
+    {
+        gl_FragColor = vec4(u_red, u_green, 0., 1.);
+    }
+    """
+    pos = [[-1., -1.], [1., -1.], [-1., 1.], [1., 1.]]
+    with Canvas(size=(50, 50)) as c:
+        c.set_current()
+        set_viewport(0, 0, 3, 3)
+        programs = [Program(VERT_SHADER, FRAG_SHADER) for i in range(3)]
+        for i, program in enumerate(programs):
+            program['a_pos'] = pos
+            program['u_red'] = i / 2.
+            program['u_green'] = 1.
+        programs[1].draw('triangle_strip')
+        parser = c.context.shared.parser
+        handles = [parser._objects[p.id].handle for p in programs]
+        assert handles[0] == handles[1] == handles[2]
+        # Each program draws with its own uniform values
+        for i in (0, 2, 1, 0):
+            programs[i].draw('triangle_strip')
+            out = _screenshot()[:, :, :2] / 255.
+            assert_allclose(out[..., 0], i / 2., atol=1. / 255.)
+            assert_allclose(out[..., 1], 1., atol=1. / 255.)
+        # Deleting a program keeps the GL program of the others
+        programs[0].delete()
+        programs[2]['u_red'] = 0.
+        programs[2].draw('triangle_strip')
+        out = _screenshot()
+        assert_allclose(out[:, :, 0], 0, atol=1)
+        assert len(parser._program_cache) >= 1
+
 run_tests_if_main()
@@ -815,12 +815,18 @@ class TextureAtlas(Texture2D):
     the Skyline Bottom-Left algorithm based on C++ sources provided by Jukka
     Jylänki at: http://clb.demon.fi/files/RectangleBinPack/.
 
+    A copy of the data that is set from the CPU is kept, so that the atlas
+    can grow (see ``grow()``) without losing its contents.
+
     Parameters
     ----------
     shape : tuple of int
         Texture shape (optional).
     dtype : numpy.dtype object
         Texture starting data type (default: float32)
+    channels : int
+        The number of color channels. Use 1 for a single channel
+        (luminance) texture, 3 for an RGB texture.
 
     Notes
     -----
@@ -832,15 +838,103 @@ class TextureAtlas(Texture2D):
         >>> atlas.set_region(bounds, np.random.rand(20, 30).T)
 
     """
-    def __init__(self, shape=(1024, 1024), dtype=np.float32):
+    def __init__(self, shape=(1024, 1024), dtype=np.float32, channels=3):
         shape = np.array(shape, int)
         assert shape.ndim == 1 and shape.size == 2
-        shape = tuple(2 ** (np.log2(shape) + 0.5).astype(int)) + (3,)
+        shape = tuple(2 ** (np.log2(shape) + 0.5).astype(int)) + (channels,)
         self._atlas_nodes = [(0, 0, shape[1])]
         data = np.zeros(shape, dtype)
         super(TextureAtlas, self).__init__(data, interpolation='linear',
                                            wrapping='clamp_to_edge')
 
+    def _set_data(self, data, offset=None, copy=False):
+        data = np.array(data) if copy else np.asarray(data)
+        data = self._normalize_shape(data)
+        super(TextureAtlas, self)._set_data(data, offset, copy=False)
+        if offset is None:
+            self._atlas_data = data.copy()
+        else:
+            region = tuple(slice(o, o + n)
+                           for o, n in zip(offset, data.shape))
+            self._atlas_data[region] = data
+
+    def set_region(self, bounds, data):
+        """Set the data of a region
+
+        Parameters
+        ----------
+        bounds : tuple
+            The region (x, y, w, h), as returned by ``get_free_region()``.
+        data : ndarray
+            The data, of shape (h, w) or (h, w, channels).
+        """
+        x, y, w, h = bounds
+        data = np.asarray(data)
+        if data.ndim == 2:
+            data = data[..., np.newaxis]
+        region = np.empty((h, w, self._shape[2]), self._atlas_data.dtype)
+        region[...] = data
+        self._set_data(region, offset=(y, x))
+
+    def set_regions(self, regions):
+        """Set the data of several regions with a single upload
+
+        The bounding box of all regions is uploaded, using the data that
+        was set from the CPU for the parts in between. Do not use this if
+        the texture was also drawn to on the GPU.
+
+        Parameters
+        ----------
+        regions : list
+            List of tuples (bounds, data), as for ``set_region()``.
+        """
+        if not regions:
+            return
+        bounds = np.array([r[0] for r in regions], int).reshape(-1, 4)
+        x0, y0 = bounds[:, :2].min(axis=0)
+        x1, y1 = (bounds[:, :2] + bounds[:, 2:]).max(axis=0)
+        box = self._atlas_data[y0:y1, x0:x1].copy()
+        for (x, y, w, h), data in regions:
+            data = np.asarray(data)
+            if data.ndim == 2:
+                data = data[..., np.newaxis]
+            box[y - y0:y - y0 + h, x - x0:x - x0 + w] = data
+        self._set_data(box, offset=(y0, x0))
+
+    def grow(self, data=None):
+        """Double the size of the atlas along its shorter side
+
+        The allocated regions keep their position (in texels), so only
+        texture coordinates that were normalized by the shape of the atlas
+        need to be updated.
+
+        Parameters
+        ----------
+        data : ndarray | None
+            The current contents of the atlas. If None, the data that was
+            set from the CPU is used. Pass the data if the texture was also
+            drawn to (e.g. as the color buffer of a FrameBuffer).
+
+        Returns
+        -------
+        shape : tuple
+            The new shape of the atlas.
+        """
+        h, w = self._shape[:2]
+        if data is not None:
+            self._atlas_data = self._normalize_shape(
+                np.array(data, self._atlas_data.dtype))
+        if h <= w:
+            shape = (2 * h, w) + self._shape[2:]
+        else:
+            shape = (h, 2 * w) + self._shape[2:]
+            # The new columns are free from the bottom
+            self._atlas_nodes.append((w, 0, w))
+        new_data = np.zeros(shape, self._atlas_data.dtype)
+        new_data[:h, :w] = self._atlas_data
+        self._set_data(new_data)
+        return self._shape
+
     def get_free_region(self, width, height):
         """Get a free region of given size and allocate it
 
@@ -489,8 +489,13 @@ class BaseGlooFunctions(object):
         ``set_state``. Note that individual functions are exposed e.g.,
         as ``set_clear_color``, with some more informative docstrings
         about those particular functions.
+
+        Commands that would not change the state are not sent: the GLIR
+        queue of each context records the last value of each piece of
+        state. This makes it cheap to call ``set_state`` with the complete
+        state before each draw.
         """
-        kwargs = deepcopy(kwargs)
+        kwargs = dict(kwargs)
 
         # Load preset, if supplied
         if preset is not None:
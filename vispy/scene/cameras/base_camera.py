@@ -6,6 +6,7 @@ from __future__ import division
 
 from ...util import keys
 from ..node import Node
+from ...visuals.shaders import UniformBlock, Variable
 from ...visuals.transforms import (STTransform, MatrixTransform,
                                    NullTransform, TransformCache)
 
@@ -418,6 +419,24 @@ class BaseCamera(Node):
             event.new.events.key_press.connect(self.viewbox_key_event)
             event.new.events.key_release.connect(self.viewbox_key_event)
 
+    def _update_uniform_block(self):
+        """ Put the uniforms of the scene transform in a uniform block, so
+        that the visuals in the view read them from one buffer.
+        """
+        tr = self._scene_transform
+        variables = []
+        for dep in tr.shader_map().dependencies():
+            if (isinstance(dep, Variable) and dep.vtype == 'uniform' and
+                    dep not in variables):
+                variables.append(dep)
+        block = tr.uniform_block
+        if block is None or block.variables != variables:
+            if variables:
+                block = UniformBlock('Camera', variables)
+            else:
+                block = None
+            tr.uniform_block = block
+
     def viewbox_key_event(self, event):
         """ViewBox key event handler
 
@@ -460,6 +479,7 @@ class BaseCamera(Node):
         # Mark the transform dynamic so that it will not be collapsed with
         # others 
         self._scene_transform.dynamic = True
+        self._update_uniform_block()
         
         # Update scene
         self._viewbox.scene.transform = self._scene_transform
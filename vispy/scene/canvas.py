@@ -79,6 +79,20 @@ class SceneCanvas(app.Canvas, Frozen):
         allows the scale factor to be adjusted for testing.
     bgcolor : Color
         The background color to use.
+    batch_draws : bool
+        If True (default), consecutive visuals that can be drawn together
+        (e.g. lines with the same shader program and GL state, without a
+        transform of their own and with the same parent) are drawn in one
+        draw call. Use together with ``sort_by_gl_state`` to make
+        such visuals consecutive.
+    sort_by_gl_state : bool
+        If True, siblings with the same ``order`` are drawn grouped by their
+        GL state, so that fewer state changes are needed. Default False,
+        which draws them in the order in which they were added.
+    dirty_regions : bool
+        If True, the scene is rendered to an offscreen buffer, and when
+        only some widgets were updated, only their region of that buffer
+        is redrawn before it is copied to the screen. Default False.
 
     See also
     --------
@@ -113,11 +127,28 @@ class SceneCanvas(app.Canvas, Frozen):
                  show=False, autoswap=True, app=None, create_native=True,
                  vsync=False, resizable=True, decorate=True, fullscreen=False,
                  config=None, shared=None, keys=None, parent=None, dpi=None,
-                 always_on_top=False, px_scale=1, bgcolor='black'):
+                 always_on_top=False, px_scale=1, bgcolor='black',
+                 batch_draws=True, sort_by_gl_state=False,
+                 dirty_regions=False):
         self._scene = None
         # A default widget that follows the shape of the canvas
         self._central_widget = None
-        self._draw_order = weakref.WeakKeyDictionary()
+        self._draw_lists = weakref.WeakKeyDictionary()
+        self._batch_draws = bool(batch_draws)
+        self._sort_by_gl_state = bool(sort_by_gl_state)
+        # Damage tracking: nodes updated since the last draw, the rect each
+        # of them was last drawn in, and the buffer holding the scene
+        self._dirty_regions = bool(dirty_regions)
+        self._damaged_nodes = weakref.WeakKeyDictionary()
+        self._damage_all = True
+        self._damage_rects = weakref.WeakKeyDictionary()
+        self._scene_buffer = None
+        self._blit_program = None
+        # Persistent picking render: the framebuffer and the regions
+        # (x, y, w, h) of it that are up to date, or None if none are
+        self._picking_buffer = None
+        self._picking_valid = None
+        self._rendering_picking = False
         self._drawing = False
         self._update_pending = False
         self._fb_stack = []
@@ -180,18 +211,81 @@ class SceneCanvas(app.Canvas, Frozen):
         if hasattr(self, '_backend'):
             self.update()
 
+    @property
+    def batch_draws(self):
+        """ Whether consecutive visuals that can be drawn together are
+        drawn in one draw call.
+
+        Visuals opt in through ``_batch_key()``; currently lines drawn
+        with the 'gl' method support this.
+        """
+        return self._batch_draws
+
+    @batch_draws.setter
+    def batch_draws(self, batch):
+        self._batch_draws = bool(batch)
+        self._reset_draw_lists()
+
+    @property
+    def sort_by_gl_state(self):
+        """ Whether siblings with the same ``order`` are drawn grouped by
+        their GL state.
+
+        Consecutive visuals with the same state do not need any state
+        changes. The draw order is determined when the scene graph changes,
+        so changing the GL state of a visual later does not regroup it.
+        """
+        return self._sort_by_gl_state
+
+    @sort_by_gl_state.setter
+    def sort_by_gl_state(self, sort):
+        self._sort_by_gl_state = bool(sort)
+        self._reset_draw_lists()
+
+    def _reset_draw_lists(self):
+        for draw_list in self._draw_lists.values():
+            draw_list.disconnect()
+        self._draw_lists.clear()
+        self.update()
+
+    @property
+    def dirty_regions(self):
+        """ Whether only the regions of the canvas that changed are
+        redrawn.
+
+        The scene is rendered to an offscreen buffer that is copied to the
+        screen on each draw. When nodes are updated, only the region that
+        they were drawn in and the region that they are drawn in now are
+        redrawn (with a scissor test), provided that the nodes or one of
+        their parents report their region (see ``Node._damage_rect()``).
+        Widgets do, so updating a widget, or a visual in a widget, only
+        redraws the widget. Other updates redraw the whole scene.
+        """
+        return self._dirty_regions
+
+    @dirty_regions.setter
+    def dirty_regions(self, dirty_regions):
+        self._dirty_regions = bool(dirty_regions)
+        self._scene_buffer = None
+        self._damage_all = True
+        self.update()
+
     def update(self, node=None):
         """Update the scene
 
         Parameters
         ----------
-        node : instance of Node
-            Not used.
+        node : instance of Node | None
+            The node that changed. If given, and ``dirty_regions`` is
+            True, only the region of the node is redrawn.
         """
-        # TODO: use node bounds to keep track of minimum drawable area
-        if self._drawing:
+        if self._drawing or self._rendering_picking:
             return
 
+        self._picking_valid = None
+        if self._dirty_regions:
+            self._add_damage(node)
+
         # Keep things civil in the node update system. Once an update
         # has been scheduled, there is no need to flood the event queue
         # of the backend with additional updates.
@@ -262,9 +356,96 @@ class SceneCanvas(app.Canvas, Frozen):
     def _draw_scene(self, bgcolor=None):
         if bgcolor is None:
             bgcolor = self._bgcolor
+        if self._dirty_regions and not self._fb_stack:
+            self._draw_damaged_scene(bgcolor)
+            return
         self.context.clear(color=bgcolor, depth=True)
         self.draw_visual(self.scene)
 
+    def _add_damage(self, node):
+        """ Record that a node changed and its region must be redrawn.
+        """
+        while node is not None:
+            if node._damage_rect() is not None:
+                self._damaged_nodes[node] = None
+                return
+            node = node.parent
+        self._damage_all = True
+
+    def _damaged_region(self):
+        """ Get the region (x, y, w, h) of the framebuffer that must be
+        redrawn, and forget the damage. Returns None if the whole scene must
+        be redrawn.
+        """
+        damage_all = self._damage_all
+        rects = []
+        for node in list(self._damaged_nodes):
+            old = self._damage_rects.pop(node, None)
+            new = node._damage_rect() if node.canvas is self else None
+            if new is not None:
+                self._damage_rects[node] = new
+                rects.append(new)
+            if old is None:
+                damage_all = True  # we do not know where it was drawn
+            else:
+                rects.append(old)
+        self._damaged_nodes.clear()
+        self._damage_all = False
+        if damage_all:
+            return None
+        if not rects:
+            return (0, 0, 0, 0)
+
+        # Union of the rects, from canvas to framebuffer pixels (the origin
+        # of which is at the bottom left)
+        left = min(min(r.left, r.right) for r in rects)
+        right = max(max(r.left, r.right) for r in rects)
+        top = min(min(r.bottom, r.top) for r in rects)
+        bottom = max(max(r.bottom, r.top) for r in rects)
+        w, h = self.physical_size
+        s = self.pixel_scale
+        x0 = int(np.clip(np.floor(left * s), 0, w))
+        x1 = int(np.clip(np.ceil(right * s), 0, w))
+        y0 = int(np.clip(h - np.ceil(bottom * s), 0, h))
+        y1 = int(np.clip(h - np.floor(top * s), 0, h))
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def _draw_damaged_scene(self, bgcolor):
+        """ Redraw the damaged region of the scene buffer, then copy the
+        buffer to the screen.
+        """
+        shape = self.physical_size[::-1]
+        fbo = self._scene_buffer
+        if fbo is None or fbo.color_buffer.shape[:2] != shape:
+            fbo = gloo.FrameBuffer(
+                color=gloo.Texture2D(shape + (4,), interpolation='nearest'),
+                depth=gloo.RenderBuffer(shape))
+            self._scene_buffer = fbo
+            self._damage_all = True
+        region = self._damaged_region()
+
+        if region is None or (region[2] > 0 and region[3] > 0):
+            self.push_fbo(fbo, (0, 0), self.size)
+            try:
+                if region is not None:
+                    self.context.set_scissor(*region)
+                    self.context.set_state(scissor_test=True)
+                self.context.clear(color=bgcolor, depth=True)
+                self.draw_visual(self.scene)
+            finally:
+                if region is not None:
+                    self.context.set_state(scissor_test=False)
+                self.pop_fbo()
+
+        if self._blit_program is None:
+            self._blit_program = gloo.Program(_blit_vert, _blit_frag)
+            self._blit_program['a_position'] = [[-1., -1.], [-1., 1.],
+                                                [1., -1.], [1., 1.]]
+        self._blit_program['u_texture'] = fbo.color_buffer
+        self.context.set_state(depth_test=False, blend=False,
+                               cull_face=False)
+        self._blit_program.draw('triangle_strip')
+
     def draw_visual(self, visual, event=None):
         """ Draw a visual and its children to the canvas or currently active
         framebuffer.
@@ -282,54 +463,31 @@ class SceneCanvas(app.Canvas, Frozen):
         # make sure this canvas's context is active
         self.set_current()
         
+        # Parse the GLIR commands of all visuals at once
+        self.context.begin_batch()
         try:
             self._drawing = True
-            # get order to draw visuals
-            if visual not in self._draw_order:
-                self._draw_order[visual] = self._generate_draw_order()
-            order = self._draw_order[visual]
-            
-            # draw (while avoiding branches with visible=False)
-            stack = []
-            invisible_node = None
-            for node, start in order:
-                if start:
-                    stack.append(node)
-                    if invisible_node is None:
-                        if not node.visible:
-                            # disable drawing until we exit this node's subtree
-                            invisible_node = node
-                        else:
-                            if hasattr(node, 'draw'):
-                                node.draw()
-                                prof.mark(str(node))
-                else:
-                    if node is invisible_node:
-                        invisible_node = None
-                    stack.pop()
+            self._get_draw_list(visual).draw(prof)
         finally:
             self._drawing = False
+            self.context.end_batch()
 
-    def _generate_draw_order(self, node=None):
-        """Return a list giving the order to draw visuals.
-        
-        Each node appears twice in the list--(node, True) appears before the
-        node's children are drawn, and (node, False) appears after.
+    def _get_draw_list(self, visual):
+        """ Get the (cached) _DrawList for drawing a visual and its children.
         """
-        if node is None:
-            node = self._scene
-        order = [(node, True)]
-        children = node.children
-        children.sort(key=lambda ch: ch.order)
-        for ch in children:
-            order.extend(self._generate_draw_order(ch))
-        order.append((node, False))
-        return order
+        draw_list = self._draw_lists.get(visual)
+        if draw_list is None:
+            if self._sort_by_gl_state:
+                key = lambda ch: (ch.order, _gl_state_key(ch))  # noqa
+            else:
+                key = lambda ch: ch.order  # noqa
+            draw_list = _DrawList(visual, key, self._batch_draws)
+            self._draw_lists[visual] = draw_list
+        return draw_list
 
     def _update_scenegraph(self, event):
         """Called when topology of scenegraph has changed.
         """
-        self._draw_order.clear()
         self.update()
 
     def _process_mouse_event(self, event):
@@ -402,6 +560,66 @@ class SceneCanvas(app.Canvas, Frozen):
             return self._visual_bounds_at(pos)
         return vis
 
+    def element_at(self, pos):
+        """Return the visual at a given position, with the index of its
+        element (e.g. marker, face or line segment) at that position
+
+        After the visual is found with ``visual_at()``, only that visual is
+        drawn, and only at *pos*, with its elements colored by their index.
+        The visual must have ``element_picking`` enabled.
+
+        Parameters
+        ----------
+        pos : tuple
+            The position in logical coordinates to query.
+
+        Returns
+        -------
+        hit : tuple | None
+            The visual and the element index, or None if there is no visual
+            at the position. The index is None if the visual does not
+            support element picking or does not have it enabled, or if no
+            element was drawn at the position.
+        """
+        vis = self.visual_at(pos)
+        if vis is None:
+            return None
+        # Visuals without element picking only have a filter if they
+        # returned an element index
+        filt = getattr(vis, '_element_picking_filter', None)
+        if filt is None or self._picking_buffer is None:
+            return vis, None
+
+        tr = self.transforms.get_transform('canvas', 'framebuffer')
+        fbpos = tr.map(pos)[:2]
+        x, y = int(np.floor(fbpos[0])), int(np.floor(fbpos[1]))
+        fbo = self._picking_buffer
+        self._rendering_picking = True
+        try:
+            # Draw the element indices instead of the visual ID
+            vis.picking = True
+            vis._picking_filter.enabled = False
+            filt.enabled = True
+            self.push_fbo(fbo, (0, 0), self.size)
+            try:
+                self.context.set_scissor(x, y, 1, 1)
+                self.context.set_state(scissor_test=True)
+                self.context.clear(color=(0, 0, 0, 0), depth=True)
+                vis.draw()
+                img = fbo.read(crop=(x, y, 1, 1))
+            finally:
+                self.context.set_state(scissor_test=False)
+                self.pop_fbo()
+        finally:
+            filt.enabled = False
+            vis.picking = False
+            self._rendering_picking = False
+        # The pixel no longer holds the visual ID
+        self._picking_valid = None
+
+        index = int(img.view('<u4')[0, 0, 0])
+        return vis, (index - 1 if index > 0 else None)
+
     def _visual_bounds_at(self, pos, node=None):
         """Find a visual whose bounding rect encompasses *pos*.
         """
@@ -451,41 +669,111 @@ class SceneCanvas(app.Canvas, Frozen):
         radius : int
             Distance away from *pos* to search for visuals.
         """
+        return [hit[0] for hit in self.hits_at(pos, radius)]
+
+    def hits_at(self, pos, radius=10):
+        """Return the visuals within *radius* pixels of *pos*, with the
+        pixel of each visual that is nearest to *pos*.
+
+        The region around *pos* is rendered in picking mode once, and the
+        pixels in it are searched in a single pass, so this is suited for
+        large radii (e.g. for brush selection).
+
+        Parameters
+        ----------
+        pos : tuple
+            (x, y) position at which to find visuals.
+        radius : int
+            Distance away from *pos* to search for visuals, in framebuffer
+            pixels.
+
+        Returns
+        -------
+        hits : list
+            A list of tuples (visual, distance, position), sorted by
+            distance. The distance is in framebuffer pixels, and the
+            position of the pixel is in canvas coordinates.
+        """
         tr = self.transforms.get_transform('canvas', 'framebuffer')
-        pos = tr.map(pos)[:2]
-
-        id = self._render_picking((pos[0]-radius, pos[1]-radius,
-                                   radius * 2 + 1, radius * 2 + 1))
-        ids = []
-        seen = set()
-        for i in range(radius):
-            subr = id[radius-i:radius+i+1, radius-i:radius+i+1]
-            subr_ids = set(list(np.unique(subr)))
-            ids.extend(list(subr_ids - seen))
-            seen |= subr_ids
-        visuals = [VisualNode._visual_ids.get(x, None) for x in ids]
-        return [v for v in visuals if v is not None]
+        fbpos = tr.map(pos)[:2]
+        radius = int(radius)
+        x, y = int(np.floor(fbpos[0])), int(np.floor(fbpos[1]))
+        ids = self._render_picking((x - radius, y - radius,
+                                    2 * radius + 1, 2 * radius + 1))
+        hits = []
+        for id_, dist, dx, dy in _nearest_ids(ids, radius):
+            vis = VisualNode._visual_ids.get(id_, None)
+            if vis is None:
+                continue
+            px = tr.imap((x + dx + 0.5, y + dy + 0.5))[:2]
+            hits.append((vis, dist, (float(px[0]), float(px[1]))))
+        return hits
 
     def _render_picking(self, crop):
         """Render the scene in picking mode, returning a 2D array of visual 
         IDs in the area specified by crop.
+
+        The picking render is kept in a framebuffer until the scene changes,
+        so that repeated queries only read pixels. The first query after a
+        change only draws the crop (using a scissor test); if there is
+        another query before the next change, the full canvas is drawn.
         
         Parameters
         ----------
         crop : array-like
-            The crop (x, y, w, h) of the framebuffer to read. For picking the
-            full canvas is rendered and cropped on read as it is much faster
-            than triggering transform updates across the scene with every
-            click.
+            The crop (x, y, w, h) of the framebuffer to read.
+        """
+        x, y = int(np.floor(crop[0])), int(np.floor(crop[1]))
+        crop = (x, y, int(crop[2]), int(crop[3]))
+        shape = self.physical_size[::-1]
+        fbo = self._picking_buffer
+        if fbo is None or fbo.color_buffer.shape[:2] != shape:
+            fbo = gloo.FrameBuffer(color=gloo.RenderBuffer(shape),
+                                   depth=gloo.RenderBuffer(shape))
+            self._picking_buffer = fbo
+            self._picking_valid = None
+
+        # Pixels outside of the canvas are never drawn
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + crop[2], shape[1])
+        y1 = min(y + crop[3], shape[0])
+        region = (x0, y0, max(x1 - x0, 0), max(y1 - y0, 0))
+        valid = self._picking_valid
+        if valid is None:
+            self._draw_picking(fbo, region)
+            self._picking_valid = [region]
+        elif not any(_rect_contains(r, region) for r in valid):
+            self._draw_picking(fbo)
+            self._picking_valid = [(0, 0, shape[1], shape[0])]
+
+        self.push_fbo(fbo, (0, 0), self.size)
+        try:
+            img = fbo.read(crop=crop)
+        finally:
+            self.pop_fbo()
+        # The RGBA bytes are the little-endian ID
+        return img.view('<u4')[..., 0]
+
+    def _draw_picking(self, fbo, region=None):
+        """Draw the scene in picking mode to *fbo*, limited to *region*
+        (x, y, w, h) if given.
         """
+        self._rendering_picking = True
         try:
             self._scene.picking = True
-            img = self.render(bgcolor=(0, 0, 0, 0), crop=crop)
+            self.push_fbo(fbo, (0, 0), self.size)
+            try:
+                if region is not None:
+                    self.context.set_scissor(*region)
+                    self.context.set_state(scissor_test=True)
+                self._draw_scene(bgcolor=(0, 0, 0, 0))
+            finally:
+                if region is not None:
+                    self.context.set_state(scissor_test=False)
+                self.pop_fbo()
         finally:
             self._scene.picking = False
-        img = img.astype('int32') * [2**0, 2**8, 2**16, 2**24]
-        id_ = img.sum(axis=2).astype('int32')
-        return id_
+            self._rendering_picking = False
 
     def on_resize(self, event):
         """Resize handler
@@ -626,3 +914,241 @@ class SceneCanvas(app.Canvas, Frozen):
         
         self.transforms.configure(viewport=viewport, fbo_size=fb_size,
                                   fbo_rect=fb_rect)
+
+
+def _draw_batch(batch, mark=None):
+    """ Draw a run of nodes with the same batch key (see
+    ``BaseVisual._batch_key()``) in one call to ``_draw_batch()`` of the
+    first node.
+    """
+    if len(batch) == 1:
+        batch[0].draw()
+    else:
+        batch[0]._draw_batch(batch)
+    if mark is not None:
+        mark('%s (%d nodes)' % (batch[0], len(batch)))
+
+
+# Copies the scene buffer to the screen
+_blit_vert = """
+attribute vec2 a_position;
+varying vec2 v_texcoord;
+void main() {
+    v_texcoord = (a_position + 1.0) / 2.0;
+    gl_Position = vec4(a_position, 0.0, 1.0);
+}
+"""
+
+_blit_frag = """
+uniform sampler2D u_texture;
+varying vec2 v_texcoord;
+void main() {
+    gl_FragColor = texture2D(u_texture, v_texcoord);
+}
+"""
+
+
+def _nearest_ids(ids, radius):
+    """ Find the IDs within *radius* of the center of an array of picking
+    IDs of shape (2 * radius + 1, 2 * radius + 1), as rendered in picking
+    mode (with the top row first).
+
+    Returns a list of (id, distance, dx, dy) for each ID, with the
+    distance to and the offset of its nearest pixel, sorted by distance.
+    The offset is in framebuffer pixels, with y pointing up.
+    """
+    dy, dx = np.mgrid[radius:-radius - 1:-1, -radius:radius + 1]
+    dist2 = dx * dx + dy * dy
+    hit = (ids != 0) & (dist2 <= radius * radius)
+    ids, dist2, dx, dy = ids[hit], dist2[hit], dx[hit], dy[hit]
+    # The first occurrence of each ID in order of distance is its nearest
+    order = np.argsort(dist2, kind='mergesort')
+    first = np.unique(ids[order], return_index=True)[1]
+    nearest = order[np.sort(first)]
+    return [(int(ids[i]), float(np.sqrt(dist2[i])), int(dx[i]), int(dy[i]))
+            for i in nearest]
+
+
+def _rect_contains(outer, inner):
+    """ Whether the rect (x, y, w, h) *outer* contains *inner*.
+    """
+    return (outer[0] <= inner[0] and outer[1] <= inner[1] and
+            inner[0] + inner[2] <= outer[0] + outer[2] and
+            inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+def _gl_state_key(node):
+    """ Get a sortable key that is equal for nodes of the same class with
+    the same GL state (of the node and of its subvisuals, if any). Nodes
+    that do not draw anything themselves get an empty key.
+    """
+    vshare = getattr(node, '_vshare', None)
+    if vshare is None:
+        return ()
+    states = [vshare.gl_state]
+    states += [v._vshare.gl_state for v in getattr(node, '_subvisuals', ())]
+    return (type(node).__name__,) + tuple(
+        tuple(sorted((key, repr(val)) for key, val in state.items()))
+        for state in states)
+
+
+class _DrawList(object):
+    """ The order in which to draw a node and its descendants
+
+    The descendants are stored in a flat list, in the order in which they
+    are drawn: depth first, with siblings sorted by *key*. For each node,
+    ``ends`` holds the index just past its subtree, so that the subtree of
+    an invisible node is skipped in one step.
+
+    If *batch* is True, runs of visible nodes that have the same
+    ``_batch_key()`` are drawn at once (see ``_draw_batch()``). Nodes that
+    do not draw anything do not end a run.
+
+    The list follows the changes to the scene graph below the root: each
+    node whose children change is rebuilt on the next draw, and its new
+    subtree is spliced into the list.
+
+    Parameters
+    ----------
+    root : Node | Visual
+        The node to draw.
+    key : callable
+        Gives the sort key for a node among its siblings.
+    batch : bool
+        Whether to draw runs of nodes that can be drawn together at once.
+    """
+
+    def __init__(self, root, key, batch=False):
+        # Do not keep the root alive; canvases key their lists on it
+        self._root = weakref.ref(root)
+        self._key = key
+        self._batch = batch
+        self._dirty = set()
+        self._nodes, self._ends, self._draws = self._flatten(root, 0)
+        events = getattr(root, 'events', None)
+        self._emitter = getattr(events, 'children_change', None)
+        if self._emitter is not None:
+            self._emitter.connect(self._children_changed)
+
+    def disconnect(self):
+        """ Stop following changes to the scene graph.
+        """
+        if self._emitter is not None:
+            self._emitter.disconnect(self._children_changed)
+            self._emitter = None
+
+    @property
+    def nodes(self):
+        """ The descendants of the root, in the order in which they are
+        drawn.
+        """
+        self._update()
+        return list(self._nodes)
+
+    def _children_changed(self, event):
+        # The first source is the node whose children were added, removed
+        # or reordered
+        self._dirty.add(event.sources[0])
+
+    def _flatten(self, node, start):
+        """ Get the nodes, ends, and draw and batch key methods of the
+        descendants of a node, for when they are put at index *start*.
+        """
+        nodes, ends, draws = [], [], []
+
+        def add(node):
+            for ch in sorted(getattr(node, 'children', ()), key=self._key):
+                i = len(nodes)
+                nodes.append(ch)
+                ends.append(0)
+                batch_key = None
+                if self._batch:
+                    batch_key = getattr(ch, '_batch_key', None)
+                draws.append((getattr(ch, 'draw', None), batch_key))
+                add(ch)
+                ends[i] = start + len(nodes)
+        add(node)
+        return nodes, np.array(ends, dtype=int), draws
+
+    def _update(self):
+        """ Splice the new subtrees of the changed nodes into the list.
+        """
+        if not self._dirty:
+            return
+        root = self._root()
+        dirty, self._dirty = self._dirty, set()
+        if root in dirty:
+            self._nodes, self._ends, self._draws = self._flatten(root, 0)
+            return
+
+        # Rebuild from the top down, so that nodes below a changed node
+        # are only rebuilt once
+        def depth(node):
+            d = 0
+            while node is not None:
+                node = node.parent
+                d += 1
+            return d
+        for node in sorted(dirty, key=depth):
+            if node not in dirty:
+                continue  # rebuilt along with one of its parents
+            try:
+                i = self._nodes.index(node)
+            except ValueError:
+                continue  # not below the root (anymore)
+            start, stop = i + 1, self._ends[i]
+            nodes, ends, draws = self._flatten(node, start)
+            delta = len(nodes) - (stop - start)
+            # The subtrees of the node, its parents, and all nodes after
+            # it have moved
+            old = np.where(self._ends >= stop, self._ends + delta,
+                           self._ends)
+            self._ends = np.concatenate([old[:start], ends, old[stop:]])
+            self._nodes[start:stop] = nodes
+            self._draws[start:stop] = draws
+            dirty.difference_update(nodes)
+
+    def draw(self, prof=None):
+        """ Draw the root and its visible descendants.
+
+        Parameters
+        ----------
+        prof : Profiler | None
+            If given, a mark is set after drawing each node.
+        """
+        root = self._root()
+        if root is None or not root.visible:
+            return
+        self._update()
+        mark = None
+        if prof is not None and prof is not Profiler._disabled_profiler:
+            mark = prof.mark
+        if hasattr(root, 'draw'):
+            root.draw()
+            if mark is not None:
+                mark(str(root))
+
+        nodes, ends, draws = self._nodes, self._ends, self._draws
+        batch, batch_key = [], None  # the run of nodes to draw at once
+        i, n = 0, len(nodes)
+        while i < n:
+            node = nodes[i]
+            if not node.visible:
+                i = ends[i]
+                continue
+            draw, get_batch_key = draws[i]
+            if draw is not None:
+                key = None if get_batch_key is None else get_batch_key()
+                if batch and key != batch_key:
+                    _draw_batch(batch, mark)
+                    batch = []
+                if key is None:
+                    draw()
+                    if mark is not None:
+                        mark(str(node))
+                else:
+                    batch_key = key
+                    batch.append(node)
+            i += 1
+        if batch:
+            _draw_batch(batch, mark)
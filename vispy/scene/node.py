@@ -152,7 +152,13 @@ class Node(object):
     
     @order.setter
     def order(self, o):
+        if o == self._order:
+            return
         self._order = o
+        parent = self.parent
+        if parent is not None:
+            # The order of the children of the parent has changed
+            parent.events.children_change(reordered=self)
         self.update()
         
     @property
@@ -332,6 +338,16 @@ class Node(object):
         if c is not None:
             c.update(node=self)
 
+    def _damage_rect(self):
+        """ The region of the canvas that this node and its descendants
+        draw in, as a Rect in canvas coordinates, or None if it is not known.
+
+        A SceneCanvas that redraws only damaged regions redraws this region
+        when the node or one of its descendants is updated. Nodes that
+        return None pass the damage on to their parent.
+        """
+        return None
+
     @property
     def document(self):
         """ The document is an optional property that is an node representing
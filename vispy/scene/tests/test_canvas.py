@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import gc
+import weakref
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy import scene
+from vispy.gloo.util import _screenshot
+from vispy.scene.canvas import _gl_state_key, _DrawList, _nearest_ids
+from vispy.scene.node import Node
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_equal)
+
+
+def _markers(state, order=0):
+    m = scene.visuals.Markers()
+    m.set_gl_state(state)
+    m.order = order
+    return m
+
+
+def test_gl_state_key():
+    """Test the key that visuals are grouped by"""
+    assert _gl_state_key(Node()) == ()
+    a, b = _markers('translucent'), _markers('translucent')
+    c = _markers('additive')
+    assert _gl_state_key(a) == _gl_state_key(b)
+    assert _gl_state_key(a) != _gl_state_key(c)
+    b.update_gl_state(depth_test=False)
+    assert _gl_state_key(a) != _gl_state_key(b)
+
+    # The class and the state of subvisuals are part of the key
+    line, line2 = scene.visuals.Line(), scene.visuals.Line()
+    line.set_gl_state('translucent')
+    assert _gl_state_key(line) != _gl_state_key(a)
+    line2.set_gl_state('additive')
+    assert _gl_state_key(line) != _gl_state_key(line2)
+    line2.set_gl_state('translucent')
+    assert _gl_state_key(line) == _gl_state_key(line2)
+
+
+class DrawNode(Node):
+    """ Node that records when it is drawn.
+    """
+    def __init__(self, drawn, *args, **kwargs):
+        Node.__init__(self, *args, **kwargs)
+        self._drawn = drawn
+
+    def draw(self):
+        self._drawn.append(self)
+
+
+def test_draw_list():
+    """Test the cached draw order of a subtree"""
+    drawn = []
+    root = DrawNode(drawn)
+    a = DrawNode(drawn, parent=root)
+    b = Node(parent=root)
+    b1 = DrawNode(drawn, parent=b)
+    b2 = DrawNode(drawn, parent=b)
+    c = DrawNode(drawn, parent=root)
+    draw_list = _DrawList(root, lambda ch: ch.order)
+
+    def check(nodes, hidden=()):
+        del drawn[:]
+        draw_list.draw()
+        assert_equal(drawn, [n for n in nodes if isinstance(n, DrawNode) and
+                             n not in hidden])
+        assert_equal(draw_list.nodes, nodes[1:])
+        assert_equal(list(draw_list._ends),
+                     [draw_list.nodes.index(n) + 1 + len(_descendants(n))
+                      for n in draw_list.nodes])
+
+    check([root, a, b, b1, b2, c])
+
+    # Invisible subtrees are skipped
+    b.visible = False
+    check([root, a, b, b1, b2, c], hidden=[b1, b2])
+    b.visible = True
+
+    # Changes are spliced in
+    b3 = DrawNode(drawn, parent=b1)
+    check([root, a, b, b1, b3, b2, c])
+    b1.order = 1
+    check([root, a, b, b2, b1, b3, c])
+    b.parent = c
+    check([root, a, c, b, b2, b1, b3])
+    a.order = 2
+    b2.parent = None
+    check([root, c, b, b1, b3, a])
+
+    # The root is not kept alive
+    ref = weakref.ref(root)
+    del root, drawn[:]
+    gc.collect()
+    assert ref() is None
+
+
+class BatchNode(DrawNode):
+    """ Node that records when it is drawn as part of a batch.
+    """
+    def __init__(self, drawn, key, *args, **kwargs):
+        DrawNode.__init__(self, drawn, *args, **kwargs)
+        self.key = key
+
+    def _batch_key(self):
+        return self.key
+
+    def _draw_batch(self, nodes):
+        self._drawn.append(tuple(nodes))
+
+
+def test_draw_list_batch():
+    """Test drawing runs of nodes with the same batch key at once"""
+    drawn = []
+    root = Node()
+    a = BatchNode(drawn, 'x', parent=root)
+    b = BatchNode(drawn, 'x', parent=root)
+    Node(parent=root)  # draws nothing, so the run goes on
+    c = BatchNode(drawn, 'x', parent=root)
+    d = BatchNode(drawn, 'y', parent=root)
+    e = BatchNode(drawn, None, parent=root)
+    f = BatchNode(drawn, 'y', parent=root)
+    g = DrawNode(drawn, parent=root)
+    h = BatchNode(drawn, 'y', parent=root)
+    draw_list = _DrawList(root, lambda ch: ch.order, batch=True)
+    draw_list.draw()
+    assert_equal(drawn, [(a, b, c), d, e, f, g, h])
+
+    del drawn[:]
+    b.visible = False
+    e.key = 'y'
+    draw_list.draw()
+    assert_equal(drawn, [(a, c), (d, e, f), g, h])
+
+    # Without batching all nodes are drawn on their own
+    del drawn[:]
+    _DrawList(root, lambda ch: ch.order).draw()
+    assert_equal(drawn, [a, c, d, e, f, g, h])
+
+
+def _descendants(node):
+    nodes = []
+    for ch in node.children:
+        nodes.append(ch)
+        nodes.extend(_descendants(ch))
+    return nodes
+
+
+@requires_application()
+def test_sort_by_gl_state():
+    """Test grouping siblings by GL state in the draw order"""
+    with TestingCanvas() as c:
+        visuals = [_markers('translucent'), _markers('additive'),
+                   _markers('translucent'), _markers('additive', order=-1)]
+        for v in visuals:
+            v.parent = c.scene
+
+        def drawn():
+            nodes = c._get_draw_list(c.scene).nodes
+            return [node for node in nodes if node in visuals]
+
+        assert_equal(drawn(), [visuals[3], visuals[0], visuals[1],
+                               visuals[2]])
+        c.sort_by_gl_state = True
+        assert_equal(drawn(), [visuals[3], visuals[1], visuals[0],
+                               visuals[2]])
+
+
+@requires_application()
+def test_dirty_regions():
+    """Test redrawing only the damaged region of the canvas"""
+    with TestingCanvas(size=(100, 100), dirty_regions=True) as c:
+        grid = c.central_widget.add_grid()
+        left = grid.add_widget(row=0, col=0, bgcolor='red')
+        right = grid.add_widget(row=0, col=1, bgcolor='blue')
+        c._draw_scene()
+        assert c._damaged_region() == (0, 0, 0, 0)
+
+        # The first update of a widget redraws all (as it is not known
+        # where it was drawn); after that only the widget is redrawn
+        right.bgcolor = 'green'
+        assert c._damaged_region() is None
+        c._draw_scene()
+        right.bgcolor = 'yellow'
+        x, y, w, h = c._damaged_region()
+        s = c.pixel_scale
+        assert x <= right.pos[0] * s and x + w >= 100 * s
+        assert w < 80 * s and h >= 100 * s
+
+        # Other updates redraw all
+        c.update()
+        assert c._damaged_region() is None
+
+        # The result is the same as drawing the whole scene
+        c._draw_scene()
+        right.bgcolor = 'green'
+        c._draw_scene()
+        assert_array_equal(_screenshot()[..., :3],
+                           c.render()[..., :3])
+        left.visible = False
+        c._draw_scene()
+        assert_array_equal(_screenshot()[..., :3],
+                           c.render()[..., :3])
+
+
+@requires_application()
+def test_picking_buffer():
+    """Test that the picking render is reused until the scene changes"""
+    with TestingCanvas(size=(100, 100)) as c:
+        rect = scene.visuals.Rectangle(center=(50, 50), width=40,
+                                       height=40, parent=c.scene)
+        rect.interactive = True
+        s = c.pixel_scale
+
+        # The first query only draws its crop; the next one draws all
+        assert c.visual_at((50, 50)) is rect
+        assert_equal(c._picking_valid, [(50 * s, 50 * s, 1, 1)])
+        assert c.visual_at((5, 5)) is None
+        full = [(0, 0) + c.physical_size]
+        assert_equal(c._picking_valid, full)
+        assert c.visual_at((60, 40)) is rect
+        assert_equal(c._picking_valid, full)
+
+        # Changes invalidate the picking render
+        rect.center = (20, 20)
+        assert c._picking_valid is None
+        assert c.visual_at((50, 50)) is None
+        assert c.visual_at((20, 20)) is rect
+
+
+def test_nearest_ids():
+    """Test searching picking IDs by distance"""
+    ids = np.zeros((7, 7), np.uint32)
+    ids[3, 3] = 5  # center
+    ids[0, 3] = 7  # 3 up
+    ids[3, 5] = 7  # 2 right
+    ids[6, 6] = 9  # outside of the radius
+    ids[5, 2] = 9
+    hits = _nearest_ids(ids, 3)
+    assert_equal(hits, [(5, 0., 0, 0), (7, 2., 2, 0),
+                        (9, np.sqrt(5), -1, -2)])
+    assert_equal(_nearest_ids(np.zeros((1, 1), np.uint32), 0), [])
+
+
+@requires_application()
+def test_hits_at():
+    """Test finding visuals near a position"""
+    with TestingCanvas(size=(100, 100)) as c:
+        rect = scene.visuals.Rectangle(center=(50, 50), width=20,
+                                       height=20, parent=c.scene)
+        rect.interactive = True
+        s = c.pixel_scale
+        assert_equal(c.hits_at((50, 20), radius=5 * s), [])
+        hits = c.hits_at((50, 30), radius=10 * s)
+        assert_equal(len(hits), 1)
+        vis, dist, pos = hits[0]
+        assert vis is rect
+        assert 9 * s <= dist <= 11 * s
+        assert abs(pos[0] - 50) <= 1 and 39 <= pos[1] <= 41
+        assert_equal(c.visuals_at((50, 30), radius=10 * s), [rect])
+
+
+def test_element_index():
+    """Test the element index of markers, meshes and lines"""
+    markers = scene.visuals.Markers()
+    assert not markers.element_picking
+    markers.element_picking = True
+    assert markers._element_picking_filter is not None
+    markers.set_data(np.zeros((3, 2)))
+    index, offset = markers._element_index()
+    assert_array_equal(index, [0, 1, 2])
+    markers.element_picking = False
+    assert markers._element_picking_filter is None
+
+    verts = np.random.rand(4, 3)
+    faces = np.array([[0, 1, 2], [1, 2, 3]])
+    mesh = scene.visuals.Mesh(verts, faces, shading='smooth')
+    mesh.element_picking = True
+    index, offset = mesh._element_index()
+    assert_array_equal(index, [0, 0, 0, 1, 1, 1])
+
+    line = scene.visuals.Line(np.zeros((4, 2)))
+    line.element_picking = True
+    assert_array_equal(line._line_visual._element_index()[0], [0, 1, 2, 3])
+    line.set_data(connect='segments')
+    assert_array_equal(line._line_visual._element_index()[0], [0, 0, 1, 1])
+    line.set_data(connect=np.array([[0, 2]]))
+    assert_array_equal(line._line_visual._element_index()[0], [-1] * 4)
+    # Visuals that do not support element picking ignore it
+    line = scene.visuals.Line(np.zeros((4, 2)), method='agg')
+    assert line._line_visual._element_index() is None
+    line.element_picking = True
+    assert not line.element_picking
+    image = scene.visuals.Image(np.zeros((4, 4), np.float32))
+    image.element_picking = True
+    assert not image.element_picking
+    assert image._element_picking_filter is None
+
+
+@requires_application()
+def test_element_at():
+    """Test picking the elements of a visual"""
+    with TestingCanvas(size=(100, 100)) as c:
+        pos = np.array([[20, 20], [50, 50], [80, 80]])
+        markers = scene.visuals.Markers(pos=pos, size=10, parent=c.scene)
+        markers.interactive = True
+        assert_equal(c.element_at((50, 50)), (markers, None))
+        markers.element_picking = True
+        for i, p in enumerate(pos):
+            assert_equal(c.element_at(p), (markers, i))
+        assert_equal(c.element_at((50, 20)), None)
+        # The picking render is still valid for visuals
+        assert c.visual_at((80, 80)) is markers
+
+        # A visual without element picking gives no element
+        markers.parent = None
+        image = scene.visuals.Image(np.ones((100, 100), np.float32),
+                                    parent=c.scene)
+        image.interactive = True
+        image.element_picking = True
+        assert_equal(c.element_at((50, 50)), (image, None))
+
+
+run_tests_if_main()
@@ -1,5 +1,12 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy import gloo, scene
+from vispy.gloo.context import FakeCanvas, forget_canvas
 from vispy.scene import visuals, Node
+from vispy.scene.canvas import _draw_batch
 from vispy.scene.visuals import VisualNode
+from vispy.testing import requires_application, TestingCanvas
 import vispy.visuals
 
 
@@ -26,3 +33,145 @@ def test_visual_node_generation():
             vis_node = getattr(visuals, name[:-6])
             assert issubclass(vis_node, Node)
             assert issubclass(vis_node, obj)
+
+
+def test_line_batch_key():
+    """Test which lines can be drawn together"""
+    parent = Node()
+    pos = np.random.rand(10, 2).astype(np.float32)
+
+    def line(**kwargs):
+        kwargs.setdefault('pos', pos)
+        kwargs.setdefault('parent', parent)
+        return scene.visuals.Line(**kwargs)
+
+    a = line(color='red')
+    key = a._batch_key()
+    assert key is not None
+    assert line(color=np.random.rand(10, 4))._batch_key() == key
+    assert line(width=2)._batch_key() != key
+    assert line(connect='segments')._batch_key() != key
+    assert line(parent=Node())._batch_key() != key
+    b = line()
+    b.opacity = 0.5
+    assert b._batch_key() != key
+    b.opacity = 1
+    assert b._batch_key() == key
+    b.set_gl_state('additive')
+    assert b._batch_key() != key
+
+    # Lines that cannot be drawn together
+    assert line(method='agg')._batch_key() is None
+    assert line(connect=np.array([[0, 1]]))._batch_key() is None
+    assert line(color='viridis')._batch_key() is None
+    assert line(color=np.random.rand(3, 4))._batch_key() is None
+    b = line()
+    b.transform = scene.STTransform(scale=(2, 1))
+    assert b._batch_key() is None
+    b = line()
+    b.element_picking = True
+    assert b._batch_key() is None
+    b = line()
+    b.picking = True
+    assert b._batch_key() is None
+
+
+def test_line_batch_draw():
+    """Test drawing a run of lines in one draw call"""
+    class Parser(gloo.glir.BaseGlirParser):
+        def __init__(self):
+            gloo.glir.BaseGlirParser.__init__(self)
+            self.commands = []
+
+        def is_remote(self):
+            return False
+
+        def parse(self, commands):
+            self.commands.extend(commands)
+
+    c = FakeCanvas()
+    try:
+        parser = Parser()
+        c.context.shared.parser = parser
+        parent = Node()
+        lines = [scene.visuals.Line(np.random.rand(n, 2), parent=parent,
+                                    color=np.random.rand(4))
+                 for n in (10, 3, 5)]
+        _draw_batch(lines)
+        c.flush()
+        draws = [cmd for cmd in parser.commands if cmd[0] == 'DRAW']
+        assert len(draws) == 1
+        assert draws[0][2] == 'line_strip'
+        assert_array_equal(draws[0][3][0], [0, 10, 13])
+        assert_array_equal(draws[0][3][1], [10, 3, 5])
+
+        # The concatenated data is only uploaded again when a line changes
+        parser.commands = []
+        _draw_batch(lines)
+        c.flush()
+        assert 'DATA' not in [cmd[0] for cmd in parser.commands]
+        lines[1].set_data(pos=np.random.rand(4, 2))
+        _draw_batch(lines)
+        c.flush()
+        assert 'DATA' in [cmd[0] for cmd in parser.commands]
+        assert_array_equal(parser.commands[-1][3][1], [10, 4, 5])
+    finally:
+        forget_canvas(c)
+
+
+@requires_application()
+def test_batch_draws():
+    """Test drawing lines with the same shader program at once"""
+    with TestingCanvas(size=(60, 60), bgcolor='k') as c:
+        view = c.central_widget.add_view()
+        view.camera = 'panzoom'
+        view.camera.set_range((0, 1), (0, 1), margin=0)
+        rng = np.random.RandomState(0)
+        lines = [scene.visuals.Line(rng.rand(10, 2), parent=view.scene,
+                                    color=rng.rand(4) * 0.5 + 0.5)
+                 for i in range(20)]
+        lines[5].set_data(connect='segments')  # ends the run
+        image = c.render()
+        assert lines[0]._batch_visual is not None
+        assert lines[1]._batch_visual is None
+        assert lines[6]._batch_visual is not None
+        assert image[..., :3].max() > 0
+
+        c.batch_draws = False
+        assert_array_equal(c.render(), image)
+
+
+def test_camera_uniform_block():
+    # The visuals in a view read the camera transform from one block
+    view = scene.widgets.ViewBox(parent=Node())
+    view.camera = 'panzoom'
+    line = visuals.Line(np.random.rand(10, 2), parent=view.scene)
+    markers = visuals.Markers(parent=view.scene)
+    markers.set_data(np.random.rand(10, 2))
+    cam_tr = view.camera._scene_transform
+    block = cam_tr.uniform_block
+    assert block.variables == [cam_tr.shader_map()['scale'],
+                               cam_tr.shader_map()['translate']]
+    programs = [line._subvisuals[0]._program, markers._program]
+    for prog in programs:
+        assert prog._uniform_blocks == [block]
+        prog._use_uniform_blocks = True
+        prog._need_build = True
+        prog.build_if_needed()
+        assert 'uniform Camera {' in prog.shaders[0].code
+        assert prog._active_blocks == [block]
+
+    # Panning changes the shared values, not the code
+    code = programs[0].shaders[0].code
+    view.camera.rect = (1, 1, 2, 2)
+    assert cam_tr.uniform_block is block
+    assert not programs[0]._need_build
+    programs[0].build_if_needed()
+    assert programs[0].shaders[0].code == code
+
+    # A new camera brings its own block
+    view.camera = 'turntable'
+    new_block = view.camera._scene_transform.uniform_block
+    assert new_block is not None and new_block is not block
+    for prog in programs:
+        assert prog._uniform_blocks == [new_block]
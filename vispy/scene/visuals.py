@@ -18,6 +18,7 @@ import weakref
 from .. import visuals
 from .node import Node
 from ..visuals.filters import Alpha, PickingFilter
+from ..visuals.transforms import NullTransform
 
 
 class VisualNode(Node):
@@ -98,6 +99,15 @@ class VisualNode(Node):
             return
         self._visual_superclass.draw(self)
 
+    def _batch_key(self):
+        # Siblings without a transform of their own map the same way
+        if self.picking or not isinstance(self.transform, NullTransform):
+            return None
+        key = self._visual_superclass._batch_key(self)
+        if key is None:
+            return None
+        return (self.parent,) + key
+
 
 def create_visual_node(subclass):
     # Create a new subclass of Node.
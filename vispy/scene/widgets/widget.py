@@ -252,6 +252,21 @@ class Widget(Compound):
             self.update()
             self.events.resize()
 
+    def _damage_rect(self):
+        """ The rect of the widget in canvas coordinates, padded by one
+        pixel for antialiasing. Widgets and their children are assumed to
+        draw inside their rect.
+        """
+        tr = self.get_transform('visual', 'canvas')
+        if not tr.Linear:
+            return None
+        w, h = self.size
+        corners = tr.map([[0, 0], [w, 0], [0, h], [w, h]])
+        corners = corners[:, :2] / corners[:, 3:4]
+        lo = corners.min(axis=0) - 1
+        hi = corners.max(axis=0) + 1
+        return Rect(tuple(lo), tuple(hi - lo))
+
     @property
     def inner_rect(self):
         """The rectangular area inside the margin, border, and padding.
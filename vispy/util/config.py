@@ -53,7 +53,12 @@ def _init():
         'default_backend': string_types,
         'gl_backend': string_types,
         'gl_debug': (bool,),
+        'production': (bool,),
+        'error_check_interval': (int,),
         'glir_file': string_types+file_types,
+        'glir_record': string_types+file_types,
+        'shader_cache_dir': string_types,
+        'glyph_cache_dir': string_types,
         'include_path': list,
         'logging_level': string_types,
         'qt_lib': string_types,
@@ -69,7 +74,12 @@ def _init():
         'default_backend': '',
         'gl_backend': 'gl2',
         'gl_debug': False,
+        'production': False,
+        'error_check_interval': 1,
         'glir_file': '',
+        'glir_record': '',
+        'shader_cache_dir': '',
+        'glyph_cache_dir': '',
         'include_path': [],
         'logging_level': 'info',
         'qt_lib': 'any',
@@ -117,9 +127,17 @@ VisPy command line arguments:
   --vispy-gl-debug
     Enables error checking for all OpenGL calls.
 
+  --vispy-production
+    Only check for OpenGL errors once per flush of GLIR commands, instead of
+    before and after every draw.
+
   --vispy-glir-file
     Export glir commands to specified file.
 
+  --vispy-glir-record
+    Record glir commands, including all data, to the specified file in
+    binary form. See vispy.gloo.glir_replay for replaying a recording.
+
   --vispy-profile=locations
     Measure performance at specific code locations and display results.
     *locations* may be "all" or a comma-separated list of method names like
@@ -144,7 +162,8 @@ def _parse_command_line_arguments():
     """
     global config
     # Get command line args for vispy
-    argnames = ['vispy-backend=', 'vispy-gl-debug', 'vispy-glir-file=',
+    argnames = ['vispy-backend=', 'vispy-gl-debug', 'vispy-production',
+                'vispy-glir-file=', 'vispy-glir-record=',
                 'vispy-log=', 'vispy-help', 'vispy-profile=', 'vispy-cprofile',
                 'vispy-dpi=', 'vispy-audit-tests']
     try:
@@ -159,8 +178,12 @@ def _parse_command_line_arguments():
                 logger.info('vispy backend: %s', a)
             elif o == '--vispy-gl-debug':
                 config['gl_debug'] = True
+            elif o == '--vispy-production':
+                config['production'] = True
             elif o == '--vispy-glir-file':
                 config['glir_file'] = a
+            elif o == '--vispy-glir-record':
+                config['glir_record'] = a
             elif o == '--vispy-log':
                 if ',' in a:
                     verbose, match = a.split(',')
@@ -10,5 +10,6 @@ fonts.
 
 __all__ = ['list_fonts']
 
-from ._triage import _load_glyph, list_fonts  # noqa, analysis:ignore
+from ._triage import (_load_glyph, _load_kerning, _get_font_file,  # noqa
+                      list_fonts)  # noqa, analysis:ignore
 from ._vispy_fonts import _vispy_fonts  # noqa, analysis:ignore
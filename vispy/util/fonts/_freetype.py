@@ -65,9 +65,25 @@ def _load_glyph(f, char, glyphs_dict):
     glyph = dict(char=char, offset=(left, top), bitmap=bitmap,
                  advance=advance, kerning={})
     glyphs_dict[char] = glyph
-    # Generate kerning
+    _set_kerning(face, char, glyphs_dict)
+
+
+def _load_kerning(f, char, glyphs_dict):
+    """Set the kerning between a glyph in the dict and the other glyphs"""
+    face = _load_font(f['face'], f['bold'], f['italic'])
+    face.set_char_size(f['size'] * 64)
+    _set_kerning(face, char, glyphs_dict)
+
+
+def _set_kerning(face, char, glyphs_dict):
+    glyph = glyphs_dict[char]
     for other_char, other_glyph in glyphs_dict.items():
         kerning = face.get_kerning(other_char, char)
         glyph['kerning'][other_char] = kerning.x / 64.
         kerning = face.get_kerning(char, other_char)
         other_glyph['kerning'][char] = kerning.x / 64.
+
+
+def _get_font_file(face, bold, italic):
+    """Get the file name of a font"""
+    return _load_font(face, bold, italic)._filename
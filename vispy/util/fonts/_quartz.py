@@ -83,7 +83,14 @@ def _load_font(face, bold, italic):
     return font
 
 
-def _load_glyph(f, char, glyphs_dict):
+def _get_font_file(face, bold, italic):
+    """Get the file name of a font, or None for system fonts"""
+    if face in _vispy_fonts:
+        return _get_vispy_font_filename(face, bold, italic)
+    return None
+
+
+def _load_sized_font(f):
     font = _load_font(f['face'], f['bold'], f['italic'])
     # resize loaded font
     args = [None, 0, cf.kCFTypeDictionaryKeyCallBacks,
@@ -95,6 +102,11 @@ def _load_glyph(f, char, glyphs_dict):
     cf.CFRelease(desc)
     if not font:
         raise RuntimeError("Couldn't load font")
+    return font
+
+
+def _load_glyph(f, char, glyphs_dict):
+    font = _load_sized_font(f)
     # Create an attributed string using text and font.
     args = [None, 1, cf.kCFTypeDictionaryKeyCallBacks,
             cf.kCFTypeDictionaryValueCallBacks]
@@ -152,13 +164,24 @@ def _load_glyph(f, char, glyphs_dict):
     glyph = dict(char=char, offset=(left, top), bitmap=bitmap,
                  advance=advance, kerning={})
     glyphs_dict[char] = glyph
-    # Generate kerning
+    _set_kerning(font, char, glyphs_dict)
+    cf.CFRelease(font)
+
+
+def _load_kerning(f, char, glyphs_dict):
+    """Set the kerning between a glyph in the dict and the other glyphs"""
+    font = _load_sized_font(f)
+    _set_kerning(font, char, glyphs_dict)
+    cf.CFRelease(font)
+
+
+def _set_kerning(font, char, glyphs_dict):
+    glyph = glyphs_dict[char]
     for other_char, other_glyph in glyphs_dict.items():
         glyph['kerning'][other_char] = (_get_k_p_a(font, other_char, char) -
                                         other_glyph['advance'])
         other_glyph['kerning'][char] = (_get_k_p_a(font, char, other_char) -
                                         glyph['advance'])
-    cf.CFRelease(font)
 
 
 def _get_k_p_a(font, left, right):
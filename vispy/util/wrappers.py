@@ -20,10 +20,11 @@ import subprocess
 from .config import _get_args
 
 
-def use(app=None, gl=None):
+def use(app=None, gl=None, production=None):
     """ Set the usage options for vispy
 
-    Specify what app backend and GL backend to use.
+    Specify what app backend and GL backend to use, and whether to run
+    in production mode.
 
     Parameters
     ----------
@@ -53,11 +54,17 @@ def use(app=None, gl=None):
               on DirectX.
             * 'gl+': use the full OpenGL functionality available on
               your system (via PyOpenGL).
+    production : bool
+        If True, OpenGL errors are checked once per flush of GLIR
+        commands (or every ``config['error_check_interval']`` flushes)
+        instead of before and after every draw. This avoids stalling the
+        pipeline, but errors are reported later and less precisely.
 
     Notes
     -----
     If the app option is given, ``vispy.app.use_app()`` is called. If
-    the gl option is given, ``vispy.gloo.use_gl()`` is called.
+    the gl option is given, ``vispy.gloo.use_gl()`` is called. The
+    production option sets ``vispy.config['production']``.
 
     If an app backend name is provided, and that backend could not be
     loaded, an error is raised.
@@ -73,8 +80,9 @@ def use(app=None, gl=None):
     vispy.app.use_app
     vispy.gloo.gl.use_gl
     """
-    if app is None and gl is None:
-        raise TypeError('Must specify at least one of "app" or "gl".')
+    if app is None and gl is None and production is None:
+        raise TypeError('Must specify at least one of "app", "gl" or '
+                        '"production".')
 
     # Example for future. This wont work (yet).
     if app == 'ipynb_webgl':
@@ -88,6 +96,9 @@ def use(app=None, gl=None):
             raise ValueError("Do not specify gl when using osmesa")
 
     # Apply now
+    if production is not None:
+        from .. import config
+        config['production'] = bool(production)
     if gl:
         from .. import gloo, config
         config['gl_backend'] = gl
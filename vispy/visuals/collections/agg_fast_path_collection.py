@@ -13,7 +13,7 @@ on miter joins which may result in some glitches on screen.
 """
 import numpy as np
 from ... import glsl
-from ...gloo import gl
+from ... import gloo
 from . collection import Collection
 from ..transforms import NullTransform
 
@@ -221,6 +221,6 @@ class AggFastPathCollection(Collection):
     def draw(self, mode="triangle_strip"):
         """ Draw collection """
 
-        gl.glDepthMask(gl.GL_FALSE)
+        gloo.set_depth_mask(False)
         Collection.draw(self, mode)
-        gl.glDepthMask(gl.GL_TRUE)
+        gloo.set_depth_mask(True)
@@ -12,7 +12,7 @@ thick paths where quality is critical.
 """
 import numpy as np
 from ... import glsl
-from ...gloo import gl
+from ... import gloo
 from . collection import Collection
 from ..transforms import NullTransform
 
@@ -198,6 +198,6 @@ class AggPathCollection(Collection):
     def draw(self, mode="triangles"):
         """ Draw collection """
 
-        gl.glDepthMask(0)
+        gloo.set_depth_mask(False)
         Collection.draw(self, mode)
-        gl.glDepthMask(1)
+        gloo.set_depth_mask(True)
@@ -4,4 +4,4 @@
 
 from .clipper import Clipper  # noqa
 from .color import Alpha, ColorFilter, IsolineFilter, ZColormapFilter  # noqa
-from .picking import PickingFilter  # noqa
+from .picking import PickingFilter, ElementPickingFilter  # noqa
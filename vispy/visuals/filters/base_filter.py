@@ -28,6 +28,15 @@ class BaseFilter(object):
         """
         raise NotImplementedError(self)
 
+    def _batch_key(self):
+        """Return a key that is equal for filters that have the same effect
+        on visuals that are drawn together (see `BaseVisual._batch_key`),
+        or None if visuals with this filter cannot be drawn together.
+
+        By default a filter is only equal to itself.
+        """
+        return self
+
 
 class Filter(BaseFilter):
     """Base class for all filters that use fragment and/or vertex shaders.
@@ -128,6 +128,9 @@ class Alpha(Filter):
         self._alpha = a
         self.fshader['alpha'] = float(a)
 
+    def _batch_key(self):
+        return ('alpha', float(self._alpha))
+
 
 class ColorFilter(Filter):
     FRAG_SHADER = """
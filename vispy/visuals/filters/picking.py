@@ -4,7 +4,11 @@
 
 import struct
 
+import numpy as np
+
 from .base_filter import Filter
+from ..shaders import Varying
+from ...gloo import VertexBuffer
 
 
 class PickingFilter(Filter):
@@ -57,3 +61,90 @@ class PickingFilter(Filter):
         that use this filter.
         """
         return self._id_color
+
+    def _batch_key(self):
+        # The ID only matters when picking
+        return None if self._enabled else ('picking',)
+
+
+class ElementPickingFilter(Filter):
+    """Filter used to color the elements of a visual (e.g. markers, faces or
+    line segments) by their index.
+
+    The element index of each vertex is given by a vertex attribute. The
+    color drawn is the index plus one, so that a value of 0 in the
+    framebuffer means that no element was drawn there. Vertices with an
+    index of -1 do not belong to an element.
+
+    Like PickingFilter, this may not be used with blending enabled.
+
+    Parameters
+    ----------
+    index : array | None
+        The element index of each vertex.
+    offset : float
+        The value added to the interpolated index before it is rounded
+        down. Use 0.5 when all vertices of a primitive have the same
+        index, and 0 when the index increases by one along a primitive
+        (as for the segments of a line strip).
+    """
+    VERT_SHADER = """
+        void element_picking_support() {
+            $v_index = $index;
+        }
+    """
+
+    FRAG_SHADER = """
+        void element_picking_filter() {
+            if( $enabled == 0 )
+                return;
+            if( gl_FragColor.a == 0.0 )
+                discard;
+            float i = floor($v_index + $offset) + 1.0;
+            gl_FragColor = vec4(mod(i, 256.0),
+                                mod(floor(i / 256.0), 256.0),
+                                mod(floor(i / 65536.0), 256.0),
+                                floor(i / 16777216.0)) / 255.0;
+        }
+    """
+
+    def __init__(self, index=None, offset=0.5):
+        super(ElementPickingFilter, self).__init__(
+            vcode=self.VERT_SHADER, vpos=10,
+            fcode=self.FRAG_SHADER, fpos=10)
+
+        self._index = VertexBuffer(np.zeros(0, np.float32))
+        self.vshader['index'] = self._index
+        self.vshader['v_index'] = Varying('v_element_index', dtype='float')
+        self.fshader['v_index'] = self.vshader['v_index']
+        self.set_index(index, offset)
+        self.enabled = False
+
+    def _batch_key(self):
+        # The index is per-vertex data of one visual
+        return None
+
+    def set_index(self, index, offset=0.5):
+        """Set the element index of each vertex
+
+        Parameters
+        ----------
+        index : array | None
+            The element index of each vertex. If None, the current index
+            is kept.
+        offset : float
+            The value added to the interpolated index before it is rounded
+            down.
+        """
+        if index is not None:
+            self._index.set_data(np.asarray(index, np.float32))
+        self.fshader['offset'] = float(offset)
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, e):
+        self._enabled = e
+        self.fshader['enabled'] = 1 if e is True else 0
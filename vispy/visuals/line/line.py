@@ -7,6 +7,8 @@ Line visual implementing Agg- and GL-based drawing modes.
 
 from __future__ import division
 
+import weakref
+
 import numpy as np
 
 from ... import gloo, glsl
@@ -103,6 +105,10 @@ class LineVisual(CompoundVisual):
         self._bounds = None
         self._antialias = None
         self._method = 'none'
+        # Lets batches of lines know when the data changed
+        self._data_version = 0
+        self._batch_color = (None, None)  # (data version, rgba or None)
+        self._batch_visual = None
 
         CompoundVisual.__init__(self, [])
 
@@ -189,6 +195,11 @@ class LineVisual(CompoundVisual):
             self._connect = connect
             self._changed['connect'] = True
 
+        if self._line_visual is not None and (pos is not None or
+                                              connect is not None):
+            self._line_visual._update_element_index()
+
+        self._data_version += 1
         self.update()
 
     @property
@@ -203,6 +214,25 @@ class LineVisual(CompoundVisual):
     def connect(self):
         return self._connect
 
+    @property
+    def element_picking(self):
+        """Whether the line segments can be picked individually
+
+        Only supported by the 'gl' method. The index of a segment is the
+        index of its first vertex for 'strip' and boolean connect arrays,
+        and the index of the vertex pair for 'segments'. Lines connected by
+        an array of vertex pairs have no element indices.
+        """
+        return self._line_visual.element_picking
+
+    @element_picking.setter
+    def element_picking(self, enable):
+        self._line_visual.element_picking = enable
+
+    @property
+    def _element_picking_filter(self):
+        return self._line_visual._element_picking_filter
+
     @property
     def pos(self):
         return self._pos
@@ -272,6 +302,66 @@ class LineVisual(CompoundVisual):
             return False
         CompoundVisual._prepare_draw(self, view)
 
+    def _batch_key(self):
+        """Lines of the 'gl' method that are connected as strips or
+        segments, have a color per line or per vertex, and have the same
+        width, antialiasing, filters and GL state are drawn in one draw
+        call by `_draw_batch`.
+        """
+        connect = self._connect
+        if (self._method != 'gl' or self._pos is None or not self._width or
+                not isinstance(connect, string_types) or
+                connect not in ('strip', 'segments') or
+                self._get_batch_color() is None):
+            return None
+        visual = self._line_visual
+        filters = []
+        for filt in visual._vshare.filters + visual._filters:
+            key = filt._batch_key()
+            if key is None:
+                return None
+            filters.append(key)
+        gl_state = tuple(sorted((key, repr(val)) for key, val in
+                                visual._vshare.gl_state.items()))
+        return (_GLLineBatchVisual, connect, self._width, self._antialias,
+                tuple(filters), gl_state)
+
+    def _get_batch_color(self):
+        """The rgba color of the line or of each vertex, or None if the
+        color is a colormap or does not match the vertices.
+        """
+        if self._batch_color[0] != self._data_version:
+            color, cmap = self._interpret_color()
+            if isinstance(color, Function) or \
+                    (color.ndim == 2 and len(color) != len(self._pos)):
+                color = None
+            self._batch_color = (self._data_version, color)
+        return self._batch_color[1]
+
+    def _draw_batch(self, lines):
+        if self._batch_visual is None:
+            self._batch_visual = _GLLineBatchVisual()
+        self._batch_visual.draw_lines(self, lines)
+
+
+def _set_line_state(transforms, width, antialias):
+    """Set the GL line width and smoothing for the next draw"""
+    # Do we want to use OpenGL, and can we?
+    GL = None
+    from ...app._default_app import default_app
+    if default_app is not None and \
+            default_app.backend_name != 'ipynb_webgl':
+        try:
+            import OpenGL.GL as GL
+        except Exception:  # can be other than ImportError sometimes
+            pass
+
+    # Turn on line smooth and/or line width. These go through GLIR, so
+    # that they are ordered with the draws when commands are batched.
+    if GL:
+        gloo.set_state(line_smooth=bool(antialias))
+        gloo.set_line_width(max(transforms.pixel_scale * width, 1.))
+
 
 class _GLLineVisual(Visual):
     VERTEX_SHADER = """
@@ -305,6 +395,18 @@ class _GLLineVisual(Visual):
         xform = view.transforms.get_transform()
         view.view_program.vert['transform'] = xform
 
+    def _element_index(self):
+        pos, connect = self._parent._pos, self._parent._connect
+        if pos is None:
+            return None, 0.
+        n = len(pos)
+        if isinstance(connect, string_types) and connect == 'segments':
+            return np.arange(n, dtype=np.float32) // 2, 0.5
+        elif isinstance(connect, np.ndarray) and connect.ndim == 2:
+            return -np.ones(n, dtype=np.float32), 0.5
+        # Strips: the index increases by one along each segment
+        return np.arange(n, dtype=np.float32), 0.
+
     def _prepare_draw(self, view):
         prof = Profiler()
 
@@ -342,25 +444,8 @@ class _GLLineVisual(Visual):
             self.shared_program['texture2D_LUT'] = cmap.texture_lut() \
                 if (hasattr(cmap, 'texture_lut')) else None
 
-        # Do we want to use OpenGL, and can we?
-        GL = None
-        from ...app._default_app import default_app
-        if default_app is not None and \
-                default_app.backend_name != 'ipynb_webgl':
-            try:
-                import OpenGL.GL as GL
-            except Exception:  # can be other than ImportError sometimes
-                pass
-
-        # Turn on line smooth and/or line width
-        if GL:
-            if self._parent._antialias:
-                GL.glEnable(GL.GL_LINE_SMOOTH)
-            else:
-                GL.glDisable(GL.GL_LINE_SMOOTH)
-            px_scale = self.transforms.pixel_scale
-            width = px_scale * self._parent._width
-            GL.glLineWidth(max(width, 1.))
+        _set_line_state(self.transforms, self._parent._width,
+                        self._parent._antialias)
 
         if self._parent._changed['connect']:
             self._connect = self._parent._interpret_connect()
@@ -389,6 +474,86 @@ class _GLLineVisual(Visual):
         prof('draw')
 
 
+class _GLLineBatchVisual(Visual):
+    """Draws several lines of the 'gl' method in one draw call
+
+    The vertices and colors of the lines are concatenated into shared
+    buffers, and the lines are drawn as ranges of these buffers with one
+    multi-draw. The transforms, filters, GL state, width and antialiasing
+    are taken from the first line, so all lines must have the same batch
+    key (see `LineVisual._batch_key`).
+    """
+
+    def __init__(self):
+        self._pos_vbo = gloo.VertexBuffer(np.zeros((0, 3), np.float32))
+        self._color_vbo = gloo.VertexBuffer(np.zeros((0, 4), np.float32))
+        self._lines = None  # (weakref, data version) of the drawn lines
+        self._width = 1
+        self._antialias = False
+
+        Visual.__init__(self, vcode=_GLLineVisual.VERTEX_SHADER,
+                        fcode=_GLLineVisual.FRAGMENT_SHADER)
+        self._program.vert['position'] = self._pos_vbo
+        self._program.vert['to_vec4'] = vec3to4
+        self._program.vert['color'] = self._color_vbo
+
+    def _prepare_transforms(self, view):
+        xform = view.transforms.get_transform()
+        view.view_program.vert['transform'] = xform
+
+    def draw_lines(self, leader, lines):
+        """Draw the lines with the transforms, filters and GL state of
+        the first line
+
+        Parameters
+        ----------
+        leader : LineVisual
+            The first line.
+        lines : list of LineVisual
+            The lines to draw, starting with *leader*.
+        """
+        visual = leader._line_visual
+        if self.transforms is not leader.transforms:
+            self.transforms = leader.transforms
+            self._prepare_transforms(self)
+        filters = visual._vshare.filters + visual._filters
+        if filters != self._filters:
+            for filt in list(self._filters):
+                self.detach(filt, self)
+            for filt in filters:
+                self.attach(filt, self)
+        self._vshare.gl_state = visual._vshare.gl_state
+        self._width = leader._width
+        self._antialias = leader._antialias
+
+        state = [(weakref.ref(line), line._data_version) for line in lines]
+        if state != self._lines:
+            self._set_lines(lines)
+            self._lines = state
+        self.draw()
+
+    def _set_lines(self, lines):
+        counts = np.array([len(line._pos) for line in lines])
+        firsts = np.cumsum(counts) - counts
+        pos = np.zeros((counts.sum(), 3), np.float32)
+        color = np.empty((counts.sum(), 4), np.float32)
+        for line, first, count in zip(lines, firsts, counts):
+            line_pos = np.asarray(line._pos)
+            pos[first:first + count, :line_pos.shape[-1]] = line_pos
+            color[first:first + count] = line._get_batch_color()
+        self._pos_vbo.set_data(pos)
+        self._color_vbo.set_data(color)
+        if lines[0]._connect == 'strip':
+            self._draw_mode = 'line_strip'
+        else:
+            self._draw_mode = 'lines'
+            counts -= counts % 2  # an unpaired last vertex is not drawn
+        self._index_buffer = np.column_stack([firsts, counts])
+
+    def _prepare_draw(self, view):
+        _set_line_state(self.transforms, self._width, self._antialias)
+
+
 class _AggLineVisual(Visual):
     _agg_vtype = np.dtype([('a_position', np.float32, 2),
                            ('a_tangents', np.float32, 4),
@@ -580,6 +580,7 @@ class MarkersVisual(Visual):
             # are actually going to draw.
             self._vbo.set_data(data)
             self.shared_program.bind(self._vbo)
+        self._update_element_index()
         self.update()
 
     @property
@@ -625,6 +626,11 @@ class MarkersVisual(Visual):
         else:
             view.view_program['u_scale'] = 1
 
+    def _element_index(self):
+        if self._data is None:
+            return None, 0.5
+        return np.arange(len(self._data), dtype=np.float32), 0.5
+
     def _compute_bounds(self, axis, view):
         pos = self._data['a_position']
         if pos is None:
@@ -350,7 +350,9 @@ class MeshVisual(Visual):
     def _update_data(self):
         md = self.mesh_data
         # Update vertex/index buffers
-        if self.shading == 'smooth' and not md.has_face_indexed_data():
+        # Element picking needs the vertices of each face to be separate
+        if (self.shading == 'smooth' and not md.has_face_indexed_data() and
+                not self.element_picking):
             v = md.get_vertices()
             if v is None:
                 return False
@@ -442,8 +444,20 @@ class MeshVisual(Visual):
                 self._ambient_light_color.rgba
             self.shared_program.frag['shininess'] = self._shininess
 
+        self._update_element_index()
         self._data_changed = False
 
+    @Visual.element_picking.setter
+    def element_picking(self, enable):
+        Visual.element_picking.fset(self, enable)
+        self.mesh_data_changed()
+
+    def _element_index(self):
+        n_faces = self.mesh_data.n_faces
+        if n_faces is None:
+            return None, 0.5
+        return np.repeat(np.arange(n_faces, dtype=np.float32), 3), 0.5
+
     @property
     def shininess(self):
         """The shininess"""
@@ -7,7 +7,7 @@ code snippets.
 """
 
 __all__ = ['ModularProgram', 'Function', 'MainFunction', 'Variable', 'Varying',
-           'FunctionChain', 'Compiler', 'MultiProgram']
+           'FunctionChain', 'Compiler', 'MultiProgram', 'UniformBlock']
 
 from .program import ModularProgram  # noqa
 from .function import Function, MainFunction, FunctionChain  # noqa
@@ -15,3 +15,4 @@ from .function import StatementList  # noqa
 from .variable import Variable, Varying  # noqa
 from .compiler import Compiler  # noqa
 from .multiprogram import MultiProgram  # noqa
+from .uniform_block import UniformBlock  # noqa
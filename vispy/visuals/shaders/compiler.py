@@ -29,6 +29,13 @@ class Compiler(object):
         # look up name of some object
         name = compiler[obj]
 
+    A Compiler can be reused to compile the same shaders again after they
+    have changed. Objects then keep their names where possible, and the
+    definitions of functions that did not change are reused from the
+    previous compilation. The dependencies of shaders that did not change
+    are not collected again, and if no shader changed, the names are not
+    assigned again either.
+
     """
     def __init__(self, namespace=None, **shaders):
         # cache of compilation results for each function and variable
@@ -36,6 +43,11 @@ class Compiler(object):
             namespace = {}
         self._object_names = namespace  # {object: name}
         self.shaders = shaders
+        # {(shader, obj): (serial, version, code)} from the last compile
+        self._definitions = {}
+        # {shader_name: (shader, serial, deps)} from the last compile
+        self._dep_lists = {}
+        self._pretty = None
 
     def __getitem__(self, item):
         """
@@ -56,7 +68,9 @@ class Compiler(object):
             10x faster to compile.
 
         """
-        # Authoritative mapping of {obj: name}
+        # Authoritative mapping of {obj: name}; names from the previous
+        # compilation are kept if possible
+        prev_names = self._object_names
         self._object_names = {}
 
         #
@@ -65,39 +79,64 @@ class Compiler(object):
 
         # maps {shader_name: [deps]}
         self._shader_deps = {}
+        # The list of a shader that did not change since the previous
+        # compilation is reused
+        prev_lists = self._dep_lists
+        self._dep_lists = {}
+        unchanged = (pretty == self._pretty and
+                     set(self.shaders) == set(prev_lists))
 
         for shader_name, shader in self.shaders.items():
-            this_shader_deps = []
+            prev = prev_lists.get(shader_name)
+            if (prev is not None and prev[0] is shader and
+                    prev[1] == shader._serial):
+                this_shader_deps = prev[2]
+            else:
+                unchanged = False
+                this_shader_deps = []
+                dep_set = set()
+                for dep in shader.dependencies(sort=True):
+                    # visit each object no more than once per shader
+                    if dep.name is None or dep in dep_set:
+                        continue
+                    this_shader_deps.append(dep)
+                    dep_set.add(dep)
             self._shader_deps[shader_name] = this_shader_deps
-            dep_set = set()
-
-            for dep in shader.dependencies(sort=True):
-                # visit each object no more than once per shader
-                if dep.name is None or dep in dep_set:
-                    continue
-                this_shader_deps.append(dep)
-                dep_set.add(dep)
+            self._dep_lists[shader_name] = (shader, shader._serial,
+                                            this_shader_deps)
+        self._pretty = pretty
 
         #
-        # 2. Assign names to all objects.
+        # 2. Assign names to all objects. If no shader changed, all objects
+        #    keep their names.
         #
-        if pretty:
-            self._rename_objects_pretty()
+        if unchanged:
+            self._object_names = prev_names
+        elif pretty:
+            self._rename_objects_pretty(prev_names)
         else:
             self._rename_objects_fast()
 
+        # Objects that were compiled before under another name
+        renamed = set()
+        if not unchanged:
+            renamed = set(obj for obj, name in self._object_names.items()
+                          if prev_names.get(obj, name) != name)
+
         #
         # 3. Now we have a complete namespace; concatenate all definitions
         # together in topological order.
         #
         compiled = {}
-        obj_names = self._object_names
+        prev_definitions = self._definitions
+        self._definitions = {}
 
         for shader_name, shader in self.shaders.items():
             code = []
             version = shader.version_pragma
             for dep in self._shader_deps[shader_name]:
-                dep_code = dep.definition(obj_names, version, shader)
+                dep_code = self._definition(dep, version, shader,
+                                            prev_definitions, renamed)
                 if dep_code is not None:
                     code.append(dep_code)
                   
@@ -109,6 +148,27 @@ class Compiler(object):
         self.code = compiled
         return compiled
 
+    def _definition(self, obj, version, shader, prev_definitions, renamed):
+        """ Return the definition of *obj*, reusing that of the previous
+        compilation if neither the object nor the names it refers to have
+        changed since.
+        """
+        # Variable definitions are cheap, and const values may change
+        # without a change event
+        from .variable import Variable
+        if isinstance(obj, Variable):
+            return obj.definition(self._object_names, version, shader)
+        key = shader, obj
+        serial = obj._serial
+        prev = prev_definitions.get(key)
+        if (prev is None or prev[0] != serial or prev[1] != version or
+                (renamed and renamed.intersection(obj.dependencies()))):
+            code = obj.definition(self._object_names, version, shader)
+        else:
+            code = prev[2]
+        self._definitions[key] = serial, version, code
+        return code
+
     def _rename_objects_fast(self):
         """ Rename all objects quickly to guaranteed-unique names using the
         id() of each object.
@@ -124,9 +184,10 @@ class Compiler(object):
                     name = name[:32-len(ext)] + ext
                 self._object_names[dep] = name
 
-    def _rename_objects_pretty(self):
+    def _rename_objects_pretty(self, prev_names=None):
         """ Rename all objects like "name_1" to avoid conflicts. Objects are
-        only renamed if necessary.
+        only renamed if necessary. Objects that are in *prev_names* keep
+        that name if it is still available.
 
         This method produces more readable GLSL, but is rather slow.
         """
@@ -153,8 +214,16 @@ class Compiler(object):
                 obj_shaders.setdefault(dep, []).append(shader_name)
 
         #
-        # 2. Assign new object names
+        # 2. Assign new object names, keeping the previous names first
         #
+        if prev_names:
+            for obj, shaders in list(obj_shaders.items()):
+                name = prev_names.get(obj)
+                if name is not None and \
+                        self._name_available(obj, name, shaders):
+                    self._assign_name(obj, name, shaders)
+                    del obj_shaders[obj]
+
         name_index = {}
         for obj, shaders in obj_shaders.items():
             name = obj.name
@@ -20,6 +20,7 @@ class MultiProgram(object):
         self._gcode = gcode
         self._programs = weakref.WeakValueDictionary()
         self._set_items = {}
+        self._uniform_blocks = []
         self._next_prog_id = 0
         self._vert = MultiShader(self, 'vert')
         self._frag = MultiShader(self, 'frag')
@@ -45,6 +46,8 @@ class MultiProgram(object):
         prog = ModularProgram(self._vcode, self._fcode, self._gcode)
         for key, val in self._set_items.items():
             prog[key] = val
+        for block in self._uniform_blocks:
+            prog.add_uniform_block(block)
         self.frag._new_program(prog)
         self.vert._new_program(prog)
         if self._geom is not None:
@@ -110,6 +113,22 @@ class MultiProgram(object):
         for name in data.dtype.names:
             self[name] = data[name]
 
+    def add_uniform_block(self, block):
+        """Add a UniformBlock to all programs, see
+        ModularProgram.add_uniform_block().
+        """
+        if block not in self._uniform_blocks:
+            self._uniform_blocks.append(block)
+        for p in self._programs.values():
+            p.add_uniform_block(block)
+
+    def remove_uniform_block(self, block):
+        """Remove a UniformBlock from all programs.
+        """
+        self._uniform_blocks.remove(block)
+        for p in self._programs.values():
+            p.remove_uniform_block(block)
+
 
 class MultiShader(object):
     """Emulates the API of a MainFunction while wrapping all vertex or fragment
@@ -35,6 +35,17 @@ re_prog_var_declaration = ("(?:" + re_qualifier + r"?\s*(" + re_type +
                            r")\s+(" + re_identifier + r"(\s*,\s*(" +
                            re_identifier + "))*))")
 
+# identifier with an optional array size like "var_name[4]"
+re_array_identifier = re_identifier + r"\s*(?:\[\s*\w*\s*\])?"
+
+# uniform declaration of one or more (array) variables like
+#     "uniform highp vec4 var_name, other_var_name[2];"
+# The type is not limited to re_type, so that e.g. ivec2 or samplerCube
+# uniforms are found as well.
+re_uniform_declaration = (r"\buniform\s+(?:(lowp|mediump|highp)\s+)?(" +
+                          re_identifier + r")\s+(" + re_array_identifier +
+                          r"(?:\s*,\s*" + re_array_identifier + r")*)\s*;")
+
 # list of variable declarations like "vec4 var_name, float other_var_name"
 re_arg_list = "(" + re_declaration + r"(?:,\s*" + re_declaration + ")*)?"
 
@@ -136,6 +147,39 @@ def find_program_variables(code):
     return vars
 
 
+def blank_comments(code):
+    """
+    Return *code* with all comments replaced by spaces. Line breaks are
+    kept, so positions in the result are the same as in *code*.
+    """
+    def blank(m):
+        return re.sub(r'[^\n]', ' ', m.group(0))
+    return re.sub(r'//[^\n]*|/\*.*?\*/', blank, code, flags=re.S)
+
+
+def find_uniform_declarations(code):
+    """
+    Return a list describing the uniform declarations in *code*::
+
+        [(start, end, precision, type, [(name, array_size), ...]), ...]
+
+    *start* and *end* delimit the declaration in *code*, *precision* is
+    the precision qualifier or '', and *array_size* is the array suffix
+    of a name (like '[4]') or ''. Declarations may span several lines and
+    contain comments.
+    """
+    decls = []
+    for m in re.finditer(re_uniform_declaration, blank_comments(code)):
+        names = []
+        for item in m.group(3).split(','):
+            item = item.strip()
+            name = re.match(re_identifier, item).group(0)
+            names.append((name, re.sub(r'\s', '', item[len(name):])))
+        decls.append((m.start(), m.end(), m.group(1) or '', m.group(2),
+                      names))
+    return decls
+
+
 def find_template_variables(code):
     """
     Return a list of template variables found in *code*.
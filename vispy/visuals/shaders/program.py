@@ -5,15 +5,16 @@
 from __future__ import division
 
 import logging
-from weakref import WeakKeyDictionary
+import re
 
-from ...gloo import Program
+from ...gloo import Program, get_current_canvas
 from ...gloo.preprocessor import preprocess
 from ...util import logger
 from ...util.event import EventEmitter
 from .function import MainFunction
 from .variable import Variable
 from .compiler import Compiler
+from . import parsing
 
 
 class ModularProgram(Program):
@@ -28,11 +29,23 @@ class ModularProgram(Program):
 
         self.changed = EventEmitter(source=self, type='program_change')
 
-        # Cache state of Variables so we know which ones require update
-        self._variable_cache = WeakKeyDictionary()
-        
-        # List of settable variables to be checked for value changes
-        self._variables = []
+        # Upload plan: the settable variables with their name in the
+        # program, and the variables that got a new value since they were
+        # last uploaded (the variables add themselves to this set)
+        self._variables = {}
+        self._dirty_variables = set()
+
+        # The compiler is kept so that rebuilds only regenerate the code
+        # of objects that changed
+        self.compiler = None
+        self._code = None
+
+        # Uniform blocks that may hold some of our variables, the blocks
+        # that are declared in the current shaders, and whether the
+        # context supports them
+        self._uniform_blocks = []
+        self._active_blocks = []
+        self._use_uniform_blocks = False
 
         self._vert = MainFunction('vertex', '')
         self._frag = MainFunction('fragment', '')
@@ -95,7 +108,40 @@ class ModularProgram(Program):
         self.changed(code_changed=code_changed, 
                      value_changed=value_changed)
     
+    def add_uniform_block(self, block):
+        """ Read the variables of a uniform block from its buffer
+
+        If the context supports uniform buffers, the variables in the
+        block that this program uses are declared in the block instead
+        of as plain uniforms, and their values are taken from the
+        buffer that the block shares between programs.
+
+        Parameters
+        ----------
+        block : instance of UniformBlock
+            The block to add.
+        """
+        if block in self._uniform_blocks:
+            return
+        self._uniform_blocks.append(block)
+        self._need_build = True
+        self.changed(code_changed=True, value_changed=False)
+
+    def remove_uniform_block(self, block):
+        """ Set the variables of a uniform block as plain uniforms again.
+
+        Parameters
+        ----------
+        block : instance of UniformBlock
+            The block to remove.
+        """
+        self._uniform_blocks.remove(block)
+        self._need_build = True
+        self.changed(code_changed=True, value_changed=False)
+
     def draw(self, *args, **kwargs):
+        if self._uniform_blocks:
+            self._check_uniform_buffers()
         self.build_if_needed()
         self.update_variables()
         Program.draw(self, *args, **kwargs)
@@ -106,10 +152,6 @@ class ModularProgram(Program):
         if self._need_build:
             self._build()
             
-            # after recompile, we need to upload all variables again
-            # (some variables may have changed name)
-            self._variable_cache.clear()
-            
             # Collect a list of all settable variables
             settable_vars = 'attribute', 'uniform', 'in'
             deps = [d for d in self.vert.dependencies() if (
@@ -119,7 +161,20 @@ class ModularProgram(Program):
             if self.geom is not None:
                 deps += [d for d in self.geom.dependencies() if (
                     isinstance(d, Variable) and d.vtype == 'uniform')]
-            self._variables = deps
+            # Variables in uniform blocks are set through the block buffer
+            block_vars = set()
+            for block in self._active_blocks:
+                block_vars.update(block.variables)
+            for var in self._variables:
+                var._programs.pop(self, None)
+            self._variables = dict((d, self.compiler[d]) for d in deps
+                                   if d not in block_vars)
+            for var in self._variables:
+                var._programs[self] = None
+
+            # after recompile, we need to upload all variables again
+            # (some variables may have changed name)
+            self._dirty_variables = set(self._variables)
 
             self._need_build = False
 
@@ -128,9 +183,23 @@ class ModularProgram(Program):
         shaders = {'vert': self.vert, 'frag': self.frag}
         if self.geom is not None:
             shaders['geom'] = self.geom
-        self.compiler = Compiler(**shaders)
+        if self.compiler is None:
+            self.compiler = Compiler(**shaders)
+        else:
+            self.compiler.shaders = shaders
         code = self.compiler.compile()
         
+        self._active_blocks = []
+        if self._use_uniform_blocks:
+            self._declare_uniform_blocks(code)
+
+        # A change may result in the same code (e.g. a filter that was
+        # detached and attached again); then the program can be kept
+        if code == self._code:
+            logger.debug("ModularProgram code did not change: %s", self)
+            return
+        self._code = dict(code)
+
         # Update shader code, but don't let the program update variables yet 
         code['update_variables'] = False
         self.set_shaders(**code)
@@ -139,23 +208,87 @@ class ModularProgram(Program):
         if 'geom' in code:
             logger.debug('==== Geometry shader ====\n\n%s\n', code['geom'])
         logger.debug('==== Fragment shader ====\n\n%s\n', code['frag'])
+
+    def _check_uniform_buffers(self):
+        """ Rebuild if support for uniform buffers differs from what the
+        current shaders assume. This is only known once the context has
+        been initialized, so it may change after the first build.
+        """
+        canvas = get_current_canvas()
+        supported = False
+        if canvas is not None:
+            capabilities = canvas.context.shared.parser.capabilities
+            supported = bool(capabilities.get('uniform_buffers'))
+        if supported != self._use_uniform_blocks:
+            self._use_uniform_blocks = supported
+            self._need_build = True
+
+    def _declare_uniform_blocks(self, code):
+        """ Replace the declarations of variables that are in a uniform
+        block with a declaration of the block.
+        """
+        for block in self._uniform_blocks:
+            names = {}
+            for var in block.variables:
+                try:
+                    names[var] = self.compiler[var]
+                except KeyError:
+                    continue  # not used by this program
+            if not names:
+                continue
+            self._active_blocks.append(block)
+            members = set(names.values())
+            for key, source in code.items():
+                # Remove the members from the declarations, starting at
+                # the end so that the positions of earlier ones stay valid
+                decls = parsing.find_uniform_declarations(source)
+                found = False
+                for start, end, prec, dtype, decl_names in reversed(decls):
+                    kept = ['%s%s' % n for n in decl_names
+                            if n[0] not in members]
+                    if len(kept) == len(decl_names):
+                        continue
+                    found = True
+                    decl = ''
+                    if kept:
+                        decl = 'uniform %s %s;' % (
+                            ' '.join(filter(None, [prec, dtype])),
+                            ', '.join(kept))
+                    source = source[:start] + decl + source[end:]
+                if not found:
+                    continue
+                # Declare the block after the version pragma (if any)
+                m = re.search(parsing.re_version_pragma, source)
+                i = m.end() if m else 0
+                version = int(m.group(1)) if m else 120
+                decl = [block.declaration(names)]
+                if version < 140:
+                    decl.insert(0, '#extension GL_ARB_uniform_buffer_object'
+                                   ' : enable')
+                code[key] = '\n'.join([source[:i]] + decl + [source[i:]])
         
     def update_variables(self):
-        # Set any variables that have a new value
-        logger.debug("Apply variables:")
-        for dep in sorted(self._variables, key=lambda d: self.compiler[d]):
-            name = self.compiler[dep]
-            state_id = dep.state_id
-            if self._variable_cache.get(dep, None) != state_id:
-                self[name] = dep.value
-                self._variable_cache[dep] = state_id
-                logger.debug("    %s = %s **", name, dep.value)
-            else:
-                logger.debug("    %s = %s", name, dep.value)
+        # Set the variables that have a new value
+        dirty = self._dirty_variables
+        if dirty:
+            self._dirty_variables = set()
+            names = self._variables
+            for dep in dirty:
+                name = names.get(dep)
+                if name is not None:
+                    self[name] = dep.value
+
+        # Upload changed values of uniform blocks (once for all programs)
+        for block in self._active_blocks:
+            block.update()
+            if self._user_variables.get(block.name) is not block.buffer:
+                self[block.name] = block.buffer
 
         # Process any pending variables and discard anything else that is
         # not active in the program (otherwise we get lots of warnings).
-        self._process_pending_variables()
-        logger.debug("Discarding unused variables before draw: %s" % 
-                     self._pending_variables.keys())
-        self._pending_variables = {}
+        if self._pending_variables:
+            self._process_pending_variables()
+            if self._pending_variables:
+                logger.debug("Discarding unused variables before draw: %s",
+                             list(self._pending_variables.keys()))
+                self._pending_variables = {}
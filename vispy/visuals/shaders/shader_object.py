@@ -20,6 +20,10 @@ class ShaderObject(object):
     will be propagated up the dependency hierarchy to trigger a recompile.
     """
 
+    # Incremented on each change that may affect the definition, so that
+    # the Compiler knows which definitions it can reuse
+    _serial = 0
+
     @classmethod
     def create(self, obj, ref=None):
         """ Convert *obj* to a new ShaderObject. If the output is a Variable
@@ -142,6 +146,8 @@ class ShaderObject(object):
     def changed(self, code_changed=False, value_changed=False):
         """Inform dependents that this shaderobject has changed.
         """
+        if code_changed or not value_changed:
+            self._serial += 1
         for d in self._dependents:
             d._dep_changed(self, code_changed=code_changed,
                            value_changed=value_changed)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+from vispy.visuals.shaders import (Compiler, Function, MainFunction,
+                                   FunctionChain)
+from vispy.testing import run_tests_if_main
+
+
+def _counting(obj, method='definition'):
+    """ Make obj count the calls to one of its methods.
+    """
+    calls = []
+    func = getattr(obj, method)
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return func(*args, **kwargs)
+    setattr(obj, method, counted)
+    return calls
+
+
+def test_compiler_incremental():
+    """Test that recompiling reuses unchanged definitions"""
+    vert = MainFunction('vertex', """
+    void main() {
+        gl_Position = $transform(vec4(0., 0., 0., 1.));
+    }
+    """)
+    frag = MainFunction('fragment', 'void main() { gl_FragColor = $color; }')
+    scale = Function('vec4 scale(vec4 pos) { return pos * $factor; }')
+    scale['factor'] = '2.0'
+    chain = FunctionChain('transform', [scale])
+    vert['transform'] = chain
+    frag['color'] = 'vec4(1.)'
+
+    compiler = Compiler(vert=vert, frag=frag)
+    code = compiler.compile()
+    calls = _counting(scale)
+    chain_calls = _counting(chain)
+    renames = _counting(compiler, '_rename_objects_pretty')
+    vert_deps = _counting(vert, 'dependencies')
+
+    # Nothing changed: all definitions and names are reused, and the
+    # dependencies are not collected again
+    assert compiler.compile() == code
+    assert len(calls) == 0 and len(chain_calls) == 0
+    assert len(renames) == 0 and len(vert_deps) == 0
+
+    # Changing the fragment shader does not touch the transform
+    frag['color'] = 'vec4(0.5)'
+    code2 = compiler.compile()
+    assert 'vec4(0.5)' in code2['frag']
+    assert code2['vert'] == code['vert']
+    assert len(calls) == 0
+    assert len(renames) == 1 and len(vert_deps) == 0
+
+    # Changing a function regenerates it and the functions that use it
+    scale['factor'] = '3.0'
+    code3 = compiler.compile()
+    assert 'pos * 3.0' in code3['vert']
+    assert len(calls) == 1 and len(chain_calls) == 1
+    assert len(vert_deps) == 1
+
+    # Adding a function with a conflicting name keeps the existing names
+    scale2 = Function('vec4 scale(vec4 pos) { return pos * 4.0; }')
+    chain.append(scale2)
+    code4 = compiler.compile()
+    assert compiler[scale] == 'scale'
+    assert compiler[scale2] == 'scale_1'
+    assert 'scale_1(result_1)' in code4['vert']
+    assert len(calls) == 1  # scale itself did not change
+
+    # Removing it again gives the original code
+    chain.remove(scale2)
+    assert compiler.compile() == code3
+    assert len(calls) == 1
+
+    # Fast compilation produces the same output on each compile
+    code5 = compiler.compile(pretty=False)
+    assert compiler.compile(pretty=False) == code5
+
+
+run_tests_if_main()
@@ -3,7 +3,9 @@
 # Distributed under the (new) BSD License. See LICENSE.txt for more info.
 import re
 
-from vispy.visuals.shaders.parsing import re_identifier, find_program_variables
+from vispy.visuals.shaders.parsing import (re_identifier,
+                                           find_program_variables,
+                                           find_uniform_declarations)
 from vispy.testing import run_tests_if_main
 
 
@@ -54,4 +56,26 @@ def test_find_variables():
     assert len(vars) == 0
 
 
+def test_find_uniform_declarations():
+    code = """
+    uniform vec2 s;
+    uniform vec4 a, b[2];  // uniform float c;
+    uniform highp
+        mat4 /* comment */ m ,n [ 3 ];
+    /* uniform float d; */
+    uniform_x float e;
+    uniform ivec2 f;
+    """
+    decls = find_uniform_declarations(code)
+    assert [d[2:] for d in decls] == [
+        ('', 'vec2', [('s', '')]),
+        ('', 'vec4', [('a', ''), ('b', '[2]')]),
+        ('highp', 'mat4', [('m', ''), ('n', '[3]')]),
+        ('', 'ivec2', [('f', '')]),
+    ]
+    start, end = decls[2][:2]
+    assert code[start:end].startswith('uniform highp')
+    assert code[start:end].endswith('n [ 3 ];')
+
+
 run_tests_if_main()
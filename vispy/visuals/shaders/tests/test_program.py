@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+from vispy.visuals.shaders import ModularProgram, Variable
+from vispy.testing import run_tests_if_main, assert_equal
+
+
+def _uploaded(prog):
+    """ Build and update the program, and return the names of the uniforms
+    that were sent.
+    """
+    prog.glir.clear()
+    prog.build_if_needed()
+    prog.update_variables()
+    return sorted(c[2] for c in prog.glir.clear() if c[0] == 'UNIFORM')
+
+
+def test_update_variables():
+    """Test that only changed variables are uploaded"""
+    vert = """
+    void main() {
+        gl_Position = vec4($scale * $offset, 1.);
+    }
+    """
+    frag = 'void main() { gl_FragColor = $color; }'
+    prog = ModularProgram(vert, frag)
+    scale = Variable('uniform float u_scale', 2.0)
+    prog.vert['scale'] = scale
+    prog.vert['offset'] = (0., 1., 0.)
+    prog.frag['color'] = (1., 0., 0., 1.)
+
+    assert_equal(_uploaded(prog), ['u_color', 'u_offset', 'u_scale'])
+    assert_equal(_uploaded(prog), [])
+
+    # Setting a value marks only that variable for upload
+    scale.value = 3.0
+    assert scale in prog._dirty_variables
+    assert_equal(_uploaded(prog), ['u_scale'])
+    assert_equal(prog['u_scale'], 3.0)
+    prog.frag['color'] = (0., 1., 0., 1.)
+    assert_equal(_uploaded(prog), ['u_color'])
+
+    # A recompile uploads all variables; removed ones are not tracked
+    prog.vert['scale'] = Variable('uniform float u_scale2', 5.0)
+    assert_equal(_uploaded(prog), ['u_color', 'u_offset', 'u_scale2'])
+    assert prog not in scale._programs
+    scale.value = 6.0
+    assert not prog._dirty_variables
+    assert_equal(_uploaded(prog), [])
+
+
+run_tests_if_main()
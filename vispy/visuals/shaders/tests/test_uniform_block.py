@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy.gloo import UniformBuffer
+from vispy.visuals.shaders import MultiProgram, UniformBlock, Variable
+from vispy.testing import run_tests_if_main, assert_raises, assert_equal
+
+
+def test_uniform_block_layout():
+    scale = Variable('uniform vec3 scale', (1., 2., 3.))
+    alpha = Variable('uniform float alpha', 0.5)
+    matrix = Variable('uniform mat3 matrix',
+                      np.arange(9, dtype=np.float32).reshape(3, 3))
+    block = UniformBlock('Camera', [scale, alpha, matrix])
+    assert isinstance(block.buffer, UniformBuffer)
+    # vec3 + float share 16 bytes; mat3 has 3 columns of 16 bytes
+    assert_equal(block.buffer.nbytes, 64)
+
+    block.update()
+    data = block._data
+    assert_array_equal(data[:4], [1, 2, 3, 0.5])
+    assert_array_equal(data[4:].reshape(3, 4)[:, :3],
+                       np.arange(9).reshape(3, 3))
+    cmds = block.buffer._glir.clear()
+    assert_equal(cmds[-1][0], 'DATA')
+
+    # Only upload when a value changes
+    block.update()
+    assert_equal(block.buffer._glir.clear(), [])
+    alpha.value = 1.0
+    block.update()
+    assert_equal(block.buffer._glir.clear()[-1][0], 'DATA')
+    assert_equal(data[3], 1.0)
+
+    decl = block.declaration({scale: 'u_scale'})
+    assert 'layout(std140) uniform Camera {' in decl
+    assert 'vec3 u_scale;' in decl
+    assert 'float Camera_unused_1;' in decl
+
+    assert_raises(ValueError, UniformBlock, 'X',
+                  [Variable('attribute vec2 a_pos')])
+
+
+def test_program_uniform_block():
+    vert = """
+    void main() {
+        gl_Position = $scale * vec4(0, 0, 0, 1) + $offset;
+    }
+    """
+    frag = "void main() { gl_FragColor = $color; }"
+    scale = Variable('uniform float u_scale', 2.0)
+    offset = Variable('uniform vec4 u_offset', (0., 1., 0., 0.))
+    block = UniformBlock('Shared', [scale, offset])
+
+    mp = MultiProgram(vert, frag)
+    mp.add_uniform_block(block)
+    prog = mp.add_program()
+    prog.vert['scale'] = scale
+    prog.vert['offset'] = offset
+    prog.frag['color'] = (1., 0., 0., 1.)
+    assert block in prog._uniform_blocks
+
+    # Without uniform buffer support the variables are plain uniforms
+    prog.build_if_needed()
+    prog.update_variables()
+    assert 'uniform float u_scale;' in prog.shaders[0].code
+    assert 'Shared' not in prog.shaders[0].code
+    assert_equal(prog['u_scale'], 2.0)
+
+    # With support they are declared in the block and set via the buffer
+    prog._use_uniform_blocks = True
+    prog._need_build = True
+    prog.build_if_needed()
+    prog.update_variables()
+    code = prog.shaders[0].code
+    assert 'uniform float u_scale;' not in code
+    assert 'layout(std140) uniform Shared {' in code
+    assert '#extension GL_ARB_uniform_buffer_object' in code
+    assert 'Shared' not in prog.shaders[1].code
+    assert prog['Shared'] is block.buffer
+    assert 'u_scale' not in prog._user_variables
+
+    mp.remove_uniform_block(block)
+    assert prog._uniform_blocks == []
+    prog.build_if_needed()
+    assert 'uniform float u_scale;' in prog.shaders[0].code
+
+
+def test_declare_uniform_blocks():
+    vert = "void main() { gl_Position = $scale * $offset; }"
+    scale = Variable('uniform float u_scale', 2.0)
+    offset = Variable('uniform vec4 u_offset', (0., 1., 0., 0.))
+    block = UniformBlock('Shared', [scale, offset])
+    prog = MultiProgram(vert, "void main() {}").add_program()
+    prog.vert['scale'] = scale
+    prog.vert['offset'] = offset
+    prog.add_uniform_block(block)
+    prog.build_if_needed()
+
+    # Declarations that share a statement with other uniforms, span lines
+    # or contain comments are found as well
+    code = {'vert': "#version 120\n"
+                    "uniform float u_scale, u_other[2];  // scale\n"
+                    "uniform highp vec4\n"
+                    "    /* offset */ u_offset;\n"
+                    "// uniform float u_scale;\n"
+                    "void main() {}\n",
+            'frag': "uniform float u_scale_x;\nvoid main() {}\n"}
+    prog._declare_uniform_blocks(code)
+    lines = code['vert'].split('\n')
+    assert_equal(lines[:2], ['#version 120',
+                             '#extension GL_ARB_uniform_buffer_object'
+                             ' : enable'])
+    assert 'uniform float u_other[2];  // scale' in lines
+    assert 'vec4' not in code['vert'].split('};')[1]
+    assert '// uniform float u_scale;' in lines
+    assert 'Shared' not in code['frag']
+    assert_equal(prog._active_blocks, [block])
+
+
+run_tests_if_main()
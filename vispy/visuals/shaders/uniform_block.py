@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+import numpy as np
+
+from ...gloo import UniformBuffer
+
+
+class UniformBlock(object):
+    """ A group of uniform Variables whose values live in one buffer
+
+    All programs that declare the block read the values from the same
+    UniformBuffer, so when one of the variables changes it is uploaded
+    once instead of once per program. This is meant for uniforms that
+    many programs share, such as those of the camera transform: cameras
+    put the uniforms of their scene transform in a block, which visuals
+    in the view pick up from ``BaseTransform.uniform_block``.
+
+    Use ``ModularProgram.add_uniform_block()`` (or the same method of
+    MultiProgram) to have a program declare the variables in the block
+    instead of as plain uniforms. This only happens if the context
+    supports uniform buffers (OpenGL 3.1 and the gl+ backend); otherwise
+    the variables are set on each program as usual.
+
+    Parameters
+    ----------
+    name : str
+        The name of the block in GLSL.
+    variables : list of Variable
+        The uniform Variables in the block. Their dtype must be known.
+
+    Examples
+    --------
+    Share the uniforms of a camera transform::
+
+        fn = transform.shader_map()
+        block = UniformBlock('Camera', [fn['scale'], fn['translate']])
+        visual.shared_program.add_uniform_block(block)
+    """
+
+    # std140 layout per dtype: (base alignment, columns, rows) in units of
+    # 4 bytes. Matrix columns are padded to a vec4.
+    _std140 = {
+        'float': (1, 1, 1),
+        'int': (1, 1, 1),
+        'bool': (1, 1, 1),
+        'vec2': (2, 1, 2),
+        'ivec2': (2, 1, 2),
+        'vec3': (4, 1, 3),
+        'ivec3': (4, 1, 3),
+        'vec4': (4, 1, 4),
+        'ivec4': (4, 1, 4),
+        'mat2': (4, 2, 2),
+        'mat3': (4, 3, 3),
+        'mat4': (4, 4, 4),
+    }
+
+    def __init__(self, name, variables):
+        self._name = name
+        self._variables = list(variables)
+
+        # Compute the layout; each variable gets a view on the data
+        self._views = []
+        offsets = []
+        size = 0
+        for var in self._variables:
+            if var.vtype != 'uniform' or var.dtype not in self._std140:
+                raise ValueError('Cannot put variable %r in a uniform block'
+                                 % var)
+            align, cols, rows = self._std140[var.dtype]
+            offset = (size + align - 1) // align * align
+            offsets.append(offset)
+            size = offset + (rows if cols == 1 else 4 * cols)
+        self._data = np.zeros((size + 3) // 4 * 4, np.float32)
+        for var, offset in zip(self._variables, offsets):
+            align, cols, rows = self._std140[var.dtype]
+            data = self._data
+            if var.dtype in ('int', 'bool') or var.dtype.startswith('i'):
+                data = data.view(np.int32)
+            stride = 4 if cols > 1 else rows
+            view = data[offset:offset + cols * stride].reshape(cols, stride)
+            self._views.append(view[:, :rows])
+
+        self._state_ids = [None] * len(self._variables)
+        self._buffer = UniformBuffer(nbytes=self._data.nbytes)
+
+    @property
+    def name(self):
+        """ The name of the block in GLSL.
+        """
+        return self._name
+
+    @property
+    def variables(self):
+        """ The Variables in the block, in the order of the layout.
+        """
+        return list(self._variables)
+
+    @property
+    def buffer(self):
+        """ The UniformBuffer that holds the values.
+        """
+        return self._buffer
+
+    def update(self):
+        """ Upload the values if any variable changed since the last call.
+        """
+        changed = False
+        for i, var in enumerate(self._variables):
+            state_id = var.state_id
+            if self._state_ids[i] == state_id or var.value is None:
+                continue
+            view = self._views[i]
+            view[...] = np.asarray(var.value).reshape(view.shape)
+            self._state_ids[i] = state_id
+            changed = True
+        if changed:
+            self._buffer.set_data(self._data, copy=True)
+
+    def declaration(self, names):
+        """ Get the GLSL declaration of the block.
+
+        Parameters
+        ----------
+        names : dict
+            Maps variables to the name they have in the program. Members
+            that are not in the program get a placeholder name.
+
+        Returns
+        -------
+        code : str
+            The declaration.
+        """
+        lines = ['layout(std140) uniform %s {' % self._name]
+        for i, var in enumerate(self._variables):
+            name = names.get(var, '%s_unused_%d' % (self._name, i))
+            lines.append('    %s %s;' % (var.dtype, name))
+        lines.append('};')
+        return '\n'.join(lines)
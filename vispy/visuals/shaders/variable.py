@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) Vispy Development Team. All Rights Reserved.
 # Distributed under the (new) BSD License. See LICENSE.txt for more info.
+from weakref import WeakKeyDictionary
+
 import numpy as np
 from ...ext.six import string_types
 from .shader_object import ShaderObject
@@ -50,6 +52,9 @@ class Variable(ShaderObject):
             raise TypeError("Variable name must be string or None.")
         
         self._state_counter = 0
+        # ModularPrograms that upload this variable; a new value is added
+        # to their set of variables to upload
+        self._programs = WeakKeyDictionary()
         self._name = name
         self._vtype = self._vtype_32_conversion.get(vtype, vtype)
         self._dtype = dtype
@@ -132,6 +137,8 @@ class Variable(ShaderObject):
 
         self._value = value
         self._state_counter += 1
+        for program in self._programs:
+            program._dirty_variables.add(self)
         
         if self._type_locked:
             if dtype != self._dtype or vtype != self._vtype:
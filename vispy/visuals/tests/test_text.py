@@ -1,5 +1,13 @@
 # -*- coding: utf-8 -*-
+import numpy as np
+
+from vispy.gloo import TextureAtlas
+from vispy.gloo.context import FakeCanvas, forget_canvas
+from vispy.gloo.glir import BaseGlirParser
 from vispy.scene.visuals import Text
+from vispy.util import config, _TempDir
+from vispy.visuals.text.text import (TextureFont, SDFRendererCPU,
+                                     _text_to_vbo)
 from vispy.testing import (requires_application, TestingCanvas,
                            run_tests_if_main)
 from vispy.testing.image_tester import assert_image_approved
@@ -33,4 +41,215 @@ def test_text():
         c.app.process_events()
 
 
+def test_text_atlas():
+    """Test growing the glyph atlas and evicting glyphs"""
+    font = TextureFont(dict(face='OpenSans', bold=False, italic=False),
+                       SDFRendererCPU())
+    assert font._atlas.shape[2] == 1  # single channel
+    font._atlas = TextureAtlas((64, 64), dtype=np.uint8, channels=1)
+
+    def check():
+        for glyph in font._glyphs.values():
+            x0, y0, x1, y1 = glyph['texcoords']
+            assert font._atlas._atlas_data[y0:y1, x0:x1].any()
+
+    chars = 'abcdefghijklmnopqrstuvwxyz'
+    for char in chars:
+        font[char]
+    assert font._atlas.shape[0] * font._atlas.shape[1] > 64 * 64
+    assert font.generation == 0
+    check()
+
+    # With a budget, the least recently used glyphs are evicted
+    font._max_atlas_bytes = font._atlas._atlas_data.nbytes
+    shape = font._atlas.shape
+    font['a']
+    for char in chars.upper():
+        font[char]
+        if font.generation > 0:
+            break
+    assert font.generation == 1
+    assert font._atlas.shape == shape
+    assert char in font._glyphs and 'a' in font._glyphs
+    assert 'b' not in font._glyphs
+    check()
+
+
+def test_text_atlas_max_size():
+    """Test that the atlas does not grow beyond the max texture size"""
+    class DummyParser(BaseGlirParser):
+        def parse(self, commands):
+            pass
+
+    parser = DummyParser()
+    parser.capabilities['max_texture_size'] = 128
+    canvas = FakeCanvas()
+    canvas.context.shared.parser = parser
+    try:
+        font = TextureFont(dict(face='OpenSans', bold=False, italic=False),
+                           SDFRendererCPU())
+        font._atlas = TextureAtlas((64, 64), dtype=np.uint8, channels=1)
+        assert font._max_size() == 128
+        # Once the atlas has the maximum size, glyphs are evicted
+        for char in 'abcdefghijklmnopqrstuvwxyz':
+            font[char]
+        assert max(font._atlas.shape[:2]) == 128
+        assert font.generation > 0
+    finally:
+        forget_canvas(canvas)
+    assert font._max_size() == font._max_atlas_size
+
+
+def test_glyph_cache():
+    """Test storing glyph SDFs on disk"""
+    font = dict(face='OpenSans', bold=False, italic=False)
+    old_dir = config['glyph_cache_dir']
+    config['glyph_cache_dir'] = _TempDir()
+    try:
+        font1 = TextureFont(font, SDFRendererCPU())
+        for char in 'AVo':
+            font1[char]
+        # A new font loads the glyphs from the cache, without rasterizing
+        font2 = TextureFont(font, SDFRendererCPU())
+        for char in 'oVA':
+            assert 'bitmap' not in font2[char]
+    finally:
+        config['glyph_cache_dir'] = old_dir
+    for char in 'AVo':
+        glyph1, glyph2 = font1[char], font2[char]
+        for key in ('offset', 'advance', 'kerning', 'size'):
+            assert glyph1[key] == glyph2[key]
+        x0, y0, x1, y1 = glyph1['texcoords']
+        sdf1 = font1._atlas._atlas_data[y0:y1, x0:x1]
+        x0, y0, x1, y1 = glyph2['texcoords']
+        assert np.array_equal(font2._atlas._atlas_data[y0:y1, x0:x1], sdf1)
+
+
+def test_preload():
+    """Test loading the glyphs of a string at once"""
+    font = TextureFont(dict(face='OpenSans', bold=False, italic=False),
+                       SDFRendererCPU())
+    font._atlas.glir.clear()
+    font.preload('hello world')
+    assert sorted(font._glyphs) == sorted(set('hello world'))
+    # All SDFs are uploaded together
+    cmds = [c for c in font._atlas.glir.clear() if c[0] == 'DATA']
+    assert len(cmds) == 1
+    font.preload('low')
+    assert len(font._atlas.glir.clear()) == 0
+    for char in 'helo':
+        x0, y0, x1, y1 = font[char]['texcoords']
+        assert font._atlas._atlas_data[y0:y1, x0:x1].max() > 0
+
+
+def test_text_to_vbo():
+    """Test laying out several strings at once"""
+    font = TextureFont(dict(face='OpenSans', bold=False, italic=False),
+                       SDFRendererCPU())
+    for texts in (['AVA', 'two\nlines', '', '\tx'], ['ab', ''],
+                  ['a', '', '']):
+        for anchor_x in ('left', 'center', 'right'):
+            for anchor_y in ('top', 'center', 'baseline', 'bottom'):
+                vertices = _text_to_vbo(texts, font, anchor_x, anchor_y, 64)
+                assert len(vertices) == 4 * sum(len(t) for t in texts)
+                single = np.concatenate([
+                    _text_to_vbo(t, font, anchor_x, anchor_y, 64)
+                    for t in texts])
+                assert np.array_equal(vertices, single)
+    pos = _text_to_vbo('AVA', font, 'left', 'baseline', 64)['a_position']
+    # Kerning moves the glyphs closer than their advance
+    advance = (font['A']['advance'] + font['V']['advance']) / font.ratio
+    assert pos[8, 0] - pos[0, 0] < advance / 64.
+    # The second line is below the first, starting at the same x
+    pos = _text_to_vbo('ab\nab', font, 'left', 'baseline', 64)['a_position']
+    assert np.allclose(pos[12:16, 0], pos[:4, 0])
+    assert (pos[12:16, 1] < pos[:4, 1]).all()
+    # Characters that are not drawn have an empty quad
+    tex = _text_to_vbo('a\tb', font, 'left', 'baseline', 64)['a_texcoord']
+    assert (tex[4:8] == 0).all() and (tex[8:12] != tex[0:4]).any()
+
+
+@requires_application()
+def test_text_update():
+    """Test updating some of the strings of a text visual"""
+    with TestingCanvas(bgcolor='w', size=(92, 92)) as c:
+        labels = ['%d' % i for i in range(10)]
+        text = Text(labels, pos=np.random.rand(10, 2) * 92,
+                    color=['red', 'blue'], font_size=np.arange(10) + 5,
+                    parent=c.scene)
+        c.render()
+        assert text.color.rgba.shape == (2, 4)
+        assert text._vertices.size == 40
+        vertex_data = text._vertex_data.copy()
+
+        # Strings that fit in their slot are updated in place
+        labels[3] = 'x'
+        text.text = labels
+        assert text._dirty == set([3])
+        labels[3] = '3'
+        labels[5] = 'y'
+        text.text = labels
+        c.render()
+        assert not text._dirty
+        assert text._vertices.size == 40
+        changed = np.where(text._vertex_data != vertex_data)[0]
+        assert (changed // 4 == 5).all()
+
+        # A longer string makes room for growing
+        labels[2] = '222'
+        text.text = labels
+        c.render()
+        assert (text._capacity >= [len(t) for t in labels]).all()
+        assert text._capacity.sum() > 12
+        assert text._vertices.size == 4 * text._capacity.sum()
+        n_quads = text._capacity.sum()
+        labels[2] = '22'
+        text.text = labels
+        c.render()
+        assert text._capacity.sum() == n_quads
+        quads = text._vertex_data.reshape(-1, 4)
+        assert (quads['a_index'][:, 0] ==
+                np.repeat(np.arange(10), text._capacity)).all()
+        assert (quads['a_texcoord'][text._slot_start[2] + 2] == 0).all()
+
+        # An emptied string leaves its slot empty
+        labels[1] = 'a'
+        labels[9] = ''
+        text.text = labels
+        c.render()
+        assert text._capacity.sum() == n_quads
+        quads = text._vertex_data.reshape(-1, 4)
+        slot = slice(text._slot_start[9], text._slot_start[9] +
+                     text._capacity[9])
+        assert (quads['a_position'][slot] == 0).all()
+        assert (quads['a_texcoord'][slot] == 0).all()
+
+        # Changing the number of strings lays out all strings
+        text.text = labels[:4]
+        c.render()
+        assert text._vertices.size == 4 * len(''.join(labels[:4]))
+
+
+@requires_application()
+def test_text_string_data_fallback():
+    """Test per-vertex string data without vertex float textures"""
+    with TestingCanvas(bgcolor='w', size=(92, 92)) as c:
+        text = Text(['ab', 'cde', 'f'], pos=[[20, 20], [46, 46], [70, 70]],
+                    color=['red', 'green', 'blue'], font_size=[10, 14, 18],
+                    parent=c.scene)
+        capabilities = c.context.shared.parser.capabilities
+        supported = capabilities['vertex_float_textures']
+        try:
+            image = c.render()
+            assert text._string_texture == bool(supported)
+            capabilities['vertex_float_textures'] = not supported
+            text.update()
+            image_fallback = c.render()
+            assert text._string_texture == (not supported)
+        finally:
+            capabilities['vertex_float_textures'] = supported
+        assert image.std() > 0
+        assert np.abs(image.astype(int) - image_fallback).max() <= 1
+
+
 run_tests_if_main()
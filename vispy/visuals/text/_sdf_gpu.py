@@ -10,7 +10,7 @@ Adapted to `vispy` by Eric Larson <larson.eric.d@gmail.com>.
 import numpy as np
 
 from ...gloo import (Program, FrameBuffer, VertexBuffer, Texture2D,
-                     set_viewport, set_state)
+                     set_viewport, set_state, context)
 
 vert_seed = """
 attribute vec2 a_position;
@@ -228,6 +228,9 @@ void main( void )
 
 
 class SDFRendererGPU(object):
+    # Number of channels of the atlas texture, which must be color-renderable
+    channels = 3
+
     def __init__(self):
         self.program_seed = Program(vert_seed, frag_seed)
         self.program_flood = Program(vert, frag_flood)
@@ -283,6 +286,56 @@ class SDFRendererGPU(object):
             set_viewport(tuple(offset) + tuple(size))
             self.program_insert.draw('triangle_strip')
 
+    def render_regions(self, texture, items):
+        """Render the SDFs of several glyphs into an atlas
+
+        The pending commands are flushed and the viewport is restored only
+        once for all glyphs.
+
+        Parameters
+        ----------
+        texture : instance of Texture2D
+            The texture to render to.
+        items : list
+            List of tuples (bounds, data, sdf), with the region (x, y, w, h)
+            and either the high-resolution data or the SDF (the other one is
+            None).
+        """
+        # Necessary to flush commands before requesting current viewport
+        # because there may be a set_viewport command waiting in the queue.
+        canvas = context.get_current_canvas()
+        canvas.context.flush_commands()
+        orig_viewport = canvas.context.get_viewport()
+        for bounds, data, sdf in items:
+            if sdf is None:
+                self.render_to_texture(data, texture, bounds[:2], bounds[2:])
+            else:
+                texture.set_region(bounds, sdf)
+        if orig_viewport is not None:
+            canvas.context.set_viewport(*orig_viewport)
+
+    def get_texture_data(self, texture, crop=None):
+        """Read back the data of a texture that was rendered to
+
+        Parameters
+        ----------
+        texture : instance of Texture2D
+            The texture to read.
+        crop : tuple | None
+            The region (x, y, w, h) to read. If None, the whole texture is
+            read.
+
+        Returns
+        -------
+        data : array
+            The data, in the same row order as it would be uploaded.
+        """
+        self.fbo_to[-1].color_buffer = texture
+        with self.fbo_to[-1]:
+            data = self.fbo_to[-1].read(alpha=False, crop=crop)
+        # read() puts the top row first
+        return data[::-1]
+
     def _render_edf(self, orig_tex):
         """Render an EDF to a texture"""
         # Set up the necessary textures
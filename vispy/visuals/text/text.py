@@ -11,18 +11,25 @@ from __future__ import division
 
 
 import numpy as np
+from collections import OrderedDict
 from copy import deepcopy
+import hashlib
+import os
+import os.path as op
 import sys
 
 from ._sdf_gpu import SDFRendererGPU
 from ._sdf_cpu import _calc_distance_field
-from ...gloo import (TextureAtlas, IndexBuffer, VertexBuffer)
+from ...gloo import (TextureAtlas, Texture2D, IndexBuffer,
+                     VertexBuffer)
 from ...gloo import context
 from ...gloo.wrappers import _check_valid
 from ...ext.six import string_types
-from ...util.fonts import _load_glyph
+from ...util import config, logger
+from ...util.fonts import _load_glyph, _load_kerning, _get_font_file
 from ..transforms import STTransform
-from ...color import Color
+from ..shaders import Function
+from ...color import Color, ColorArray
 from ..visual import Visual
 from ...io import load_spatial_filters
 
@@ -30,13 +37,24 @@ from ...io import load_spatial_filters
 class TextureFont(object):
     """Gather a set of glyphs relative to a given font name and size
 
-    This currently stores characters in a `TextureAtlas` object which uses
-    a 2D RGB texture to store unsigned 8-bit integer data. In the future this
-    could be changed to a ``GL_R8`` texture instead of RGB when OpenGL ES
-    3.0+ is standard. Since VisPy tries to stay compatible with OpenGL ES 2.0
-    we are using an ``RGB`` texture. Using a single channel texture should
-    improve performance by requiring less data to be sent to the GPU and to
-    remote backends (jupyter notebook).
+    This stores characters in a `TextureAtlas` object. With the CPU
+    renderer this is a single channel texture in the ``luminance`` format
+    rather than ``GL_R8``, which needs OpenGL ES 3.0+, since VisPy tries to
+    stay compatible with OpenGL ES 2.0. The GPU renderer draws the glyphs
+    into the atlas, so it needs a color-renderable RGB texture.
+
+    When the atlas is full it grows by doubling its shorter side. Glyph
+    texture coordinates are in texels, so glyphs that were already laid
+    out stay valid. Once the atlas cannot grow anymore (because of
+    ``max_atlas_bytes``, the maximum atlas size or the maximum texture size
+    of the current context), the least recently used
+    glyphs are evicted, which increments ``generation``; text laid out
+    before that must be laid out again.
+
+    When the ``glyph_cache_dir`` config option is set, the SDF of each
+    glyph and its metrics are stored on disk, keyed by a hash of the font
+    file. Other processes then only copy the cached SDF into the atlas,
+    instead of rasterizing the glyph and computing its SDF.
 
     Parameters
     ----------
@@ -44,11 +62,16 @@ class TextureFont(object):
         Dict with entries "face", "size", "bold", "italic".
     renderer : instance of SDFRenderer
         SDF renderer to use.
+    max_atlas_bytes : int | None
+        Memory budget for the atlas texture. If None, the atlas grows up to
+        the maximum atlas size.
 
     """
-    def __init__(self, font, renderer):
-        self._atlas = TextureAtlas(dtype=np.uint8)
-        self._atlas.wrapping = 'clamp_to_edge'
+    _max_atlas_size = 8192
+
+    def __init__(self, font, renderer, max_atlas_bytes=None):
+        self._atlas = TextureAtlas(dtype=np.uint8,
+                                   channels=renderer.channels)
         self._kernel, _ = load_spatial_filters()
         self._renderer = renderer
         self._font = deepcopy(font)
@@ -62,7 +85,13 @@ class TextureFont(object):
         # propagate at least 2 other places.
         self._spread = 32
         assert self._spread % self.ratio == 0
-        self._glyphs = {}
+        self._max_atlas_bytes = max_atlas_bytes
+        # In order of last use, for evicting glyphs
+        self._glyphs = OrderedDict()
+        self._generation = 0
+        self._cache_key = None
+        # New glyphs whose SDF is not in the atlas yet
+        self._pending = []
 
     @property
     def ratio(self):
@@ -74,15 +103,45 @@ class TextureFont(object):
         """Extra space along each glyph edge due to SDF borders"""
         return self._spread // self.ratio
 
+    @property
+    def generation(self):
+        """Incremented each time glyphs are evicted from the atlas"""
+        return self._generation
+
     def __getitem__(self, char):
         if not (isinstance(char, string_types) and len(char) == 1):
             raise TypeError('index must be a 1-character string')
-        if char not in self._glyphs:
+        glyph = self._glyphs.pop(char, None)
+        if glyph is None:
             self._load_char(char)
+            self._store_pending()
+        else:
+            self._glyphs[char] = glyph
         return self._glyphs[char]
 
+    def preload(self, chars):
+        """Load the glyphs of several characters at once
+
+        The glyphs that are not loaded yet are rasterized and packed into
+        the atlas together, and their SDFs are stored in the atlas in one
+        batch (with a single upload for the CPU renderer). This is much
+        faster than loading the characters one by one.
+
+        Parameters
+        ----------
+        chars : str
+            The characters to load. May contain duplicates.
+        """
+        missing = set(chars).difference(self._glyphs)
+        for char in sorted(missing):
+            self._load_char(char)
+        self._store_pending()
+
     def _load_char(self, char):
-        """Build and store a glyph corresponding to an individual character
+        """Build a glyph corresponding to an individual character and
+        allocate its region in the atlas
+
+        The SDF of the glyph is stored in the atlas by ``_store_pending()``.
 
         Parameters
         ----------
@@ -91,6 +150,8 @@ class TextureFont(object):
         """
         assert isinstance(char, string_types) and len(char) == 1
         assert char not in self._glyphs
+        if self._load_cached_char(char):
+            return
         # load new glyph data from font
         _load_glyph(self._font, char, self._glyphs)
         # put new glyph into the texture
@@ -105,26 +166,182 @@ class TextureFont(object):
         # Store, while scaling down to proper size
         height = data.shape[0] // self.ratio
         width = data.shape[1] // self.ratio
-        region = self._atlas.get_free_region(width + 2, height + 2)
-        if region is None:
-            raise RuntimeError('Cannot store glyph')
+        region = self._get_free_region(width + 2, height + 2)
         x, y, w, h = region
         x, y, w, h = x + 1, y + 1, w - 2, h - 2
 
-        self._renderer.render_to_texture(data, self._atlas, (x, y), (w, h))
-        u0 = x / float(self._atlas.shape[1])
-        v0 = y / float(self._atlas.shape[0])
-        u1 = (x+w) / float(self._atlas.shape[1])
-        v1 = (y+h) / float(self._atlas.shape[0])
-        texcoords = (u0, v0, u1, v1)
-        glyph.update(dict(size=(w, h), texcoords=texcoords))
+        glyph.update(dict(size=(w, h), texcoords=(x, y, x + w, y + h)))
+        self._pending.append((char, (x, y, w, h), data, None))
+
+    def _store_pending(self):
+        """Store the SDFs of the new glyphs in the atlas"""
+        pending, self._pending = self._pending, []
+        if len(pending) == 0:
+            return
+        self._renderer.render_regions(self._atlas, [item[1:]
+                                                    for item in pending])
+        for char, bounds, data, sdf in pending:
+            if sdf is None:
+                self._save_cached_char(char)
+
+    def _cache_file(self, char):
+        """Get the file in the glyph cache for a character
+
+        Returns None if the cache is disabled (the ``glyph_cache_dir``
+        config option is empty) or if the font file is not known (e.g.
+        for system fonts on OSX).
+        """
+        directory = config['glyph_cache_dir']
+        if not directory:
+            return None
+        if self._cache_key is None:
+            f = self._font
+            fname = _get_font_file(f['face'], f['bold'], f['italic'])
+            if fname is None:
+                self._cache_key = False
+            else:
+                # The SDF also depends on the renderer and its parameters
+                sha = hashlib.sha1()
+                with open(fname, 'rb') as fid:
+                    sha.update(fid.read())
+                sha.update(repr((f['face'], f['bold'], f['italic'],
+                                 f['size'], self._lowres_size, self._spread,
+                                 self._renderer.__class__.__name__)
+                                ).encode('utf-8'))
+                self._cache_key = sha.hexdigest()
+        if not self._cache_key:
+            return None
+        return op.join(directory, self._cache_key, '%x.npz' % ord(char))
+
+    def _load_cached_char(self, char):
+        """Store a glyph from the glyph cache, if it is there
+
+        Returns whether the glyph was loaded.
+        """
+        filename = self._cache_file(char)
+        if filename is None or not op.isfile(filename):
+            return False
+        try:
+            with np.load(filename) as npz:
+                sdf, metrics = npz['sdf'], npz['metrics']
+        except Exception as err:  # e.g. a file that is being written
+            logger.debug('Ignoring glyph cache file %s: %s' % (filename, err))
+            return False
+        left, top, advance = metrics.tolist()
+        glyph = dict(char=char, offset=(left, top), advance=advance,
+                     kerning={})
+        self._glyphs[char] = glyph
+        _load_kerning(self._font, char, self._glyphs)
+
+        h, w = sdf.shape
+        x, y = self._get_free_region(w + 2, h + 2)[:2]
+        x, y = x + 1, y + 1
+        glyph.update(dict(size=(w, h), texcoords=(x, y, x + w, y + h)))
+        self._pending.append((char, (x, y, w, h), None, sdf))
+        return True
+
+    def _save_cached_char(self, char):
+        """Store a glyph in the glyph cache (if enabled)"""
+        filename = self._cache_file(char)
+        if filename is None:
+            return
+        glyph = self._glyphs[char]
+        x0, y0, x1, y1 = glyph['texcoords']
+        sdf = self._renderer.get_texture_data(self._atlas,
+                                              (x0, y0, x1 - x0, y1 - y0))
+        if sdf is None:
+            sdf = self._atlas._atlas_data[y0:y1, x0:x1]
+        metrics = np.array(glyph['offset'] + (glyph['advance'],), float)
+        try:
+            if not op.isdir(op.dirname(filename)):
+                os.makedirs(op.dirname(filename))
+            np.savez(filename, sdf=sdf[..., 0], metrics=metrics)
+        except (IOError, OSError) as err:
+            logger.warning('Could not write glyph cache: %s' % err)
+
+    def _get_free_region(self, width, height):
+        """Allocate a region in the atlas, growing the atlas or evicting
+        glyphs if needed.
+        """
+        region = self._atlas.get_free_region(width, height)
+        while region is None:
+            # The atlas data must be complete to grow it or evict glyphs
+            self._store_pending()
+            shape = self._atlas.shape
+            grown = min(shape[:2]) * max(shape[:2]) * 2 * shape[2]
+            # The atlas grows by doubling its shorter side
+            if (2 * min(shape[:2]) <= self._max_size() and
+                    (self._max_atlas_bytes is None or
+                     grown <= self._max_atlas_bytes)):
+                self._atlas.grow(self._renderer.get_texture_data(self._atlas))
+            elif not self._evict():
+                raise RuntimeError('Cannot store glyph')
+            region = self._atlas.get_free_region(width, height)
+        return region
+
+    def _max_size(self):
+        """The maximum width and height of the atlas, which is limited by
+        the maximum texture size of the current context (if known).
+        """
+        size = self._max_atlas_size
+        canvas = context.get_current_canvas()
+        if canvas is not None and canvas.context.shared.parser is not None:
+            capabilities = canvas.context.shared.parser.capabilities
+            if capabilities.get('max_texture_size'):
+                size = min(size, capabilities['max_texture_size'])
+        return size
+
+    def _evict(self):
+        """Evict the least recently used half of the glyphs, and pack the
+        others into a new atlas.
+
+        Returns False if there was nothing to evict.
+        """
+        # The glyph that is being loaded is the last one, and has no region
+        glyphs = list(self._glyphs.values())[:-1]
+        if len(glyphs) == 0:
+            return False
+        for glyph in glyphs[:(len(glyphs) + 1) // 2]:
+            del self._glyphs[glyph['char']]
+        glyphs = glyphs[(len(glyphs) + 1) // 2:]
+
+        old = self._atlas
+        old_data = self._renderer.get_texture_data(old)
+        if old_data is None:
+            old_data = old._atlas_data
+        old_data = old_data.reshape(old.shape)
+        self._atlas = TextureAtlas(old.shape[:2], dtype=np.uint8,
+                                   channels=old.shape[2])
+        data = np.zeros(old.shape, np.uint8)
+        # Pack the tallest glyphs first
+        for glyph in sorted(glyphs, key=lambda g: -g['size'][1]):
+            x0, y0, x1, y1 = glyph['texcoords']
+            w, h = x1 - x0, y1 - y0
+            region = self._atlas.get_free_region(w + 2, h + 2)
+            if region is None:
+                del self._glyphs[glyph['char']]
+                continue
+            x, y = region[0] + 1, region[1] + 1
+            data[y:y + h, x:x + w] = old_data[y0:y1, x0:x1]
+            glyph['texcoords'] = (x, y, x + w, y + h)
+        self._atlas.set_data(data)
+        self._generation += 1
+        return True
 
 
 class FontManager(object):
-    """Helper to create TextureFont instances and reuse them when possible"""
+    """Helper to create TextureFont instances and reuse them when possible
+
+    Parameters
+    ----------
+    method : str
+        The SDF rendering method, 'cpu' or 'gpu'.
+    max_atlas_bytes : int | None
+        Memory budget for the atlas of each font (see TextureFont).
+    """
     # XXX: should store a font-manager on each context,
     # or let TextureFont use a TextureAtlas for each context
-    def __init__(self, method='cpu'):
+    def __init__(self, method='cpu', max_atlas_bytes=None):
         self._fonts = {}
         if not isinstance(method, string_types) or \
                 method not in ('cpu', 'gpu'):
@@ -134,13 +351,15 @@ class FontManager(object):
             self._renderer = SDFRendererCPU()
         else:  # method == 'gpu':
             self._renderer = SDFRendererGPU()
+        self._max_atlas_bytes = max_atlas_bytes
 
     def get_font(self, face, bold=False, italic=False):
         """Get a font described by face and size"""
         key = '%s-%s-%s' % (face, bold, italic)
         if key not in self._fonts:
             font = dict(face=face, bold=bold, italic=italic)
-            self._fonts[key] = TextureFont(font, self._renderer)
+            self._fonts[key] = TextureFont(font, self._renderer,
+                                           self._max_atlas_bytes)
         return self._fonts[key]
 
 
@@ -148,32 +367,95 @@ class FontManager(object):
 # The visual
 
 
+# Escape sequence characters, {unicode: offset}. If the offset is > 0 it
+# is a line break of that many lines, if it is < 0 it moves the pen that
+# many spaces in x-direction:
+#   ord('\a') = 7
+#   ord('\b') = 8
+#   ord('\f') = 12
+#   ord('\n') = 10  => linebreak
+#   ord('\r') = 13
+#   ord('\t') = 9   => tab, set equal 4 whitespaces
+#   ord('\v') = 11  => vertical tab, set equal 4 linebreaks
+_esc_seq = {7: 0, 8: 0, 9: -4, 10: 1, 11: 4, 12: 0, 13: 0}
+_esc_codes = np.array(sorted(_esc_seq), np.uint32)
+_esc_offsets = np.array([_esc_seq[c] for c in sorted(_esc_seq)], np.float64)
+
+
 def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
-    """Convert text characters to VBO"""
-    # Necessary to flush commands before requesting current viewport because
-    # There may be a set_viewport command waiting in the queue.
-    # TODO: would be nicer if each canvas just remembers and manages its own
-    # viewport, rather than relying on the context for this.
-    canvas = context.get_current_canvas()
-    canvas.context.flush_commands()
+    """Convert text characters to VBO
+
+    All strings are laid out at once: the characters are mapped to a table
+    of glyph metrics, and the pen positions, kerning, line breaks and
+    anchoring are computed with NumPy.
 
+    Parameters
+    ----------
+    text : str | list of str
+        The text. Each string is laid out on its own, relative to its
+        anchor point.
+    font : instance of TextureFont
+        The font.
+    anchor_x : str
+        Horizontal anchor, 'left', 'center' or 'right'.
+    anchor_y : str
+        Vertical anchor, 'top', 'center', 'middle', 'baseline' or 'bottom'.
+    lowres_size : int
+        The size of the glyphs in the atlas, in points.
+
+    Returns
+    -------
+    vertices : ndarray
+        The four vertices of the quad of each character of all strings (in
+        order). Characters that are not drawn get an empty quad.
+    """
     text_vtype = np.dtype([('a_position', np.float32, 2),
                            ('a_texcoord', np.float32, 2)])
-    vertices = np.zeros(len(text) * 4, dtype=text_vtype)
-    prev = None
-    width = height = ascender = descender = 0
-    ratio, slop = 1. / font.ratio, font.slop
-    x_off = -slop
-    # Need to make sure we have a unicode string here (Py2.7 mis-interprets
+    if isinstance(text, string_types):
+        text = [text]
+    # Need to make sure we have unicode strings here (Py2.7 mis-interprets
     # characters like "•" otherwise)
-    if sys.version[0] == '2' and isinstance(text, str):
-        text = text.decode('utf-8')
-    # Need to store the original viewport, because the font[char] will
-    # trigger SDF rendering, which changes our viewport
-    # todo: get rid of call to glGetParameter!
+    if sys.version[0] == '2':
+        text = [t.decode('utf-8') if isinstance(t, str) else t for t in text]
+    lengths = np.array([len(t) for t in text], int)
+    n_str, n = len(text), lengths.sum()
+    vertices = np.zeros(n * 4, dtype=text_vtype)
+    if n == 0:
+        return vertices
+    ratio, slop = 1. / font.ratio, font.slop
+
+    # Map the characters to a table of the unique ones
+    joined = u''.join(text)
+    codes = np.frombuffer(joined.encode('utf-32-le'), np.uint32)
+    ucodes, first, inv = np.unique(codes, return_index=True,
+                                   return_inverse=True)
+    inv = inv.ravel()
+    uesc = np.searchsorted(_esc_codes, ucodes).clip(0, len(_esc_codes) - 1)
+    uesc_offset = np.where(_esc_codes[uesc] == ucodes, _esc_offsets[uesc],
+                           np.nan)
+    is_esc = ~np.isnan(uesc_offset)
+    uchars = [joined[i] for i in first]
+    # Render all new glyphs in one batch
+    font.preload('hy ' + u''.join(c for c, e in zip(uchars, is_esc)
+                                  if not e))
+
+    # Glyph metrics, in high-res units; escape characters are not drawn
+    glyphs = [None if e else font[c] for c, e in zip(uchars, is_esc)]
+    n_u = len(uchars)
+    offset = np.zeros((n_u, 2))
+    size = np.zeros((n_u, 2))
+    advance = np.zeros(n_u)
+    texcoords = np.zeros((n_u, 4))
+    for i, glyph in enumerate(glyphs):
+        if glyph is not None:
+            offset[i] = glyph['offset']
+            size[i] = glyph['size']
+            advance[i] = glyph['advance']
+            texcoords[i] = glyph['texcoords']
 
     # Also analyse chars with large ascender and descender, otherwise the
     # vertical alignment can be very inconsistent
+    ascender = descender = height = 0
     for char in 'hy':
         glyph = font[char]
         y0 = glyph['offset'][1] * ratio + slop
@@ -182,98 +464,84 @@ def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
         descender = min(descender, y1 + slop)
         height = max(height, glyph['size'][1] - 2*slop)
 
-    # Get/set the fonts whitespace length and line height (size of this ok?)
-    glyph = font[' ']
-    spacewidth = glyph['advance'] * ratio
+    # Get the fonts whitespace length and line height (size of this ok?)
+    spacewidth = font[' ']['advance'] * ratio
     lineheight = height * 1.5
 
-    # Added escape sequences characters: {unicode:offset,...}
-    #   ord('\a') = 7
-    #   ord('\b') = 8
-    #   ord('\f') = 12
-    #   ord('\n') = 10  => linebreak
-    #   ord('\r') = 13
-    #   ord('\t') = 9   => tab, set equal 4 whitespaces?
-    #   ord('\v') = 11  => vertical tab, set equal 4 linebreaks?
-    # If text coordinate offset > 0 -> it applies to x-direction
-    # If text coordinate offset < 0 -> it applies to y-direction
-    esc_seq = {7: 0, 8: 0, 9: -4, 10: 1, 11: 4, 12: 0, 13: 0}
-
-    # Keep track of y_offset to set lines at right position
-    y_offset = 0
-
-    # When a line break occur, record the vertices index value
-    vi_marker = 0
-    ii_offset = 0  # Offset since certain characters won't be drawn
-
-    # The running tracker of characters vertex index
-    vi = 0
-
-    orig_viewport = canvas.context.get_viewport()
-    for ii, char in enumerate(text):
-        if ord(char) in esc_seq:
-            if esc_seq[ord(char)] < 0:
-                # Add offset in x-direction
-                x_off += abs(esc_seq[ord(char)]) * spacewidth
-                width += abs(esc_seq[ord(char)]) * spacewidth
-            elif esc_seq[ord(char)] > 0:
-                # Add offset in y-direction and reset things in x-direction
-                dx = dy = 0
-                if anchor_x == 'right':
-                    dx = -width
-                elif anchor_x == 'center':
-                    dx = -width / 2.
-                vertices['a_position'][vi_marker:vi+4] += (dx, dy)
-                vi_marker = vi+4
-                ii_offset -= 1
-                # Reset variables that affects x-direction positioning
-                x_off = -slop
-                width = 0
-                # Add offset in y-direction
-                y_offset += esc_seq[ord(char)] * lineheight
-        else:
-            # For ordinary characters, normal procedure
-            glyph = font[char]
-            kerning = glyph['kerning'].get(prev, 0.) * ratio
-            x0 = x_off + glyph['offset'][0] * ratio + kerning
-            y0 = glyph['offset'][1] * ratio + slop - y_offset
-            x1 = x0 + glyph['size'][0]
-            y1 = y0 - glyph['size'][1]
-            u0, v0, u1, v1 = glyph['texcoords']
-            position = [[x0, y0], [x0, y1], [x1, y1], [x1, y0]]
-            texcoords = [[u0, v0], [u0, v1], [u1, v1], [u1, v0]]
-            vi = (ii + ii_offset) * 4
-            vertices['a_position'][vi:vi+4] = position
-            vertices['a_texcoord'][vi:vi+4] = texcoords
-            x_move = glyph['advance'] * ratio + kerning
-            x_off += x_move
-            ascender = max(ascender, y0 - slop)
-            descender = min(descender, y1 + slop)
-            width += x_move
-            height = max(height, glyph['size'][1] - 2*slop)
-            prev = char
-
-    if orig_viewport is not None:
-        canvas.context.set_viewport(*orig_viewport)
-
-    dx = dy = 0
-    if anchor_y == 'top':
-        dy = -descender
-    elif anchor_y in ('center', 'middle'):
-        dy = (-descender - ascender) / 2
-    elif anchor_y == 'bottom':
-        dy = -ascender
+    str_idx = np.repeat(np.arange(n_str), lengths)
+    str_start = np.cumsum(lengths) - lengths
+    drawn = ~is_esc[inv]
+    esc_offset = np.nan_to_num(uesc_offset[inv])
+
+    # Kerning with the previous drawn character of the same string
+    kerning = np.zeros(n)
+    idx = np.where(drawn)[0]
+    has_prev = str_idx[idx[1:]] == str_idx[idx[:-1]]
+    cur, prev = idx[1:][has_prev], idx[:-1][has_prev]
+    if len(cur):
+        pairs, pair_inv = np.unique(inv[prev] * n_u + inv[cur],
+                                    return_inverse=True)
+        pair_kerning = np.array([
+            glyphs[p % n_u]['kerning'].get(uchars[p // n_u], 0.)
+            for p in pairs])
+        kerning[cur] = pair_kerning[pair_inv.ravel()] * ratio
+
+    # Line breaks: each line starts at the pen position -slop
+    is_break = esc_offset > 0
+    line_start = is_break.copy()
+    line_start[str_start[lengths > 0]] = True
+    line_idx = np.cumsum(line_start) - 1
+    x_move = np.where(drawn, advance[inv] * ratio + kerning, 0.)
+    x_move[esc_offset < 0] = -esc_offset[esc_offset < 0] * spacewidth
+    x_cum = np.cumsum(x_move)
+    x_line = x_cum[line_start] - x_move[line_start]
+    x_off = x_cum - x_move - x_line[line_idx] - slop
+    width = np.bincount(line_idx, x_move)
+    line_breaks = np.where(is_break, esc_offset, 0.)
+    y_cum = np.cumsum(line_breaks)
+    # (gathered per character, as empty strings have no first character)
+    y_offset = (y_cum - (y_cum - line_breaks)[str_start[str_idx]]) * \
+        lineheight
+
+    x0 = x_off + offset[inv, 0] * ratio + kerning
+    y0 = offset[inv, 1] * ratio + slop - y_offset
+    x1 = x0 + size[inv, 0]
+    y1 = y0 - size[inv, 1]
+    x0[~drawn] = x1[~drawn] = x_off[~drawn]
+    y0[~drawn] = y1[~drawn] = -y_offset[~drawn]
+
+    # The vertical extent of each string includes all its lines
+    asc = np.full(n_str, ascender, float)
+    desc = np.full(n_str, descender, float)
+    np.maximum.at(asc, str_idx[drawn], y0[drawn] - slop)
+    np.minimum.at(desc, str_idx[drawn], y1[drawn] + slop)
+
+    dx = np.zeros(len(width))
     if anchor_x == 'right':
         dx = -width
     elif anchor_x == 'center':
         dx = -width / 2.
-
-    # If any linebreaks occured in text, we only want to translate characters
-    # in the last line in text (those after the vi_marker)
-    vertices['a_position'][0:vi_marker] += (0, dy)
-    vertices['a_position'][vi_marker:] += (dx, dy)
-    vertices['a_position'] /= lowres_size
-
+    dy = np.zeros(n_str)
+    if anchor_y == 'top':
+        dy = -desc
+    elif anchor_y in ('center', 'middle'):
+        dy = (-desc - asc) / 2
+    elif anchor_y == 'bottom':
+        dy = -asc
+    x0 += dx[line_idx]
+    x1 += dx[line_idx]
+    y0 += dy[str_idx]
+    y1 += dy[str_idx]
+
+    # Write all quads at once
+    position = vertices['a_position'].reshape(n, 4, 2)
+    position[:, :, 0] = np.column_stack([x0, x0, x1, x1])
+    position[:, :, 1] = np.column_stack([y0, y1, y1, y0])
+    position /= lowres_size
+    u0, v0, u1, v1 = (texcoords[inv] * drawn[:, np.newaxis]).T
+    tex = vertices['a_texcoord'].reshape(n, 4, 2)
+    tex[:, :, 0] = np.column_stack([u0, u0, u1, u1])
+    tex[:, :, 1] = np.column_stack([v0, v1, v1, v0])
     return vertices
 
 
@@ -283,22 +551,27 @@ class TextVisual(Visual):
     Note: SDF GPU is not currently supported in WebGL without additional
           extensions (see comments in fragment shader below).
 
+    The position, font size and color of each string are read from a
+    float texture in the vertex shader if the context supports it (see
+    the ``vertex_float_textures`` capability of the GLIR parser). Else,
+    e.g. with OpenGL ES 2.0 and WebGL, they are repeated for each vertex.
+
     Parameters
     ----------
     text : str | list of str
-        Text to display. Can also be a list of strings.
-        Note: support for list of str might be removed soon
-        in favor of text collections.
-    color : instance of Color
-        Color to use.
+        Text to display. Can also be a list of strings. When a new list of
+        the same length is assigned, only the strings that changed are
+        laid out and uploaded again.
+    color : instance of Color | instance of ColorArray
+        Color to use. Can also be one color per string.
     bold : bool
         Bold face.
     italic : bool
         Italic face.
     face : str
         Font face to use.
-    font_size : float
-        Point size to use.
+    font_size : float | array-like
+        Point size to use. Can also be one size per string.
     pos : tuple | list of tuple
         Position (x, y) or (x, y, z) of the text.
         Can also be a list of tuple if `text` is a list.
@@ -319,20 +592,29 @@ class TextVisual(Visual):
 
     VERTEX_SHADER = """
         uniform float u_rotation;  // rotation in rad
-        attribute vec2 a_position; // in point units
-        attribute vec2 a_texcoord;
-        attribute vec3 a_pos;  // anchor position
+        uniform vec2 u_font_atlas_shape;
+        uniform float u_px_per_pt;  // logical pixels per point
+        attribute vec2 a_position; // in units of the font size
+        attribute vec2 a_texcoord; // in texels
+        attribute float a_index;  // index of the string
         varying vec2 v_texcoord;
+        varying vec4 v_color;
+        varying float v_npix;
 
         void main(void) {
+            // Anchor position and font size, and color of the string
+            vec4 pos_size = $pos_size;
+            v_color = $color;
+            v_npix = pos_size.w * u_px_per_pt;
+
             // Eventually "rot" should be handled by SRTTransform or so...
             mat4 rot = mat4(cos(u_rotation), -sin(u_rotation), 0, 0,
                             sin(u_rotation), cos(u_rotation), 0, 0,
                             0, 0, 1, 0, 0, 0, 0, 1);
-            vec4 pos = $transform(vec4(a_pos, 1.0)) +
-                       $text_scale(rot * vec4(a_position, 0, 0));
+            vec4 pos = $transform(vec4(pos_size.xyz, 1.0)) +
+                       $text_scale(rot * vec4(a_position * pos_size.w, 0, 0));
             gl_Position = pos;
-            v_texcoord = a_texcoord;
+            v_texcoord = a_texcoord / u_font_atlas_shape;
         }
         """
 
@@ -346,10 +628,10 @@ class TextVisual(Visual):
 
         uniform sampler2D u_font_atlas;
         uniform vec2 u_font_atlas_shape;
-        uniform vec4 u_color;
-        uniform float u_npix;
 
         varying vec2 v_texcoord;
+        varying vec4 v_color;
+        varying float v_npix;
         const float center = 0.5;
 
         float contour(in float d, in float w)
@@ -363,12 +645,12 @@ class TextVisual(Visual):
         }
 
         void main(void) {
-            vec4 color = u_color;
+            vec4 color = v_color;
             vec2 uv = v_texcoord.xy;
             vec4 rgb;
 
             // Use interpolation at high font sizes
-            if(u_npix >= 50.0)
+            if(v_npix >= 50.0)
                 rgb = CatRom(u_font_atlas, u_font_atlas_shape, uv);
             else
                 rgb = texture2D(u_font_atlas, uv);
@@ -380,7 +662,7 @@ class TextVisual(Visual):
             // Regular SDF
             float alpha = contour(distance, width);
 
-            if (u_npix < 30.) {
+            if (v_npix < 30.) {
                 // Supersample, 4 extra points
                 // Half of 1/sqrt2; you can play with this
                 float dscale = 0.5 * M_SQRT1_2;
@@ -399,6 +681,9 @@ class TextVisual(Visual):
         }
         """
 
+    # Width of the texture with the data of the strings
+    _string_data_width = 1024
+
     def __init__(self, text=None, color='black', bold=False,
                  italic=False, face='OpenSans', font_size=12, pos=[0, 0, 0],
                  rotation=0., anchor_x='center', anchor_y='center',
@@ -415,7 +700,24 @@ class TextVisual(Visual):
         self._font_manager = font_manager or FontManager(method=method)
         self._font = self._font_manager.get_font(face, bold, italic)
         self._vertices = None
+        self._font_generation = None
         self._anchors = (anchor_x, anchor_y)
+        # The glyph quads of each string are in a slot of the vertex
+        # buffer, which can hold more quads than the string has characters
+        self._strings = []
+        self._dirty = set()  # strings to lay out again
+        self._lengths = np.zeros(0, int)
+        self._capacity = np.zeros(0, int)  # number of quads of each slot
+        self._slot_start = np.zeros(0, int)
+        self._vertex_data = None
+        # Per-string positions, font sizes and colors; read from a texture
+        # if the context supports it, else repeated for each vertex
+        self._string_texture = None  # whether the texture is used
+        self._string_data = None
+        self._string_lookup = None
+        self._pos_size_vbo = VertexBuffer(np.zeros((0, 4), np.float32))
+        self._color_vbo = VertexBuffer(np.zeros((0, 4), np.float32))
+        self._data_changed = True
         # Init text properties
         self.color = color
         self.text = text
@@ -437,11 +739,21 @@ class TextVisual(Visual):
     def text(self, text):
         if isinstance(text, list):
             assert all(isinstance(t, string_types) for t in text)
+            # Copy, so that changes to the list can be detected when it is
+            # assigned again
+            text = list(text)
         if text is None:
             text = []
+        strings = [text] if isinstance(text, string_types) else text
+        if len(strings) != len(self._strings):
+            self._vertices = None
+            self._data_changed = True
+        elif self._vertices is not None:
+            self._dirty.update(i for i, (old, new) in
+                               enumerate(zip(self._strings, strings))
+                               if old != new)
         self._text = text
-        self._vertices = None
-        self._pos_changed = True  # need to update this as well
+        self._strings = strings
         self.update()
 
     @property
@@ -452,29 +764,35 @@ class TextVisual(Visual):
     def anchors(self, a):
         self._anchors = a
         self._vertices = None
-        self._pos_changed = True
         self.update()
 
     @property
     def font_size(self):
-        """ The font size (in points) of the text
+        """ The font size (in points) of the text, or of each string
         """
         return self._font_size
 
     @font_size.setter
     def font_size(self, size):
-        self._font_size = max(0.0, float(size))
+        if np.ndim(size) == 0:
+            self._font_size = max(0.0, float(size))
+        else:
+            self._font_size = np.maximum(np.asarray(size, np.float32), 0.)
+        self._data_changed = True
         self.update()
 
     @property
     def color(self):
-        """ The color of the text
+        """ The color of the text, or the ColorArray of the colors of the
+        strings
         """
         return self._color
 
     @color.setter
     def color(self, color):
-        self._color = Color(color)
+        color = ColorArray(color)
+        self._color = Color(color.rgba[0]) if len(color) == 1 else color
+        self._data_changed = True
         self.update()
 
     @property
@@ -505,65 +823,162 @@ class TextVisual(Visual):
         elif pos.shape[0] == 0:
             raise ValueError('at least one position must be given')
         self._pos = pos
-        self._pos_changed = True
+        self._data_changed = True
         self.update()
 
+    def _update_vertices(self):
+        """Lay out the strings that changed (or all strings) and upload
+        their glyph quads
+        """
+        strings = self._strings
+        n = len(strings)
+        realloc = self._vertices is None
+        if realloc:
+            lengths = np.array([len(t) for t in strings], int)
+            capacity = lengths.copy()
+        else:
+            lengths, capacity = self._lengths, self._capacity
+            dirty = np.array(sorted(self._dirty), int)
+            lengths[dirty] = [len(strings[i]) for i in dirty]
+            if (lengths[dirty] > capacity[dirty]).any():
+                # Some strings outgrew their slot; leave room to grow
+                capacity = np.maximum(capacity, lengths + (lengths + 3) // 4)
+                realloc = True
+        if realloc:
+            dirty = np.arange(n)
+        self._lengths = lengths
+        self._dirty = set()
+        # we delay creating vertices because it requires a context,
+        # which may or may not exist when the object is initialized
+        for attempt in range(3):
+            generation = self._font.generation
+            # Glyphs that were evicted from the atlas must be laid out again
+            if generation != self._font_generation:
+                dirty = np.arange(n)
+            vertices = _text_to_vbo([strings[i] for i in dirty], self._font,
+                                    self._anchors[0], self._anchors[1],
+                                    self._font._lowres_size)
+            if self._font.generation == generation:
+                break
+        else:
+            raise RuntimeError('The font atlas is too small for the text')
+        self._font_generation = generation
+
+        if realloc:
+            self._data_changed = True  # the per-vertex data must grow
+            self._capacity = capacity
+            self._slot_start = np.cumsum(capacity) - capacity
+            n_quads = capacity.sum()
+            self._vertex_data = np.zeros(4 * n_quads, [
+                ('a_position', np.float32, 2), ('a_texcoord', np.float32, 2),
+                ('a_index', np.float32)])
+            self._vertex_data['a_index'] = np.repeat(np.arange(n),
+                                                     4 * capacity)
+        # Copy the quads into the slots; unused quads are empty
+        start = self._slot_start[dirty]
+        quads = self._vertex_data.reshape(-1, 4)
+        slots = _ranges(start, self._capacity[dirty])
+        quads['a_position'][slots] = 0
+        quads['a_texcoord'][slots] = 0
+        used = _ranges(start, lengths[dirty])
+        vertices = vertices.reshape(-1, 4)
+        quads['a_position'][used] = vertices['a_position']
+        quads['a_texcoord'][used] = vertices['a_texcoord']
+
+        if realloc:
+            self._vertices = VertexBuffer(self._vertex_data)
+            idx = (np.array([0, 1, 2, 0, 2, 3], np.uint32) +
+                   np.arange(0, 4 * n_quads, 4,
+                             dtype=np.uint32)[:, np.newaxis])
+            self._index_buffer = IndexBuffer(idx.ravel())
+            self.shared_program.bind(self._vertices)
+        else:
+            # Upload each run of adjacent slots
+            end = start + self._capacity[dirty]
+            breaks = np.where(start[1:] != end[:-1])[0] + 1
+            for i0, i1 in zip(np.concatenate([[0], breaks]),
+                              np.concatenate([breaks, [len(dirty)]])):
+                if i1 > i0:
+                    v0, v1 = 4 * int(start[i0]), 4 * int(end[i1 - 1])
+                    self._vertices.set_subdata(self._vertex_data[v0:v1],
+                                               offset=v0, copy=True)
+        # This is necessary to reset the GL drawing state after generating
+        # SDF textures. A better way would be to enable the state to be
+        # pushed/popped by the context.
+        self._configure_gl_state()
+
+    def _set_string_texture(self, use_texture):
+        """Read the data of the strings from a texture, or from per-vertex
+        attributes
+        """
+        if use_texture:
+            if self._string_data is None:
+                self._string_data = Texture2D(
+                    np.zeros((2, 1, 4), np.float32),
+                    internalformat='rgba32f', interpolation='nearest')
+                self._string_lookup = Function(_string_data_lookup)
+                self._string_lookup['data'] = self._string_data
+            self.shared_program.vert['pos_size'] = \
+                self._string_lookup('a_index', '0.')
+            self.shared_program.vert['color'] = \
+                self._string_lookup('a_index', '1.')
+        else:
+            self.shared_program.vert['pos_size'] = self._pos_size_vbo
+            self.shared_program.vert['color'] = self._color_vbo
+        self._string_texture = use_texture
+        self._data_changed = True
+
+    def _update_string_data(self):
+        """Upload the position, font size and color of each string"""
+        n = len(self._strings)
+        pos_size = np.empty((n, 4), np.float32)
+        pos_size[:, :3] = _per_string(self._pos, n)
+        pos_size[:, 3] = _per_string(np.atleast_1d(self._font_size), n)
+        color = _per_string(np.atleast_2d(self._color.rgba), n)
+        if self._string_texture:
+            # Two texels per string, in two rows
+            width = min(n, self._string_data_width)
+            rows = -(-n // width)
+            tex = np.zeros((rows, 2, width, 4), np.float32)
+            idx = np.arange(n)
+            tex[idx // width, 0, idx % width] = pos_size
+            tex[idx // width, 1, idx % width] = color
+            self._string_data.set_data(tex.reshape(2 * rows, width, 4))
+            self._string_lookup['shape'] = (width, 2 * rows)
+        else:
+            repeats = 4 * self._capacity
+            self._pos_size_vbo.set_data(np.repeat(pos_size, repeats, axis=0))
+            self._color_vbo.set_data(np.repeat(color, repeats, axis=0)
+                                     .astype(np.float32))
+        self._data_changed = False
+
     def _prepare_draw(self, view):
         # attributes / uniforms are not available until program is built
         if len(self.text) == 0:
             return False
-        if self._vertices is None:
-            text = self.text
-            if isinstance(text, string_types):
-                text = [text]
-            n_char = sum(len(t) for t in text)
-            # we delay creating vertices because it requires a context,
-            # which may or may not exist when the object is initialized
-            self._vertices = np.concatenate([
-                _text_to_vbo(t, self._font, self._anchors[0], self._anchors[1],
-                             self._font._lowres_size) for t in text])
-            self._vertices = VertexBuffer(self._vertices)
-            idx = (np.array([0, 1, 2, 0, 2, 3], np.uint32) +
-                   np.arange(0, 4*n_char, 4, dtype=np.uint32)[:, np.newaxis])
-            self._index_buffer = IndexBuffer(idx.ravel())
-            self.shared_program.bind(self._vertices)
-            # This is necessary to reset the GL drawing state after generating
-            # SDF textures. A better way would be to enable the state to be
-            # pushed/popped by the context.
-            self._configure_gl_state()
-        if self._pos_changed:
-            # now we promote pos to the proper shape (attribute)
-            text = self.text
-            if not isinstance(text, string_types):
-                repeats = [4 * len(t) for t in text]
-                text = ''.join(text)
-            else:
-                repeats = [4 * len(text)]
-            n_text = len(repeats)
-            pos = self.pos
-            if pos.shape[0] < n_text:
-                pos = np.repeat(pos, [1]*(len(pos)-1) + [n_text-len(pos)+1],
-                                axis=0)
-            pos = np.repeat(pos[:n_text], repeats, axis=0)
-            assert pos.shape[0] == self._vertices.size
-            self.shared_program['a_pos'] = pos
-            self._pos_changed = False
+        use_texture = _string_texture_supported()
+        if use_texture != self._string_texture:
+            self._set_string_texture(use_texture)
+        if (self._vertices is None or self._dirty or
+                self._font_generation != self._font.generation):
+            self._update_vertices()
+        if self._data_changed:
+            self._update_string_data()
 
         transforms = self.transforms
-        n_pix = (self._font_size / 72.) * transforms.dpi  # logical pix
+        px_per_pt = transforms.dpi / 72.  # logical pix
         tr = transforms.get_transform('document', 'render')
         px_scale = (tr.map((1, 0)) - tr.map((0, 1)))[:2]
-        self._text_scale.scale = px_scale * n_pix
+        self._text_scale.scale = px_scale * px_per_pt
         self.shared_program.vert['text_scale'] = self._text_scale
-        self.shared_program['u_npix'] = n_pix
+        self.shared_program['u_px_per_pt'] = px_per_pt
         self.shared_program['u_kernel'] = self._font._kernel
         self.shared_program['u_rotation'] = self._rotation
-        self.shared_program['u_color'] = self._color.rgba
         self.shared_program['u_font_atlas'] = self._font._atlas
-        self.shared_program['u_font_atlas_shape'] = self._font._atlas.shape[:2]
+        self.shared_program['u_font_atlas_shape'] = \
+            self._font._atlas.shape[1::-1]
 
     def _prepare_transforms(self, view):
-        self._pos_changed = True
         # Note that we access `view_program` instead of `shared_program`
         # because we do not want this function assigned to other views.
         tr = view.transforms.get_transform()
@@ -573,11 +988,65 @@ class TextVisual(Visual):
         return self._pos[:, axis].min(), self._pos[:, axis].max()
 
 
+_string_data_lookup = """
+    vec4 string_data(float index, float texel) {
+        // Two texels per string: anchor position and font size, and color
+        float row = floor(index / $shape.x);
+        vec2 uv = vec2(index - row * $shape.x, 2. * row + texel);
+        return texture2D($data, (uv + 0.5) / $shape);
+    }"""
+
+
+def _string_texture_supported():
+    """Whether the current context can read the data of the strings from a
+    float texture in the vertex shader
+    """
+    canvas = context.get_current_canvas()
+    if canvas is None or canvas.context.shared.parser is None:
+        return False
+    capabilities = canvas.context.shared.parser.capabilities
+    return bool(capabilities.get('vertex_float_textures'))
+
+
+def _per_string(values, n):
+    """Get one value per string, repeating the last value if there are
+    fewer values than strings
+    """
+    if len(values) < n:
+        values = np.concatenate([values, np.repeat(values[-1:],
+                                                   n - len(values), axis=0)])
+    return values[:n]
+
+
+def _ranges(starts, counts):
+    """Concatenate the ranges [start, start + count)"""
+    counts = np.asarray(counts, int)
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return offsets + np.arange(counts.sum())
+
+
 class SDFRendererCPU(object):
     """Render SDFs using the CPU."""
+    # Number of channels of the atlas texture
+    channels = 1
+
     # This should probably live in _sdf_cpu.pyx, but doing so makes
     # debugging substantially more annoying
-    def render_to_texture(self, data, texture, offset, size):
+    def render_sdf(self, data, size):
+        """Render a SDF
+
+        Parameters
+        ----------
+        data : array
+            Must be 2D with type np.ubyte.
+        size : tuple of int
+            Size (w, h) of the SDF.
+
+        Returns
+        -------
+        sdf : array
+            The SDF, with shape (h, w) and type np.ubyte.
+        """
         sdf = (data / 255).astype(np.float32)  # from ubyte -> float
         h, w = sdf.shape
         tex_w, tex_h = size
@@ -587,17 +1056,58 @@ class SDFRendererCPU(object):
         sdf = 2 * sdf - 1.
         sdf = np.sign(sdf) * np.abs(sdf) ** 0.75 / 2. + 0.5
         # Downsample using NumPy (because we can't guarantee SciPy)
-        xp = (np.arange(w) + 0.5) / float(w)
-        x = (np.arange(tex_w) + 0.5) / float(tex_w)
-        bitmap = np.array([np.interp(x, xp, ss) for ss in sdf])
-        xp = (np.arange(h) + 0.5) / float(h)
-        x = (np.arange(tex_h) + 0.5) / float(tex_h)
-        bitmap = np.array([np.interp(x, xp, ss) for ss in bitmap.T]).T
+        i, t = _interp_weights(w, tex_w)
+        bitmap = sdf[:, i] * (1 - t) + sdf[:, i + 1] * t
+        i, t = _interp_weights(h, tex_h)
+        t = t[:, np.newaxis]
+        bitmap = bitmap[i] * (1 - t) + bitmap[i + 1] * t
         assert bitmap.shape[::-1] == size
         # convert to uint8
-        bitmap = (bitmap * 255).astype(np.uint8)
+        return (bitmap * 255).astype(np.uint8)
+
+    def render_to_texture(self, data, texture, offset, size):
+        bitmap = self.render_sdf(data, size)
+        if isinstance(texture, TextureAtlas):
+            texture.set_region(tuple(offset) + tuple(size), bitmap)
+            return
         # convert single channel to RGB by repeating
         bitmap = np.tile(bitmap[..., np.newaxis],
-                         (1, 1, 3))
+                         (1, 1, texture.shape[2]))
         texture[offset[1]:offset[1] + size[1],
                 offset[0]:offset[0] + size[0], :] = bitmap
+
+    def render_regions(self, texture, items):
+        """Render the SDFs of several glyphs into an atlas
+
+        All regions are uploaded at once.
+
+        Parameters
+        ----------
+        texture : instance of TextureAtlas
+            The atlas to render to.
+        items : list
+            List of tuples (bounds, data, sdf), with the region (x, y, w, h)
+            and either the high-resolution data or the SDF (the other one is
+            None).
+        """
+        regions = []
+        for bounds, data, sdf in items:
+            if sdf is None:
+                sdf = self.render_sdf(data, bounds[2:])
+            regions.append((bounds, sdf))
+        texture.set_regions(regions)
+
+    def get_texture_data(self, texture, crop=None):
+        """Get the data of a texture, if it is not known on the CPU"""
+        return None
+
+
+def _interp_weights(n_in, n_out):
+    """Get the indices and weights for linearly resampling n_in pixel
+    centers to n_out (like np.interp, for all rows at once).
+    """
+    xp = (np.arange(n_in) + 0.5) / float(n_in)
+    x = (np.arange(n_out) + 0.5) / float(n_out)
+    i = np.clip(np.searchsorted(xp, x) - 1, 0, n_in - 2)
+    t = np.clip((x - xp[i]) / (xp[i + 1] - xp[i]), 0., 1.)
+    return i, t
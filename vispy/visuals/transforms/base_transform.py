@@ -67,6 +67,7 @@ class BaseTransform(object):
     def __init__(self):
         self._inverse = None
         self._dynamic = False
+        self._uniform_block = None
         self.changed = EventEmitter(source=self, type='transform_changed')
         if self.glsl_map is not None:
             self._shader_map = Function(self.glsl_map)
@@ -111,13 +112,33 @@ class BaseTransform(object):
         Transforms that are flagged as dynamic will not be collapsed in 
         ``ChainTransform.simplified``. This allows changes to the transform
         to propagate through the chain without requiring the chain to be
-        re-simplified.
+        re-simplified. Likewise, ChainTransform does not merge them with
+        other transforms in its shader code.
         """
         return self._dynamic
 
     @dynamic.setter
     def dynamic(self, d):
-        self._dynamic = d
+        if d != self._dynamic:
+            self._dynamic = d
+            self.update()
+
+    @property
+    def uniform_block(self):
+        """ A UniformBlock holding the uniforms of ``shader_map()``, or None.
+
+        Visuals whose transforms contain this transform read these
+        uniforms from the block, so that programs can share their values.
+        The transform should be dynamic, so that chains do not merge it
+        with other transforms.
+        """
+        return self._uniform_block
+
+    @uniform_block.setter
+    def uniform_block(self, block):
+        if block is not self._uniform_block:
+            self._uniform_block = block
+            self.update()
 
     def shader_map(self):
         """
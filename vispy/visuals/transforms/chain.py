@@ -4,9 +4,11 @@
 
 from __future__ import division
 
-from ..shaders import FunctionChain
+import numpy as np
+
+from ..shaders import Function, FunctionChain
 from .base_transform import BaseTransform
-from .linear import NullTransform
+from .linear import NullTransform, STTransform, MatrixTransform
 
 
 class ChainTransform(BaseTransform):
@@ -15,6 +17,13 @@ class ChainTransform(BaseTransform):
     order. Internally, this class uses shaders.FunctionChain to generate
     its glsl_map and glsl_imap functions.
 
+    In the generated shader code, nested chains are flattened and each run
+    of consecutive linear transforms (STTransform and MatrixTransform) is
+    replaced by a single matrix that is computed on the CPU. Non-linear
+    and dynamic transforms (such as the scene transform of a camera) remain
+    separate functions, so that the same functions are used in all chains
+    that contain them.
+
     Arguments:
 
     transforms : list of BaseTransform instances
@@ -38,6 +47,12 @@ class ChainTransform(BaseTransform):
         # ChainTransform does not have shader maps
         self._shader_map = FunctionChain("transform_map_chain", [nmap])
         self._shader_imap = FunctionChain("transform_imap_chain", [nmap])
+        # Map and imap functions for the runs of linear transforms that are
+        # collapsed into one matrix; reused so that new values do not
+        # change the shader code
+        self._matrix_functions = []
+        # The shader functions are only kept up to date once requested
+        self._shaders_used = False
         
         # Set input transforms
         trs = []
@@ -166,17 +181,103 @@ class ChainTransform(BaseTransform):
         return coords
 
     def shader_map(self):
+        if not self._shaders_used:
+            self._shaders_used = True
+            self._rebuild_shaders()
         return self._shader_map
 
     def shader_imap(self):
+        if not self._shaders_used:
+            self._shaders_used = True
+            self._rebuild_shaders()
         return self._shader_imap
-    
+
+    def _flat_transforms(self):
+        """ The transforms in the chain with nested chains expanded and
+        null transforms left out. Dynamic chains are not expanded.
+        """
+        trs = []
+        for tr in self._transforms:
+            if isinstance(tr, ChainTransform) and not tr.dynamic:
+                trs.extend(tr._flat_transforms())
+            elif not isinstance(tr, NullTransform):
+                trs.append(tr)
+        return trs
+
+    def uniform_blocks(self):
+        """ The uniform blocks of the transforms that appear as separate
+        functions in the shader code of the chain.
+        """
+        return [tr.uniform_block for tr in self._flat_transforms()
+                if tr.uniform_block is not None]
+
+    def _shader_stages(self):
+        """ The transforms to generate shader code for. Runs of linear
+        transforms are given as lists.
+        """
+        stages = []
+        run = []
+        for tr in self._flat_transforms() + [None]:
+            if (isinstance(tr, (STTransform, MatrixTransform)) and
+                    not tr.dynamic):
+                run.append(tr)
+                continue
+            if len(run) > 1:
+                stages.append(run)
+            else:
+                stages.extend(run)
+            run = []
+            if tr is not None:
+                stages.append(tr)
+        return stages
+
+    @staticmethod
+    def _matrix(tr):
+        if isinstance(tr, STTransform):
+            scale, translate = tr.scale, tr.translate
+            m = np.diag(scale).astype(np.float64)
+            m[3, :3] = translate[:3]
+            m[3, 3] = 1
+            return m
+        return tr.matrix
+
     def _rebuild_shaders(self):
-        trs = self.transforms
-        if len(trs) == 0:
-            trs = [self._null_transform]
-        self._shader_map.functions = [tr.shader_map() for tr in reversed(trs)]
-        self._shader_imap.functions = [tr.shader_imap() for tr in trs]
+        if not self._shaders_used:
+            return
+        map_funcs = []
+        imap_funcs = []
+        i = 0
+        for stage in self._shader_stages():
+            if isinstance(stage, list):
+                # The last transform in the list is applied first
+                m = self._matrix(stage[0])
+                for tr in stage[1:]:
+                    m = np.dot(self._matrix(tr), m)
+                try:
+                    inv = np.linalg.inv(m)
+                except np.linalg.LinAlgError:
+                    inv = np.linalg.pinv(m)
+                if i == len(self._matrix_functions):
+                    self._matrix_functions.append(
+                        (Function(MatrixTransform.glsl_map),
+                         Function(MatrixTransform.glsl_imap)))
+                fmap, fimap = self._matrix_functions[i]
+                i += 1
+                fmap['matrix'] = m
+                fimap['inv_matrix'] = inv
+            else:
+                fmap, fimap = stage.shader_map(), stage.shader_imap()
+            map_funcs.append(fmap)
+            imap_funcs.append(fimap)
+        if len(map_funcs) == 0:
+            map_funcs = [self._null_transform.shader_map()]
+            imap_funcs = [self._null_transform.shader_imap()]
+        map_funcs.reverse()
+        # Only change the code if the functions changed
+        if map_funcs != self._shader_map.functions:
+            self._shader_map.functions = map_funcs
+        if imap_funcs != self._shader_imap.functions:
+            self._shader_imap.functions = imap_funcs
 
     def append(self, tr):
         """
@@ -209,12 +310,13 @@ class ChainTransform(BaseTransform):
     def _subtr_changed(self, ev):
         """One of the internal transforms changed; propagate the signal. 
         """
+        self._rebuild_shaders()
         self.update(ev)
 
     def __setitem__(self, index, tr):
         self._transforms[index].changed.disconnect(self._subtr_changed)
         self._transforms[index] = tr
-        tr.changed.connect(self.subtr_changed)
+        tr.changed.connect(self._subtr_changed)
         self._rebuild_shaders()
         self.update()
 
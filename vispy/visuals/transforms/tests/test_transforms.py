@@ -6,7 +6,7 @@ import numpy as np
 
 import vispy.visuals.transforms as tr
 from vispy.geometry import Rect
-from vispy.testing import run_tests_if_main
+from vispy.testing import run_tests_if_main, assert_equal
 
 NT = tr.NullTransform
 ST = tr.STTransform
@@ -140,15 +140,71 @@ def test_transform_chain():
     # Test shader map
     t1 = tr.STTransform(scale=(2, 3))
     t2 = tr.STTransform(translate=(3, 4))
-    chain = tr.ChainTransform(t1, t2)
+    t3 = tr.PolarTransform()
+    chain = tr.ChainTransform(t1, t3, t2)
     #
     funcs = chain.shader_map().dependencies()
     funcsi = chain.shader_imap().dependencies()
     #
     assert t1.shader_map() in funcs
     assert t2.shader_map() in funcs
+    assert t3.shader_map() in funcs
     assert t1.shader_imap() in funcsi
     assert t2.shader_imap() in funcsi
+    assert t3.shader_imap() in funcsi
+
+
+def test_transform_chain_collapse():
+    """Test collapsing linear transforms into one matrix in shaders"""
+    t1 = tr.STTransform(scale=(2, 3), translate=(1, 0))
+    t2 = tr.MatrixTransform()
+    t2.rotate(30, (0, 0, 1))
+    t3 = tr.STTransform(translate=(3, 4))
+    t4 = tr.LogTransform(base=(2, 0, 0))
+    chain = tr.ChainTransform(t4, tr.ChainTransform(t1, t2), t3,
+                              tr.NullTransform())
+
+    # t1, t2 and t3 become one matrix, the log transform stays
+    funcs = chain.shader_map().functions
+    assert_equal(len(funcs), 2)
+    assert funcs[1] is t4.shader_map()
+    assert t1.shader_map() not in chain.shader_map().dependencies()
+    assert_equal(len(chain.shader_imap().functions), 2)
+
+    def check_matrix():
+        pts = np.random.normal(size=(10, 4))
+        lin = tr.ChainTransform(t1, t2, t3)
+        m = funcs[0]['matrix'].value
+        assert np.allclose(np.dot(pts, m), lin.map(pts))
+        m_inv = chain.shader_imap().functions[1]['inv_matrix'].value
+        assert np.allclose(np.dot(pts, m_inv), lin.imap(pts))
+    check_matrix()
+
+    # New values update the matrix without changing the code
+    t1.scale = (4, 5)
+    t2.translate((1, 2, 3))
+    assert chain.shader_map().functions == funcs
+    check_matrix()
+
+    # A chain of one linear transform uses its own function
+    chain2 = tr.ChainTransform(t1)
+    assert_equal(chain2.shader_map().functions, [t1.shader_map()])
+
+    # Dynamic transforms (and chains) keep their own functions
+    t3.dynamic = True
+    funcs = chain.shader_map().functions
+    assert_equal(len(funcs), 3)
+    assert funcs[0] is t3.shader_map()
+    t3.dynamic = False
+    dyn = tr.ChainTransform(t1, t2)
+    dyn.dynamic = True
+    chain3 = tr.ChainTransform(t3, dyn)
+    assert_equal(chain3.shader_map().functions,
+                 [dyn.shader_map(), t3.shader_map()])
+    assert_equal(chain3.uniform_blocks(), [])
+    block = object()
+    dyn.uniform_block = block
+    assert_equal(chain3.uniform_blocks(), [block])
 
 
 def test_map_rect():
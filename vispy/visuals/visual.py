@@ -91,6 +91,7 @@ from .. import gloo
 from ..util.event import EmitterGroup, Event
 from ..util import logger, Frozen
 from .shaders import StatementList, MultiProgram
+from .filters import ElementPickingFilter
 from .transforms import TransformSystem
 
 
@@ -102,6 +103,7 @@ class VisualShare(object):
         * GL state variables (blending, depth test, etc.)
         * A weak dictionary of all views
         * A list of filters that should be applied to all views
+        * The filter used for element picking, if enabled
         * A cache for bounds.
 
     """
@@ -112,6 +114,7 @@ class VisualShare(object):
         self.gl_state = {}
         self.views = weakref.WeakKeyDictionary()
         self.filters = []
+        self.element_picking_filter = None
         self.visible = True
 
 
@@ -209,6 +212,29 @@ class BaseVisual(Frozen):
     def draw(self):
         raise NotImplementedError(self)
 
+    def _batch_key(self):
+        """Return a key that is equal for visuals that can be drawn together
+        in one draw call (see `_draw_batch`), or None if this visual must
+        be drawn on its own.
+
+        Visuals with equal keys use the same shader program, GL state and
+        filters, so that only their vertex data differs. The key does not
+        cover the transforms; the caller must only batch visuals whose
+        transforms map the same way.
+        """
+        return None
+
+    def _draw_batch(self, visuals):
+        """Draw *visuals*, which start with this visual and all have its
+        batch key, in one draw call using the transforms of this visual.
+
+        Parameters
+        ----------
+        visuals : list of BaseVisual
+            The visuals to draw, in the order in which they would be drawn.
+        """
+        raise NotImplementedError(self)
+
     def attach(self, filt, view=None):
         """Attach a Filter to this visual.
 
@@ -333,8 +359,10 @@ class Visual(BaseVisual):
                     raise ValueError("Cannot specify both program and "
                                      "vcode/fcode arguments.")
 
+        self._transform_blocks = []
         self._program = self._vshare.program.add_program()
         self._prepare_transforms(self)
+        self._update_uniform_blocks()
         self._filters = []
         self._hooks = {}
 
@@ -448,6 +476,26 @@ class Visual(BaseVisual):
     def _configure_gl_state(self):
         gloo.set_state(**self._vshare.gl_state)
 
+    def _transform_changed(self, event=None):
+        self._update_uniform_blocks()
+        BaseVisual._transform_changed(self)
+
+    def _update_uniform_blocks(self):
+        """ Read the uniforms of scene transforms that have a uniform block
+        (such as that of a camera) from the block.
+        """
+        if getattr(self, '_program', None) is None:
+            return  # called from BaseVisual.__init__
+        blocks = self.transforms.scene_transform.uniform_blocks()
+        if blocks == self._transform_blocks:
+            return
+        for block in self._transform_blocks:
+            if block not in blocks:
+                self._program.remove_uniform_block(block)
+        for block in blocks:
+            self._program.add_uniform_block(block)
+        self._transform_blocks = blocks
+
     def _get_hook(self, shader, name):
         """Return a FunctionChain that Filters may use to modify the program.
 
@@ -508,6 +556,64 @@ class Visual(BaseVisual):
             view._filters.remove(filt)
             filt._detach(view)
 
+    @property
+    def element_picking(self):
+        """Whether the elements of this visual (e.g. markers, faces or line
+        segments) can be picked individually.
+
+        Enabling this adds a per-vertex attribute holding the index of the
+        element each vertex belongs to, which is drawn instead of the
+        visual's colors when picking elements (see
+        ``SceneCanvas.element_at()``). Indices are exact up to 2**24
+        elements. Only visuals that implement ``_element_index()``
+        support this; for other visuals it stays False.
+        """
+        return self._vshare.element_picking_filter is not None
+
+    @element_picking.setter
+    def element_picking(self, enable):
+        if bool(enable) == self.element_picking:
+            return
+        if enable:
+            index = self._element_index()
+            if index is None:
+                return  # element picking is not supported
+            filt = ElementPickingFilter(*index)
+            self._vshare.element_picking_filter = filt
+            self.attach(filt)
+        else:
+            self.detach(self._vshare.element_picking_filter)
+            self._vshare.element_picking_filter = None
+        self.update()
+
+    @property
+    def _element_picking_filter(self):
+        return self._vshare.element_picking_filter
+
+    def _element_index(self):
+        """Return the element index of each vertex
+
+        Returns
+        -------
+        index : array | None
+            The element index of each vertex, or -1 for vertices that do
+            not belong to an element. None if there is no data yet.
+        offset : float
+            See ``ElementPickingFilter``.
+
+        Visuals that do not support element picking return None instead
+        of this tuple.
+        """
+        return None
+
+    def _update_element_index(self):
+        """Upload the element index if element picking is enabled. Call
+        this whenever the vertices of the visual change.
+        """
+        filt = self._vshare.element_picking_filter
+        if filt is not None:
+            filt.set_index(*self._element_index())
+
 
 class VisualView(BaseVisualView, Visual):
     """A view on another Visual instance.